@@ -0,0 +1,8 @@
+"""Benchmarks for the hot paths of wikitextparser.
+
+Run ``python -m benchmarks --help`` from the root of the repository.
+The cold import time is measured by ``python -m benchmarks.import_time``.
+The scaling of Table.data and Table.cells with the number of cells is measured
+by ``python -m benchmarks.table_scaling``. ``python -m benchmarks.edit_memory``
+checks that editing a document many times does not grow its memory.
+"""
@@ -0,0 +1,69 @@
+"""Run the benchmarks and print or save the results.
+
+Examples:
+    python -m benchmarks -o before.json
+    python -m benchmarks -o after.json --compare before.json
+    python -m benchmarks -b templates pformat -c large -r 3
+"""
+
+
+from argparse import ArgumentParser
+from json import dump, load
+from typing import Optional
+
+from . import cases  # noqa, registers the benchmarks
+from .runner import BENCHMARKS, compare, CORPUS_NAMES, run
+
+
+def print_result(result: dict) -> None:
+    print(
+        '{benchmark:<20} {corpus:<8} {min:>10.4f}s {median:>10.4f}s '
+        '{peak_kib:>10.0f} KiB {retained_blocks:>10}'.format(
+            peak_kib=result['peak_bytes'] / 1024, **result),
+        flush=True,
+    )
+
+
+def format_ratio(ratio: Optional[float]) -> str:
+    """Return the ratio as a string, n/a if the base value was 0."""
+    if ratio is None:
+        return 'n/a'
+    return '{:.2f}x'.format(ratio)
+
+
+def main() -> None:
+    parser = ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument(
+        '-b', '--benchmarks', nargs='+', choices=list(BENCHMARKS),
+        help='the benchmarks to run (default: all)')
+    parser.add_argument(
+        '-c', '--corpora', nargs='+', choices=CORPUS_NAMES,
+        help='the corpus pages to use (default: all)')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=5,
+        help='the number of timed runs of each benchmark (default: 5)')
+    parser.add_argument(
+        '-o', '--output', help='write the results to this JSON file')
+    parser.add_argument(
+        '--compare', metavar='BASE',
+        help='compare the results with a JSON file of an earlier run')
+    args = parser.parse_args()
+    print('{:<20} {:<8} {:>11} {:>11} {:>14} {:>10}'.format(
+        'benchmark', 'corpus', 'min', 'median', 'peak', 'blocks'))
+    results = run(args.benchmarks, args.corpora, args.repeat, print_result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare, encoding='utf8') as f:
+            base = load(f)
+        print('\nratios to ' + args.compare)
+        for ratio in compare(base, results):
+            print('{benchmark:<20} {corpus:<8} {min:>11} {peak:>11}'.format(
+                benchmark=ratio['benchmark'], corpus=ratio['corpus'],
+                min=format_ratio(ratio['min']),
+                peak=format_ratio(ratio['peak_bytes'])))
+
+
+if __name__ == '__main__':
+    main()
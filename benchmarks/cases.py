@@ -0,0 +1,74 @@
+"""Define the benchmark cases. See runner.Case."""
+
+
+from wikitextparser import parse
+# noinspection PyProtectedMember
+from wikitextparser._spans import parse_to_spans
+
+from .runner import benchmark
+
+
+@benchmark('parse_to_spans')
+def parse_to_spans_case(text):
+    return lambda: parse_to_spans(bytearray(text, 'ascii', 'replace'))
+
+
+@benchmark('parse')
+def parse_case(text):
+    return lambda: parse(text)
+
+
+@benchmark('templates')
+def templates_case(text):
+    parsed = parse(text)
+    return lambda: parsed.templates
+
+
+@benchmark('wikilinks')
+def wikilinks_case(text):
+    parsed = parse(text)
+    return lambda: parsed.wikilinks
+
+
+@benchmark('Template.arguments')
+def arguments_case(text):
+    templates = parse(text).templates
+    return lambda: [t.arguments for t in templates]
+
+
+@benchmark('Template.to_dict')
+def to_dict_case(text):
+    templates = parse(text).templates
+    return lambda: [t.to_dict() for t in templates]
+
+
+@benchmark('Table.data', corpora=('small', 'large', 'tables'))
+def table_data_case(text):
+    tables = parse(text).tables
+    return lambda: [t.data() for t in tables]
+
+
+@benchmark('Table.data(row=i)', corpora=('small', 'large', 'tables'))
+def table_data_rows_case(text):
+    tables = parse(text).tables
+    return lambda: [
+        [t.data(row=i) for i in range(len(t.data(span=False)))]
+        for t in tables]
+
+
+@benchmark('sections')
+def sections_case(text):
+    parsed = parse(text)
+    return lambda: parsed.sections
+
+
+@benchmark('tags')
+def tags_case(text):
+    parsed = parse(text)
+    return lambda: parsed.tags()
+
+
+@benchmark('pformat')
+def pformat_case(text):
+    parsed = parse(text)
+    return parsed.pformat
@@ -0,0 +1,94 @@
+"""Check that editing one document many times does not grow its memory.
+
+A page with templates, a table, and wikilinks is parsed once. Each edit
+replaces the first template with a new one, after the arguments of the
+templates and the cells of the table have been accessed, so that the spans
+of arguments and cells are stored in `_type_to_spans` under the ids of their
+parent spans. The number of the objects that are tracked by the garbage
+collector, and the number of span lists and spans are printed every --every
+edits. The exit status is 1 if, after the first --every edits, the number of
+objects grows by more than --max-growth, or the number of span lists or spans
+grows at all.
+
+Examples:
+    python -m benchmarks.edit_memory
+    python -m benchmarks.edit_memory -n 10000 --every 1000
+"""
+
+
+from argparse import ArgumentParser
+from gc import collect, get_objects
+from time import perf_counter
+from typing import Tuple
+
+from wikitextparser import parse
+
+
+TEXT = '''{{a|b|c=d|{{e|f}}}} text [[g|h]] {{i|j}}
+{| class="wikitable"
+! k !! l
+|-
+| {{m|n}} || [[o]]
+|-
+| p || q
+|}
+'''
+OLD_TEMPLATE = '{{a|b|c=d|{{e|f}}}}'
+NEW_TEMPLATE = '{{a|b|c=x|{{e|f}}}}'
+
+
+def sizes(parsed) -> Tuple[int, int, int]:
+    """Return the number of objects, span lists, and spans."""
+    collect()
+    type_to_spans = parsed._type_to_spans
+    return (
+        len(get_objects()),
+        len(type_to_spans),
+        sum(len(spans) for spans in type_to_spans.values()),
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser(prog='python -m benchmarks.edit_memory')
+    parser.add_argument(
+        '-n', '--edits', type=int, default=100000,
+        help='the number of edits (default: 100000)')
+    parser.add_argument(
+        '--every', type=int, default=10000,
+        help='print the sizes every this many edits (default: 10000)')
+    parser.add_argument(
+        '--max-growth', type=int, default=100,
+        help='the allowed growth of the number of objects (default: 100)')
+    args = parser.parse_args()
+    parsed = parse(TEXT)
+    print('{:>8} {:>8} {:>8} {:>8} {:>9}'.format(
+        'edits', 'objects', 'lists', 'spans', 'time'))
+    base = None
+    failures = []
+    t0 = perf_counter()
+    old, new = OLD_TEMPLATE, NEW_TEMPLATE
+    for i in range(1, args.edits + 1):
+        for template in parsed.templates:
+            template.arguments
+        parsed.tables[0].cells()
+        parsed[:len(old)] = new
+        old, new = new, old
+        if i % args.every and i != args.edits:
+            continue
+        objects, lists, spans = sizes(parsed)
+        print('{:>8} {:>8} {:>8} {:>8} {:>8.1f}s'.format(
+            i, objects, lists, spans, perf_counter() - t0), flush=True)
+        if base is None:
+            base = objects, lists, spans
+            continue
+        if objects - base[0] > args.max_growth:
+            failures.append('{} more objects after {} edits'.format(
+                objects - base[0], i))
+        if lists > base[1] or spans > base[2]:
+            failures.append('spans grew after {} edits'.format(i))
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Measure the time of a cold `import wikitextparser`.
+
+Each run imports the package in a new interpreter with `-X importtime` and
+takes the cumulative import time of the package from its report, so the
+startup time of the interpreter is not included. The exit status is 1 if
+    - any of the LAZY_MODULES is imported, or
+    - the minimum time is more than --max-ms milliseconds, or
+    - the minimum time is more than --tolerance times the minimum time of the
+        run that is given by --compare.
+
+Examples:
+    python -m benchmarks.import_time -o import_before.json
+    python -m benchmarks.import_time --compare import_before.json
+    python -m benchmarks.import_time --max-ms 100
+"""
+
+
+from argparse import ArgumentParser
+from json import dump, load
+from os.path import dirname
+from platform import python_implementation, python_version
+from statistics import median
+from subprocess import check_output, STDOUT
+from sys import executable
+from typing import List, Set, Tuple
+
+from .runner import _git_commit
+
+
+# The modules that should only be imported when they are used. See
+# wikitextparser._LAZY_NAMES.
+LAZY_MODULES = (
+    'wikitextparser._pool',
+    'wikitextparser._dump',
+    'wikitextparser._profile',
+    'multiprocessing',
+    'xml.etree.ElementTree',
+)
+
+
+def cold_import() -> Tuple[float, Set[str]]:
+    """Import wikitextparser in a new interpreter.
+
+    Return the import time in seconds and the names of the imported modules.
+    """
+    report = check_output(
+        (executable, '-X', 'importtime', '-c', 'import wikitextparser'),
+        cwd=dirname(dirname(__file__)), stderr=STDOUT,
+        universal_newlines=True,
+    )
+    seconds = None
+    modules = set()
+    for line in report.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        modules.add(name)
+        if name == 'wikitextparser':
+            seconds = int(cumulative) / 1e6
+    if seconds is None:
+        raise RuntimeError('wikitextparser was not found in:\n' + report)
+    return seconds, modules
+
+
+def run(repeat: int) -> dict:
+    """Import the package `repeat` times and return a JSON-able dict."""
+    times = []  # type: List[float]
+    modules = set()  # type: Set[str]
+    for _ in range(repeat):
+        seconds, modules = cold_import()
+        times.append(seconds)
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'python': python_implementation() + ' ' + python_version(),
+            'repeat': repeat,
+        },
+        'min': min(times),
+        'median': median(times),
+        'modules': len(modules),
+        'lazy_modules_imported': sorted(modules.intersection(LAZY_MODULES)),
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser(prog='python -m benchmarks.import_time')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=10,
+        help='the number of cold imports (default: 10)')
+    parser.add_argument(
+        '-o', '--output', help='write the result to this JSON file')
+    parser.add_argument(
+        '--compare', metavar='BASE',
+        help='fail if the result is slower than that of this JSON file')
+    parser.add_argument(
+        '--tolerance', type=float, default=1.25,
+        help='the allowed ratio to the compared result (default: 1.25)')
+    parser.add_argument(
+        '--max-ms', type=float, help='fail if the import is slower than this')
+    args = parser.parse_args()
+    result = run(args.repeat)
+    print('min {:.1f} ms, median {:.1f} ms, {} modules'.format(
+        result['min'] * 1000, result['median'] * 1000, result['modules']))
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            dump(result, f, indent=1)
+    failures = []
+    if result['lazy_modules_imported']:
+        failures.append('lazy modules were imported: ' + ', '.join(
+            result['lazy_modules_imported']))
+    if args.max_ms is not None and result['min'] * 1000 > args.max_ms:
+        failures.append('slower than {} ms'.format(args.max_ms))
+    if args.compare:
+        with open(args.compare, encoding='utf8') as f:
+            base = load(f)
+        ratio = result['min'] / base['min']
+        print('{:.2f}x of {}'.format(ratio, args.compare))
+        if ratio > args.tolerance:
+            failures.append('more than {}x of {}'.format(
+                args.tolerance, args.compare))
+    if failures:
+        raise SystemExit('import regressed: ' + '; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
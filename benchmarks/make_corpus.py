@@ -0,0 +1,165 @@
+"""Generate the synthetic pages of the benchmark corpus.
+
+The generated files are checked in, so that all the benchmark runs use the
+same input. Run ``python -m benchmarks.make_corpus`` only when the corpus
+needs to be changed; the results are not comparable across corpora.
+"""
+
+
+from os.path import dirname, join
+from random import Random
+
+
+CORPUS_DIR = join(dirname(__file__), 'corpus')
+
+
+def _words(rnd: Random, n: int) -> str:
+    return ' '.join(
+        rnd.choice((
+            'lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur',
+            'adipiscing', 'elit', 'sed', 'do', 'eiusmod', 'tempor',
+        ))
+        for _ in range(n)
+    )
+
+
+def _paragraph(rnd: Random) -> str:
+    parts = []
+    for _ in range(rnd.randint(3, 8)):
+        parts.append(_words(rnd, rnd.randint(3, 12)))
+        kind = rnd.randint(0, 9)
+        if kind == 0:
+            parts.append('[[{}|{}]]'.format(_words(rnd, 2), _words(rnd, 1)))
+        elif kind == 1:
+            parts.append('[[{}]]'.format(_words(rnd, 1)))
+        elif kind == 2:
+            parts.append('{{{{lang|la|{}}}}}'.format(_words(rnd, 2)))
+        elif kind == 3:
+            parts.append(
+                '<ref>{{{{cite web|url=https://example.org/{}|title={}'
+                '|access-date=2019-01-01}}}}</ref>'.format(
+                    rnd.randint(0, 10 ** 6), _words(rnd, 4)))
+        elif kind == 4:
+            parts.append("'''{}'''".format(_words(rnd, 1)))
+        elif kind == 5:
+            parts.append('<!-- {} -->'.format(_words(rnd, 3)))
+        elif kind == 6:
+            parts.append('{{{{#ifeq:{}|{}|[[{}]]|{}}}}}'.format(
+                _words(rnd, 1), _words(rnd, 1), _words(rnd, 1),
+                _words(rnd, 1)))
+        elif kind == 8:
+            parts.append('{{{{{{{}|}}}}}}'.format(_words(rnd, 1)))
+        elif kind == 7:
+            parts.append('[https://example.com/{} {}]'.format(
+                rnd.randint(0, 999), _words(rnd, 2)))
+    return ' '.join(parts) + '\n'
+
+
+def _infobox(rnd: Random) -> str:
+    return '{{Infobox person\n' + ''.join(
+        '| {} = {} [[{}]] {{{{small|{}}}}}\n'.format(
+            _words(rnd, 1) + str(i), _words(rnd, 3), _words(rnd, 1),
+            _words(rnd, 2))
+        for i in range(rnd.randint(10, 25))
+    ) + '}}\n'
+
+
+def _table(rnd: Random, rows: int, columns: int) -> str:
+    lines = ['{| class="wikitable sortable" style="width:100%"']
+    lines.append('|+ ' + _words(rnd, 3))
+    lines.append('! ' + ' !! '.join(
+        _words(rnd, 1) for _ in range(columns)))
+    for _ in range(rows):
+        lines.append('|-')
+        if rnd.randint(0, 1):
+            lines.append('| ' + ' || '.join(
+                _words(rnd, 2) for _ in range(columns)))
+        else:
+            for _ in range(columns):
+                lines.append('| style="text-align:left" | [[{}]]'.format(
+                    _words(rnd, 1)))
+    lines.append('|}')
+    return '\n'.join(lines) + '\n'
+
+
+def _list(rnd: Random) -> str:
+    return ''.join(
+        rnd.choice(('*', '#', '**', '*#', ':')) + ' ' + _words(rnd, 5) + '\n'
+        for _ in range(rnd.randint(3, 10))
+    )
+
+
+def _article(rnd: Random, sections: int) -> str:
+    parts = [_infobox(rnd), _paragraph(rnd)]
+    for i in range(sections):
+        level = rnd.choice(('==', '==', '==='))
+        parts.append('{0} {1} {0}\n'.format(level, _words(rnd, 2)))
+        for _ in range(rnd.randint(1, 4)):
+            parts.append(_paragraph(rnd))
+        if i % 4 == 0:
+            parts.append(_list(rnd))
+        if i % 7 == 0:
+            parts.append(_table(rnd, 5, 4))
+    parts.append('== References ==\n{{reflist}}\n[[Category:Lorem]]\n')
+    return ''.join(parts)
+
+
+def small() -> str:
+    """Return a short article."""
+    return _article(Random(1), 3)
+
+
+def large() -> str:
+    """Return a long article with many templates, links, and references."""
+    return _article(Random(2), 400)
+
+
+def nested() -> str:
+    """Return a page with deeply nested templates and parser functions."""
+    rnd = Random(3)
+    parts = []
+    for _ in range(50):
+        inner = _words(rnd, 1)
+        for depth in range(rnd.randint(10, 30)):
+            kind = depth % 4
+            if kind == 0:
+                inner = '{{{{t{}|a={}|{}}}}}'.format(depth, inner, depth)
+            elif kind == 1:
+                inner = '{{{{#if:{}|{}|}}}}'.format(depth, inner)
+            elif kind == 2:
+                inner = '[[l{}|{}]]'.format(depth, inner)
+            else:
+                inner = '{{{{{{p{}|{}}}}}}}'.format(depth, inner)
+        parts.append(inner + '\n')
+    return ''.join(parts)
+
+
+def tables() -> str:
+    """Return a table-heavy page."""
+    rnd = Random(4)
+    return ''.join(
+        '== {} ==\n'.format(_words(rnd, 2))
+        + _table(rnd, rnd.randint(10, 60), rnd.randint(3, 8))
+        for _ in range(20)
+    )
+
+
+CORPUS = {
+    'small': small,
+    'large': large,
+    'nested': nested,
+    'tables': tables,
+}
+
+
+def main() -> None:
+    for name, function in CORPUS.items():
+        with open(
+            join(CORPUS_DIR, name + '.txt'), 'w', encoding='utf8',
+            newline='\n',
+        ) as f:
+            f.write(function())
+
+
+if __name__ == '__main__':
+    main()
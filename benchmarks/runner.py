@@ -0,0 +1,163 @@
+"""Define the benchmark registry and the functions that measure them."""
+
+
+from gc import collect
+from os.path import dirname, join
+from platform import platform, python_implementation, python_version
+from statistics import median
+from subprocess import CalledProcessError, check_output, DEVNULL
+from time import perf_counter, strftime
+from tracemalloc import get_traced_memory, start, stop, take_snapshot
+from typing import Callable, Dict, Iterable, List, Optional
+
+import wikitextparser
+
+
+CORPUS_DIR = join(dirname(__file__), 'corpus')
+CORPUS_NAMES = ('small', 'large', 'nested', 'tables')
+
+# A case is called with the text of a corpus page and returns the function
+# that is going to be measured. The preparations that should not be measured,
+# e.g. parsing the text, are done in the case itself. Cases are called again
+# for each measurement, so the measured function always starts from a fresh
+# state.
+Case = Callable[[str], Callable[[], object]]
+
+# name -> (case, corpus names)
+BENCHMARKS = {}  # type: Dict[str, tuple]
+
+
+def benchmark(
+    name: str, corpora: Iterable[str]=CORPUS_NAMES,
+) -> Callable[[Case], Case]:
+    """Register the decorated case under the given name."""
+    def register(case: Case) -> Case:
+        BENCHMARKS[name] = case, tuple(corpora)
+        return case
+    return register
+
+
+def read_corpus(name: str) -> str:
+    """Return the text of the given corpus page."""
+    with open(join(CORPUS_DIR, name + '.txt'), encoding='utf8') as f:
+        return f.read()
+
+
+def measure(case: Case, text: str, repeat: int) -> dict:
+    """Measure the function returned by case(text).
+
+    Return the minimum and the median wall time of `repeat` calls and the
+    memory usage of one more call, traced by tracemalloc:
+        - peak_bytes: The peak size of the memory that has been allocated
+            during the call.
+        - retained_bytes and retained_blocks: The size and the number of the
+            memory blocks that have been allocated during the call and are
+            still alive when it returns, including its result.
+    """
+    times = []  # type: List[float]
+    for _ in range(repeat):
+        function = case(text)
+        collect()
+        t0 = perf_counter()
+        function()
+        times.append(perf_counter() - t0)
+    function = case(text)
+    collect()
+    start()
+    try:
+        result = function()  # noqa, keep the result alive
+        retained_bytes, peak_bytes = get_traced_memory()
+        retained_blocks = sum(
+            stat.count for stat in take_snapshot().statistics('filename'))
+    finally:
+        stop()
+    del result
+    return {
+        'min': min(times),
+        'median': median(times),
+        'peak_bytes': peak_bytes,
+        'retained_bytes': retained_bytes,
+        'retained_blocks': retained_blocks,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    """Return the current commit of the repository, if available."""
+    try:
+        return check_output(
+            ('git', 'rev-parse', 'HEAD'), cwd=dirname(__file__),
+            stderr=DEVNULL, universal_newlines=True,
+        ).strip()
+    except (OSError, CalledProcessError):
+        return None
+
+
+def run(
+    names: Iterable[str]=None,
+    corpora: Iterable[str]=None,
+    repeat: int=5,
+    report: Callable[[dict], None]=None,
+) -> dict:
+    """Run the benchmarks and return the results as a JSON-able dict.
+
+    :param names: The benchmarks to run. The default is all of them.
+    :param corpora: Only use these corpus pages. The default is all of them.
+    :param repeat: The number of timed calls for each measurement.
+    :param report: Called with each result as soon as it is ready.
+    """
+    if names is None:
+        names = list(BENCHMARKS)
+    else:
+        unknown = set(names) - BENCHMARKS.keys()
+        if unknown:
+            raise ValueError('unknown benchmarks: ' + ', '.join(unknown))
+    texts = {}  # type: Dict[str, str]
+    results = []
+    for name in names:
+        case, case_corpora = BENCHMARKS[name]
+        for corpus in case_corpora:
+            if corpora is not None and corpus not in corpora:
+                continue
+            text = texts.get(corpus)
+            if text is None:
+                text = texts[corpus] = read_corpus(corpus)
+            result = {'benchmark': name, 'corpus': corpus, 'chars': len(text)}
+            result.update(measure(case, text, repeat))
+            if report is not None:
+                report(result)
+            results.append(result)
+    return {
+        'meta': {
+            'wikitextparser': wikitextparser.__version__,
+            'commit': _git_commit(),
+            'python': python_implementation() + ' ' + python_version(),
+            'platform': platform(),
+            'time': strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(base: dict, new: dict) -> List[dict]:
+    """Return the ratios of the new results to the base results.
+
+    Only the benchmarks that exist in both are compared. A ratio greater than
+    1 means that the new result is slower or uses more memory.
+    """
+    base_results = {
+        (r['benchmark'], r['corpus']): r for r in base['results']}
+    comparison = []
+    for r in new['results']:
+        b = base_results.get((r['benchmark'], r['corpus']))
+        if b is None:
+            continue
+        comparison.append({
+            'benchmark': r['benchmark'],
+            'corpus': r['corpus'],
+            'min': r['min'] / b['min'] if b['min'] else None,
+            'peak_bytes': (
+                r['peak_bytes'] / b['peak_bytes'] if b['peak_bytes'] else None
+            ),
+        })
+    return comparison
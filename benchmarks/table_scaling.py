@@ -0,0 +1,101 @@
+"""Measure how Table.data and Table.cells scale with the number of cells.
+
+The tables are generated with 10 columns and 1 to 10,000 rows, i.e. 10 to
+100,000 cells, and some cells have colspan and rowspan attributes. For each
+size the minimum time of a fresh call, and the time per cell, are printed.
+The time per cell should stay about the same as the table grows. The exit
+status is 1 if the time per cell of the largest table is more than
+--max-ratio times that of the 1,000-cell table.
+
+Examples:
+    python -m benchmarks.table_scaling
+    python -m benchmarks.table_scaling -m cells -r 3
+"""
+
+
+from argparse import ArgumentParser
+from gc import collect
+from time import perf_counter
+from typing import Callable, Dict
+
+from wikitextparser import parse
+
+
+COLUMNS = 10
+SIZES = (10, 100, 1000, 10000, 100000)
+
+METHODS = {
+    'data': lambda table: table.data(),
+    'cells': lambda table: table.cells(),
+}  # type: Dict[str, Callable]
+
+
+def make_table(cells: int) -> str:
+    """Return the wikitext of a table with the given number of cells."""
+    rows = ['{| class="wikitable"', '! ' + ' !! '.join(
+        'h{}'.format(c) for c in range(COLUMNS))]
+    for r in range(cells // COLUMNS):
+        rows.append('|-')
+        cells_ = []
+        for c in range(COLUMNS):
+            if r % 7 == 1 and c == 0:
+                cells_.append('| rowspan="2" | {}.{}'.format(r, c))
+            elif r % 7 == 2 and c == 0:
+                continue
+            elif r % 5 == 3 and c == 3:
+                cells_.append('| colspan="2" | [[{}.{}]]'.format(r, c))
+            elif r % 5 == 3 and c == 4:
+                continue
+            else:
+                cells_.append('| {}.{}'.format(r, c))
+        rows.append(' |'.join(cells_))
+    rows.append('|}')
+    return '\n'.join(rows)
+
+
+def measure(method: Callable, text: str, repeat: int) -> float:
+    """Return the minimum time of calling method on a freshly parsed table.
+    """
+    times = []
+    for _ in range(repeat):
+        table = parse(text).tables[0]
+        collect()
+        t0 = perf_counter()
+        method(table)
+        times.append(perf_counter() - t0)
+    return min(times)
+
+
+def main() -> None:
+    parser = ArgumentParser(prog='python -m benchmarks.table_scaling')
+    parser.add_argument(
+        '-m', '--methods', nargs='+', choices=list(METHODS),
+        default=list(METHODS), help='the methods to measure (default: all)')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='the number of timed calls for each size (default: 3)')
+    parser.add_argument(
+        '--max-ratio', type=float, default=2.0,
+        help='the allowed growth of the time per cell (default: 2.0)')
+    args = parser.parse_args()
+    print('{:<8} {:>8} {:>12} {:>14}'.format(
+        'method', 'cells', 'min', 'per cell'))
+    failures = []
+    for name in args.methods:
+        method = METHODS[name]
+        per_cell = {}  # type: Dict[int, float]
+        for cells in SIZES:
+            seconds = measure(method, make_table(cells), args.repeat)
+            per_cell[cells] = seconds / cells
+            print('{:<8} {:>8} {:>11.4f}s {:>12.2f}us'.format(
+                name, cells, seconds, per_cell[cells] * 1e6), flush=True)
+        ratio = per_cell[SIZES[-1]] / per_cell[1000]
+        if ratio > args.max_ratio:
+            failures.append('{} is {:.1f}x slower per cell'.format(
+                name, ratio))
+    if failures:
+        raise SystemExit('not linear: ' + '; '.join(failures))
+
+
+if __name__ == '__main__':
+    main()
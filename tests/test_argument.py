@@ -66,6 +66,15 @@ class Argument(unittest.TestCase):
             [a.name for a in wtp.parse('{{t|a|b|c}}').templates[0].arguments],
         )
 
+    def test_positions_are_updated_after_the_template_changes(self):
+        t = wtp.parse('{{t|k=a|b|<!--=-->c|[[d|e=f]]}}').templates[0]
+        k, b, c, d = t.arguments
+        self.assertEqual(['k', '1', '2', '3'], [k.name, b.name, c.name, d.name])
+        k.positional = True
+        self.assertEqual(['1', '2', '3', '4'], [k.name, b.name, c.name, d.name])
+        b.name = 'x'
+        self.assertEqual(['1', 'x', '2', '3'], [k.name, b.name, c.name, d.name])
+
     def test_dont_confuse_subspan_equal_with_keyword_arg_equal(self):
         p = wtp.parse('{{text| {{text|1=first}} | b }}')
         a0, a1 = p.templates[0].arguments
@@ -0,0 +1,67 @@
+﻿"""Test the ParseCache class and the set_parse_cache function."""
+
+
+from unittest import main, TestCase
+
+from wikitextparser import parse, set_parse_cache
+
+
+class ParseCacheTest(TestCase):
+
+    """Test the ParseCache class."""
+
+    def tearDown(self):
+        set_parse_cache(None)
+
+    def test_hits_and_misses(self):
+        cache = set_parse_cache(1 << 20)
+        s = '{{a|[[b]]}}<!--c-->'
+        p1 = parse(s)
+        p2 = parse(s)
+        parse('other')
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 2))
+        self.assertEqual(p1._type_to_spans, p2._type_to_spans)
+        self.assertEqual(p1._shadow, p2._shadow)
+        self.assertEqual(p2.templates[0].arguments[0].value, '[[b]]')
+
+    def test_cached_objects_are_independent(self):
+        set_parse_cache(1 << 20)
+        s = '{{a}} {{b}}'
+        p1 = parse(s)
+        p1.templates[0].name = 'c'
+        del p1.templates[1][:]
+        p2 = parse(s)
+        self.assertEqual([t.string for t in p2.templates], ['{{a}}', '{{b}}'])
+        self.assertEqual(p2._shadow, bytearray(b'_____ _____'))
+        p2.templates[1].name = 'd'
+        self.assertEqual(p1.string, '{{c}} ')
+        self.assertEqual(parse(s).string, s)
+
+    def test_eviction(self):
+        cache = set_parse_cache(1 << 20)
+        parse('{{a}}')
+        size = cache.nbytes
+        cache = set_parse_cache(2 * size)
+        parse('{{a}}')
+        parse('{{b}}')
+        parse('{{a}}')  # move to the end
+        parse('{{c}}')  # evicts {{b}}
+        self.assertEqual((cache.evictions, len(cache)), (1, 2))
+        self.assertEqual(cache.nbytes, 2 * size)
+        parse('{{b}}')
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+        cache.clear()
+        self.assertEqual((cache.nbytes, len(cache)), (0, 0))
+
+    def test_entries_larger_than_max_bytes_are_not_cached(self):
+        cache = set_parse_cache(10)
+        parse('{{a}}')
+        self.assertEqual((cache.misses, len(cache), cache.nbytes), (1, 0, 0))
+
+    def test_disabled(self):
+        self.assertIsNone(set_parse_cache(None))
+        self.assertEqual(parse('{{a}}').templates[0].name, 'a')
+
+
+if __name__ == '__main__':
+    main()
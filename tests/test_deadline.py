@@ -0,0 +1,76 @@
+﻿"""Test the deadline context manager and the timeout parameter."""
+
+
+from threading import Event, Thread
+from unittest import main, TestCase
+
+from wikitextparser import deadline, parse, ParseTimeout
+# noinspection PyProtectedMember
+from wikitextparser import _deadline
+
+
+class DeadlineTest(TestCase):
+
+    """Test the deadline context manager."""
+
+    def test_parse_timeout(self):
+        s = '{{a|[[b|{{c}}]]}}'
+        self.assertRaises(ParseTimeout, parse, s, timeout=0)
+        self.assertIsNone(_deadline.state.expires_at)
+        self.assertEqual(parse(s, timeout=60).templates[1].string, '{{c}}')
+
+    def test_deferred_parsing_and_properties(self):
+        p = parse('{|\n|a\n|}\n== b ==\n<span>c</span>', types={'Template'})
+        with self.assertRaises(ParseTimeout):
+            with deadline(0):
+                p.templates
+        # The timed out object can be parsed again.
+        self.assertEqual(p.templates, [])
+        self.assertEqual(p.tables[0].string, '{|\n|a\n|}')
+        t = parse('{|\n|a\n|}').tables[0]
+        for get in (lambda: t.data(), lambda: parse('== b ==').sections):
+            with self.assertRaises(ParseTimeout):
+                with deadline(0):
+                    get()
+        self.assertEqual(t.data(), [['a']])
+
+    def test_nested_deadlines(self):
+        with deadline(60):
+            outer = _deadline.state.expires_at
+            with deadline(120):
+                self.assertEqual(_deadline.state.expires_at, outer)
+            with deadline(None):
+                self.assertEqual(_deadline.state.expires_at, outer)
+            with deadline(1):
+                self.assertLess(_deadline.state.expires_at, outer)
+            self.assertEqual(_deadline.state.expires_at, outer)
+        self.assertIsNone(_deadline.state.expires_at)
+
+    def test_deadlines_of_other_threads_do_not_apply(self):
+        entered, done = Event(), Event()
+
+        def expired_deadline():
+            with deadline(0):
+                entered.set()
+                done.wait(60)
+
+        thread = Thread(target=expired_deadline)
+        thread.start()
+        try:
+            entered.wait(60)
+            self.assertIsNone(_deadline.time_left())
+            self.assertEqual(
+                parse('{{a}}').templates[0].string, '{{a}}')
+        finally:
+            done.set()
+            thread.join()
+
+    def test_regex_timeout_is_converted(self):
+        with self.assertRaises(ParseTimeout) as cm:
+            with deadline(60):
+                raise TimeoutError('regex timed out')
+        self.assertIsInstance(cm.exception.__cause__, TimeoutError)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+﻿"""Test the functions of _dump.py."""
+
+
+from bz2 import compress
+from io import BytesIO
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import main, TestCase
+
+from wikitextparser import iter_pages, map_pages
+
+
+DUMP = '''\
+<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" version="0.10">
+  <siteinfo>
+    <sitename>Wikipedia</sitename>
+  </siteinfo>
+  <page>
+    <title>A</title>
+    <ns>0</ns>
+    <id>1</id>
+    <revision>
+      <id>10</id>
+      <contributor><username>U</username><id>5</id></contributor>
+      <text xml:space="preserve">{{t|a=b}} [[l]] &lt;!-- c --&gt;</text>
+    </revision>
+  </page>
+  <page>
+    <title>Talk:B</title>
+    <ns>1</ns>
+    <id>2</id>
+    <revision>
+      <id>20</id>
+      <text xml:space="preserve" />
+    </revision>
+    <revision>
+      <id>21</id>
+      <text xml:space="preserve">{{u}}</text>
+    </revision>
+  </page>
+</mediawiki>
+'''.encode()
+
+
+def template_names(page):
+    return page.title, [t.name for t in page.wikitext.templates]
+
+
+class IterPages(TestCase):
+
+    """Test the iter_pages function."""
+
+    def test_file_object(self):
+        pages = list(iter_pages(BytesIO(DUMP)))
+        self.assertEqual(
+            [(p.title, p.ns, p.revision_id) for p in pages],
+            [('A', 0, 10), ('Talk:B', 1, 20), ('Talk:B', 1, 21)])
+        wikitext = pages[0].wikitext
+        self.assertNotIn('_type_to_spans', wikitext.__dict__)
+        self.assertEqual(wikitext.templates[0].name, 't')
+        self.assertEqual(wikitext.comments[0].contents, ' c ')
+        self.assertEqual(pages[1].wikitext.string, '')
+
+    def test_bz2_path(self):
+        with TemporaryDirectory() as directory:
+            path = join(directory, 'pages-articles.xml.bz2')
+            with open(path, 'wb') as f:
+                f.write(compress(DUMP))
+            titles = [p.title for p in iter_pages(path)]
+        self.assertEqual(titles, ['A', 'Talk:B', 'Talk:B'])
+
+    def test_invalid_xml(self):
+        with self.assertRaises(SyntaxError):  # ParseError
+            list(iter_pages(BytesIO(DUMP[:-20])))
+
+    def test_map_pages(self):
+        expected = [('A', ['t']), ('Talk:B', []), ('Talk:B', ['u'])]
+        for workers in (1, 2):
+            stats = {}
+            self.assertEqual(list(map_pages(
+                BytesIO(DUMP), template_names, workers=workers, chunksize=2,
+                stats=stats,
+            )), expected)
+            self.assertEqual(sum(s.pages for s in stats.values()), 3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+﻿"""Test the ParserProfile class."""
+
+
+from copy import deepcopy
+from pickle import dumps, loads
+from unittest import main, TestCase
+
+from wikitextparser import parse, ParserProfile, set_span_engine
+# noinspection PyProtectedMember
+from wikitextparser._spans import DEFAULT_PROFILE, WIKILINK_FINDITER
+
+
+class ParserProfileTest(TestCase):
+
+    """Test the ParserProfile class."""
+
+    def tearDown(self):
+        set_span_engine('regex')
+
+    def test_default_profile_reuses_the_module_regexes(self):
+        profile = ParserProfile()
+        self.assertEqual(profile, DEFAULT_PROFILE)
+        self.assertIs(profile.wikilink_finditer, WIKILINK_FINDITER)
+
+    def test_compiled_regexes_are_shared(self):
+        p1 = ParserProfile(parser_functions=['FOO'])
+        p2 = ParserProfile(parser_functions={'FOO'})
+        self.assertEqual(p1, p2)
+        self.assertIs(p1.parser_function_finditer, p2.parser_function_finditer)
+        self.assertIsNot(
+            p1.parser_function_finditer,
+            DEFAULT_PROFILE.parser_function_finditer)
+
+    def test_parser_functions(self):
+        s = '{{FOO:a}}{{PAGENAME:b}}{{#if:c}}'
+        profile = ParserProfile(parser_functions=['FOO'])
+        for engine in ('regex', 'stack'):
+            set_span_engine(engine)
+            self.assertEqual(
+                [pf.name for pf in parse(s, profile=profile).parser_functions],
+                ['FOO', '#if'])
+            self.assertEqual(
+                [t.name for t in parse(s, profile=profile).templates],
+                ['PAGENAME:b'])
+            self.assertEqual(
+                [pf.name for pf in parse(s).parser_functions],
+                ['PAGENAME', '#if'])
+
+    def test_profile_is_used_for_lazy_parsing_and_inserted_strings(self):
+        profile = ParserProfile(parser_functions=['FOO'])
+        p = parse('{{FOO:a}}', types={'Template'}, profile=profile)
+        self.assertEqual(p.templates, [])
+        self.assertEqual(len(p.parser_functions), 1)
+        p = parse('x', profile=profile)
+        p.insert(1, '{{FOO:b}}')
+        p[0:1] = '{{FOO:c}}'
+        self.assertEqual(
+            [pf.string for pf in p.parser_functions],
+            ['{{FOO:c}}', '{{FOO:b}}'])
+        self.assertEqual(p.templates, [])
+        self.assertEqual(len(deepcopy(p).parser_functions), 2)
+
+    def test_tag_extensions_and_schemes(self):
+        profile = ParserProfile(
+            unparsable_tag_extensions=['code'],
+            bare_external_link_schemes=['foo://'])
+        p = parse(
+            '<code>{{a}}</code><nowiki>{{b}}</nowiki> foo://x http://y',
+            profile=profile)
+        self.assertEqual([t.name for t in p.templates], ['b'])
+        self.assertEqual(len(p.tags('code')), 1)
+        self.assertEqual([e.url for e in p.external_links], ['foo://x'])
+
+    def test_non_ascii_and_special_names(self):
+        profile = ParserProfile(parser_functions=['اگر', 'a.b'])
+        p = parse('{{اگر:x}}{{a.b:y}}{{axb:z}}', profile=profile)
+        self.assertEqual(
+            [pf.name for pf in p.parser_functions], ['اگر', 'a.b'])
+
+    def test_non_ascii_names_of_the_same_length(self):
+        profile = ParserProfile(parser_functions=['شمارش'])
+        p = parse('{{شمارش:1}}  {{ابجدی:2}}', profile=profile)
+        self.assertEqual([pf.name for pf in p.parser_functions], ['شمارش'])
+        self.assertEqual([t.name for t in p.templates], ['ابجدی:2'])
+        # The shadows only contain ASCII bytes.
+        self.assertLess(max(p._shadow), 128)
+        self.assertEqual(
+            p.templates[0]._shadow, bytearray(b'{{?????:2}}'))
+        p.insert(12, '{{ابجدی:3}}{{شمارش:4}}')
+        self.assertEqual(
+            [pf.string for pf in p.parser_functions],
+            ['{{شمارش:1}}', '{{شمارش:4}}'])
+        self.assertEqual(
+            [t.string for t in p.templates], ['{{ابجدی:3}}', '{{ابجدی:2}}'])
+
+    def test_from_siteinfo(self):
+        profile = ParserProfile.from_siteinfo({'query': {
+            'functionhooks': ['ns', 'if'],
+            'variables': ['pagename'],
+            'magicwords': [
+                {'name': 'ns', 'aliases': ['ns:', 'فضای_نام:']},
+                {'name': 'if', 'aliases': ['#if:']},
+                {'name': 'pagename', 'aliases': ['PAGENAME', 'نام_صفحه']},
+            ],
+            'extensiontags': ['<ref>', '<nowiki>'],
+            'protocols': ['http://', '//'],
+        }})
+        self.assertEqual(
+            profile.parser_functions,
+            {'ns', 'فضای_نام', 'PAGENAME', 'نام_صفحه'})
+        self.assertEqual(profile.parsable_tag_extensions, {'ref'})
+        self.assertEqual(profile.unparsable_tag_extensions, {'nowiki'})
+        self.assertEqual(profile.bare_external_link_schemes, {'http://'})
+        self.assertEqual(
+            ParserProfile.from_siteinfo({}), DEFAULT_PROFILE)
+
+    def test_pickle(self):
+        profile = ParserProfile(parser_functions=['FOO'])
+        self.assertEqual(loads(dumps(profile)), profile)
+        p = loads(dumps(parse('{{FOO:a}}', profile=profile)))
+        p.insert(0, '{{FOO:b}}')
+        self.assertEqual(len(p.parser_functions), 2)
+
+
+if __name__ == '__main__':
+    main()
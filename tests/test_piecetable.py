@@ -0,0 +1,143 @@
+﻿"""Test the PieceTable class."""
+
+
+from copy import deepcopy
+from random import choice, randrange, seed
+from unittest import main, TestCase
+
+# noinspection PyProtectedMember
+import wikitextparser._piecetable as piecetable
+# noinspection PyProtectedMember
+from wikitextparser._piecetable import PieceTable
+import wikitextparser as wtp
+
+
+class PieceTableTest(TestCase):
+
+    """Test the PieceTable class."""
+
+    def setUp(self):
+        self.chunk_size = piecetable.CHUNK_SIZE
+        piecetable.CHUNK_SIZE = 4
+
+    def tearDown(self):
+        piecetable.CHUNK_SIZE = self.chunk_size
+
+    def test_index_zero(self):
+        pt = PieceTable('abc')
+        self.assertEqual('abc', pt[0])
+        self.assertEqual(3, len(pt))
+        pt[0] = 'de'
+        self.assertEqual('de', pt[0])
+        self.assertEqual(2, len(pt))
+        self.assertRaises(IndexError, pt.__getitem__, 1)
+        self.assertEqual("PieceTable('de')", repr(pt))
+
+    def test_modifications(self):
+        pt = PieceTable('abc')
+        self.assertEqual(0, pt.modifications)
+        pt.splice(1, 2, 'x')
+        pt.splice(5, 9, 'y')  # out of range
+        pt[0] = 'de'
+        self.assertEqual(3, pt.modifications)
+        pt.substring(0, 1)
+        self.assertEqual(3, pt.modifications)
+
+    def test_splice_and_substring_across_chunks(self):
+        pt = PieceTable('0123456789abcdef')
+        pt.splice(3, 9, 'XY')
+        self.assertEqual('012XY9ab', pt.substring(0, 8))
+        self.assertEqual('2XY9', pt.substring(2, 6))
+        pt.splice(0, 0, 'long inserted value')
+        self.assertEqual('long inserted value012XY9abcdef', pt[0])
+        pt.splice(0, len(pt), '')
+        self.assertEqual('', pt[0])
+        self.assertEqual(0, len(pt))
+        pt.splice(0, 0, 'a')
+        self.assertEqual('a', pt[0])
+
+    def test_out_of_range_indices_follow_str_slicing(self):
+        pt = PieceTable('0123456789')
+        pt.splice(1, 1, 'a')
+        self.assertEqual('', pt.substring(-1, -1))
+        self.assertEqual('9', pt.substring(-1, 20))
+        pt.splice(-1, -1, 'b')
+        self.assertEqual('0a12345678b9', pt[0])
+
+    def test_random_splices(self):
+        seed(0)
+        string = ''
+        pt = PieceTable(string)
+        for _ in range(500):
+            start = randrange(len(string) + 1)
+            stop = randrange(start, len(string) + 1)
+            value = choice(('', 'x', 'yz', 'abcdefghijk'))
+            string = string[:start] + value + string[stop:]
+            pt.splice(start, stop, value)
+            self.assertEqual(len(string), len(pt))
+            start = randrange(len(string) + 1)
+            stop = randrange(start, len(string) + 1)
+            self.assertEqual(string[start:stop], pt.substring(start, stop))
+        self.assertEqual(string, pt[0])
+
+    def test_edits_of_wikitext(self):
+        p = wtp.parse('{{a|b}} text [[c|d]] {{e|f}} more text')
+        t1, t2 = p.templates
+        w = p.wikilinks[0]
+        t1.arguments[0].value = 'long value'
+        w.text = 'new text'
+        t2.arguments[0].string = ''
+        self.assertEqual(
+            '{{a|long value}} text [[c|new text]] {{e}} more text', p.string)
+        self.assertEqual('[[c|new text]]', w.string)
+        self.assertEqual('{{e}}', t2.string)
+
+    def test_span_versions(self):
+        p = wtp.parse('{{a|b}} text {{c|d}}')
+        t1, t2 = p.templates
+        lststr = p._lststr
+        self.assertEqual(0, lststr.span_version(t1._span))
+        shadow1, shadow2 = t1._shadow, t2._shadow
+        t1.name = 'aa'
+        self.assertEqual(1, lststr.span_version(t1._span))
+        self.assertEqual(1, lststr.span_version(p._span))
+        self.assertEqual(0, lststr.span_version(t2._span))
+        self.assertIs(shadow2, t2._shadow)
+        self.assertIsNot(shadow1, t1._shadow)
+        self.assertEqual(bytearray(b'{{aa|b}}'), t1._shadow)
+        # Replacing with a text of the same length.
+        t2.arguments[0].value = 'e'
+        self.assertEqual(bytearray(b'{{c|e}}'), t2._shadow)
+        self.assertEqual('e', t2.get_arg('1').value)
+        lststr[0] = 'reset'
+        self.assertEqual(3, lststr.span_version(t2._span))
+
+    def test_prune_versions(self):
+        pt = PieceTable('abc')
+        pt.splice(0, 1, 'x')
+        pt.versions.update({1: 1, 2: 1})
+        pt.prune_versions([2, 3])
+        self.assertEqual({2: 1}, pt.versions)
+        self.assertEqual(1, pt.base_version)
+        # The versions of the removed spans are pruned.
+        p = wtp.parse('.{{a}}')
+        for i in range(2 * piecetable.MIN_PRUNED_VERSIONS):
+            p[1:] = '{{b}}'
+        self.assertLessEqual(
+            len(p._lststr.versions), piecetable.MIN_PRUNED_VERSIONS)
+
+    def test_deepcopy_invalidates_stale_caches(self):
+        p = wtp.parse('{{a|b}}')
+        t = p.templates[0]
+        a = t.arguments[0]
+        self.assertEqual('1', a.name)
+        t.name = 'c'
+        # The caches of `a` are stale now, but it has not been accessed.
+        copied = deepcopy(a)
+        self.assertEqual(1, copied._lststr.modifications)
+        self.assertEqual(bytearray(b'|b'), copied._shadow)
+        self.assertEqual('{{c|b}}', copied._lststr[0])
+
+
+if __name__ == '__main__':
+    main()
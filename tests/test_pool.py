@@ -0,0 +1,59 @@
+﻿"""Test the parse_many function."""
+
+
+from os import getpid
+from unittest import main, TestCase
+
+from wikitextparser import parse_many
+
+
+def template_names(parsed):
+    return [t.name for t in parsed.templates]
+
+
+def fail(parsed):
+    raise ValueError(parsed.string)
+
+
+class ParseMany(TestCase):
+
+    """Test the parse_many function."""
+
+    strings = ['{{a}}', '', '{{b|{{c}}}}', 'text'] * 10
+    expected = [['a'], [], ['b', 'c'], []] * 10
+
+    def test_ordered(self):
+        stats = {}
+        self.assertEqual(list(parse_many(
+            self.strings, template_names, workers=2, chunksize=3, stats=stats,
+        )), self.expected)
+        self.assertNotIn(getpid(), stats)
+        self.assertEqual(sum(s.pages for s in stats.values()), 40)
+        self.assertEqual(
+            sum(s.chars for s in stats.values()),
+            sum(map(len, self.strings)))
+
+    def test_unordered(self):
+        self.assertCountEqual(list(parse_many(
+            iter(self.strings), template_names, workers=2, chunksize=3,
+            ordered=False,
+        )), self.expected)
+
+    def test_single_worker_runs_in_current_process(self):
+        stats = {}
+        self.assertEqual(list(parse_many(
+            self.strings, template_names, workers=1, types={'Template'},
+            stats=stats,
+        )), self.expected)
+        self.assertEqual(list(stats), [getpid()])
+        self.assertEqual(stats[getpid()].pages, 40)
+
+    def test_exceptions_are_raised(self):
+        for ordered in (True, False):
+            with self.assertRaises(ValueError):
+                list(parse_many(
+                    self.strings, fail, workers=2, ordered=ordered))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+﻿"""Test the SpanProfiler class."""
+
+
+from unittest import main, TestCase
+
+from wikitextparser import parse, set_span_engine, SpanProfiler
+# noinspection PyProtectedMember
+from wikitextparser import _spans
+# noinspection PyProtectedMember
+from wikitextparser._spans import parse_to_spans
+
+
+class SpanProfilerTest(TestCase):
+
+    """Test the SpanProfiler class."""
+
+    def tearDown(self):
+        set_span_engine('regex')
+
+    def test_same_spans_as_parse_to_spans(self):
+        s = (
+            '<!--c-->{{a|[[b|{{c}}]]}}<ref>{{d|{{{e|}}}}}</ref>'
+            '{{#if:{{f}}|[[g]]}} { } {{_}} [[h|[[i]]]]'
+        )
+        for types in (None, {'WikiLink'}, {'ExtensionTag'}, {'Comment'}):
+            for engine in ('regex', 'stack'):
+                set_span_engine(engine)
+                expected = parse_to_spans(bytearray(s, 'ascii'), types)
+                with SpanProfiler():
+                    self.assertEqual(
+                        parse_to_spans(bytearray(s, 'ascii'), types),
+                        expected)
+
+    def test_phases(self):
+        with SpanProfiler() as profiler:
+            parse('<!--c-->{{a|{{b}}}} [[c|{{d}}]] {{#if:x|y}}').templates
+        self.assertIsNone(_spans.span_profiler)
+        self.assertEqual(profiler.parses, 1)
+        phases = profiler.phases
+        self.assertEqual(phases['comments'].spans, 1)
+        self.assertEqual(phases['wikilinks'].spans, 1)
+        self.assertEqual(phases['templates'].spans, 3)
+        self.assertEqual(phases['parser_functions'].spans, 1)
+        self.assertEqual(phases['single_braces'].spans, 0)
+        # {{b}} and {{d}} are found in the first pass, {{a|...}} in the second
+        self.assertEqual(profiler.passes['templates', 0].spans, 2)
+        self.assertEqual(profiler.passes['templates', 1].spans, 1)
+        self.assertGreaterEqual(
+            profiler.seconds, sum(p.seconds for p in phases.values()))
+        profiler.clear()
+        self.assertEqual((profiler.parses, profiler.phases), (0, {}))
+
+    def test_stack_engine(self):
+        set_span_engine('stack')
+        with SpanProfiler() as profiler:
+            parse('{{a|{{b}}}} [[c]]').templates
+        self.assertEqual(profiler.phases['stack'].spans, 3)
+
+    def test_nested_profilers(self):
+        with SpanProfiler() as outer:
+            with SpanProfiler() as inner:
+                parse('{{a}}').templates
+            self.assertIs(_spans.span_profiler, outer)
+        self.assertEqual((outer.parses, inner.parses), (0, 1))
+
+
+if __name__ == '__main__':
+    main()
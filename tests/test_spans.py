@@ -4,7 +4,12 @@
 from unittest import expectedFailure, main, TestCase
 
 # noinspection PyProtectedMember
-from wikitextparser._spans import PARSER_FUNCTION_FINDITER, parse_to_spans
+from copy import deepcopy
+
+from wikitextparser._spans import (
+    LazyMethod, PARSER_FUNCTION_FINDITER, parse_to_spans, set_span_engine,
+    TypeToSpans,
+)
 import wikitextparser as wtp
 
 
@@ -400,5 +405,126 @@ class Spans(TestCase):
         )
 
 
+class StackEngine(TestCase):
+
+    """Test the 'stack' span engine against the default 'regex' engine."""
+
+    def tearDown(self):
+        set_span_engine('regex')
+
+    def assertSameSpans(self, string: bytes):
+        set_span_engine('regex')
+        regex_array = bytearray(string)
+        regex_spans = parse_to_spans(regex_array)
+        set_span_engine('stack')
+        stack_array = bytearray(string)
+        stack_spans = parse_to_spans(stack_array)
+        self.assertEqual(regex_spans, stack_spans)
+        self.assertEqual(regex_array, stack_array)
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, set_span_engine, 'unknown')
+
+    def test_nested_elements(self):
+        self.assertSameSpans(
+            b'{{a|{{{p|{{#if:{{b}}|[[L|{{c}}]]}}}}}}}} [[W|{{{q}}}]]')
+
+    def test_pf_containing_parameter_is_template(self):
+        self.assertSameSpans(b'{{#t2:{{{p1|}}}}}')
+
+    def test_unmatched_braces(self):
+        self.assertSameSpans(b'{{{a}} }}} {{b|}}}} {{{{c}} {{d|{}}} }{')
+
+    def test_invalid_names_and_extension_tags(self):
+        self.assertSameSpans(
+            b'{{a[b]}} {{{{c}}}} <ref>{{d}}[[e]]</ref>'
+            b'<!-- {{f}} --> [[g|[[h]]]] [[i]]]')
+
+    def test_parse_with_stack_engine(self):
+        set_span_engine('stack')
+        self.assertEqual(
+            wtp.parse('{{a|{{{b}}}}} [[c|{{#d:}}]]').templates[0].string,
+            '{{a|{{{b}}}}}')
+
+
+class ParseToSpansTypes(TestCase):
+
+    """Test the `types` argument of parse_to_spans."""
+
+    string = b'<!--c-->{{a|[[b|{{c}}]]}}<ref>[[d]]</ref>{{{e}}}'
+
+    def test_comments_only(self):
+        self.assertEqual(
+            {'Comment': [[0, 8]]},
+            parse_to_spans(bytearray(self.string), {'Comment'}),
+        )
+
+    def test_extension_tags(self):
+        self.assertEqual(
+            {'Comment': [[0, 8]], 'ExtensionTag': [[25, 41]]},
+            parse_to_spans(bytearray(self.string), {'ExtensionTag'}),
+        )
+
+    def test_wikilinks(self):
+        self.assertEqual(
+            {
+                'Comment': [[0, 8]], 'ExtensionTag': [[25, 41]],
+                'WikiLink': [[12, 23], [30, 35]],
+            },
+            parse_to_spans(bytearray(self.string), {'WikiLink'}),
+        )
+
+    def test_brace_types_include_all(self):
+        self.assertEqual(
+            parse_to_spans(bytearray(self.string)),
+            parse_to_spans(bytearray(self.string), {'Parameter'}),
+        )
+
+
+class TypeToSpansTest(TestCase):
+
+    """Test the compact TypeToSpans dict."""
+
+    def test_arrays_are_unpacked_on_access(self):
+        d = TypeToSpans({'Template': [[0, 5], [1, 3]], 'Comment': []})
+        self.assertIn('Template', d._arrays)
+        self.assertNotIn('Comment', d._arrays)
+        self.assertIn('Template', d)
+        self.assertEqual(len(d), 2)
+        spans = d['Template']
+        self.assertEqual(spans, [[0, 5], [1, 3]])
+        self.assertIs(spans, d['Template'])
+        self.assertNotIn('Template', d._arrays)
+
+    def test_values_unpack_all(self):
+        d = TypeToSpans({'Template': [[0, 5]], 'WikiLink': [[6, 9]]})
+        self.assertEqual(sorted(d.values()), [[[0, 5]], [[6, 9]]])
+        self.assertEqual(d, {'Template': [[0, 5]], 'WikiLink': [[6, 9]]})
+
+    def test_setdefault_and_get(self):
+        d = TypeToSpans({'Template': [[0, 5]]})
+        self.assertEqual(d.setdefault('Template', []), [[0, 5]])
+        self.assertEqual(d.get('WikiLink', 1), 1)
+        self.assertEqual(d.setdefault('WikiLink', []), [])
+
+    def test_deepcopy_keeps_shared_spans(self):
+        d = TypeToSpans({'Template': [[0, 5]]})
+        span = d['Template'][0]
+        copied_span, copied_d = deepcopy((span, d))
+        self.assertIs(copied_span, copied_d['Template'][0])
+
+    def test_lazy_method_compiles_with_version0_on_first_call(self):
+        # The default version is VERSION1 after importing wikitextparser, in
+        # which `[^[\]]` would be a nested set.
+        lazy = LazyMethod('fullmatch', rb'\[[^[\]]*+\]')
+        self.assertIsNone(lazy._method)
+        self.assertIsNotNone(lazy(b'[a]'))
+        self.assertIsNotNone(lazy._method)
+        self.assertIsNone(lazy(b'[[a]'))
+        self.assertEqual(
+            [m[0] for m in LazyMethod('finditer', rb'a')(b'bab', 1, 2)],
+            [b'a'])
+
+
 if __name__ == '__main__':
     main()
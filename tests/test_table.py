@@ -408,6 +408,22 @@ class Data(unittest.TestCase):
         )
         self.assertEqual(table.data(), [['a', 'b|c']])
 
+    def test_data_is_cached_until_the_string_changes(self):
+        wt = WikiText('{|\n|a||b\n|-\n|c||d\n|}')
+        table = wt.tables[0]
+        data = table.data()
+        self.assertEqual([['a', 'b'], ['c', 'd']], data)
+        data[0][0] = 'x'
+        self.assertEqual(['a', 'b'], table.data(row=0))
+        self.assertEqual(['b', 'd'], table.data(column=1))
+        self.assertIs(table._match_table, table._match_table)
+        table.cells(1, 1).value = 'e'
+        self.assertEqual([['a', 'b'], ['c', 'e']], table.data())
+        # Any change of the shared string invalidates the cache.
+        wt.insert(0, 'text\n')
+        self.assertEqual('text\n{|\n|a||b\n|-\n|c||e\n|}', wt.string)
+        self.assertEqual('e', table.cells(1, 1).value)
+
     def test_unicode_data(self):
         r"""Note the \u201D character at line 2. wikitextparser/issues/9."""
         self.assertEqual(Table(
@@ -169,6 +169,44 @@ class TemplateTest(unittest.TestCase):
         self.assertEqual('|a', t.get_arg('1').string)
         self.assertEqual(None, t.get_arg('c'))
 
+    def test_get_args(self):
+        t = Template('{{t|a|b=c| b =d|e=f}}')
+        b, c, one = t.get_args(('b', 'c', ' 1 '))
+        self.assertEqual('| b =d', b.string)
+        self.assertIsNone(c)
+        self.assertEqual('|a', one.string)
+
+    def test_to_dict(self):
+        t = Template('{{t|k = a |b|<!--=-->c|[[d|e=f]]| 1 = x | k =}}')
+        self.assertEqual(
+            {'k': '', '1': 'x', '2': '<!--=-->c', '3': '[[d|e=f]]'},
+            t.to_dict())
+        self.assertEqual(
+            {'k ': ' a ', '1': 'b', '2': '<!--=-->c', '3': '[[d|e=f]]',
+             ' 1 ': ' x ', ' k ': ''},
+            t.to_dict(strip=False))
+        self.assertEqual(
+            {'k': ['a', ''], '1': ['b', 'x'], '2': ['<!--=-->c'],
+             '3': ['[[d|e=f]]']},
+            t.to_dict(duplicates='list'))
+        self.assertEqual({}, Template('{{t}}').to_dict())
+        with self.assertRaises(ValueError):
+            t.to_dict(duplicates='first')
+
+    def test_arg_index_is_updated_after_edits(self):
+        t = Template('{{t|a=1|b=2}}')
+        b = t.get_arg('b')
+        self.assertIs(b, t.get_arg('b'))
+        b.value = '3'
+        self.assertEqual('3', t.get_arg('b').value)
+        t.get_arg('a').string = ''
+        self.assertIsNone(t.get_arg('a'))
+        # The same text is inserted again after removing an argument.
+        del t[3:7]
+        t.insert(3, '|b=3')
+        self.assertEqual('{{t|b=3}}', t.string)
+        self.assertEqual('|b=3', t.get_arg('b').string)
+
     def test_name_contains_a_param_with_default(self):
         t = Template('{{t {{{p1|d1}}} | {{{p2|d2}}} }}')
         self.assertEqual('t {{{p1|d1}}} ', t.name)
@@ -166,6 +166,56 @@ class ShrinkSpanUpdate(TestCase):
         self.assertEqual(wls[1].string, '')
         self.assertEqual(wls[2].string, '')
 
+    def test_shrink_with_many_spans(self):
+        # Long span lists use enclosing_spans instead of scanning.
+        wt = WikiText('{{a|' + '{{b}}' * 20 + '{{c|{{d}}x}}}}')
+        c, d = wt.templates[-2:]
+        del c[9]
+        self.assertEqual(c.string, '{{c|{{d}}}}')
+        self.assertEqual(d.string, '{{d}}')
+        self.assertEqual(wt.templates[0].string, wt.string)
+        del wt.templates[1][:]
+        self.assertEqual(c.string, '{{c|{{d}}}}')
+        self.assertEqual(wt.templates[0].string, wt.string)
+
+    def test_shrink_in_a_table_wrapped_around_many_tables(self):
+        wt = WikiText('{|\n|a\n|}\n' * 16)
+        wt.tables[0].ancestors('Table')
+        wt.insert(0, '{|\n')
+        wt.insert(len(wt.string), '|}\n')
+        outer = wt.tables[-1]
+        self.assertEqual(outer.span, (0, 149))
+        del wt.tables[5][2:4]
+        self.assertEqual(outer.span, (0, 147))
+
+    def test_spans_whose_end_is_removed_are_closed(self):
+        for prefix in ('', '{{b}}' * 20):
+            wt = WikiText(prefix + '{{a}}bc{{d}}')
+            a = wt.templates[-2]
+            n = len(prefix)
+            del wt[n + 3:n + 6]
+            self.assertEqual(a.string, '')
+            self.assertEqual(wt.templates[-1].string, '{{d}}')
+
+    def test_pformat_after_removing_the_ends_of_spans(self):
+        wt = WikiText(
+            '{{#if:{{{p|{{#if:</ref>|}}}{{{p|-->\n{|\n|c||d\n|-\n!h\n|}\n\n'
+            '==s==\n\n* i\n=}}}}}}{{#if:\n* i\n')
+        wt[33:61] = '\n{|\n|c||d\n|-\n!h\n|}\nhttp://e.com </ref>'
+        wt.insert(68, '[[l|\n')
+        del wt[91:97]
+        del wt[22:45]
+        self.assertEqual(wt.parser_functions, [])
+        self.assertEqual(wt.pformat(), wt.string)
+
+    def test_spans_remain_sorted_after_removing_their_starts(self):
+        wt = WikiText('{{a|{{b}}}}')
+        a, b = wt.templates
+        del wt[0:6]
+        self.assertEqual(wt._type_to_spans['Template'], [[0, 3], [0, 5]])
+        self.assertEqual(b.string, 'b}}')
+        self.assertEqual(a.string, 'b}}}}')
+
 
 class CloseSubSpans(TestCase):
 
@@ -211,6 +261,34 @@ class ExpandSpanUpdate(TestCase):
         a.value = 'a'
         self.assertEqual('', pf.string)
 
+    def test_insert_with_many_spans(self):
+        # Long span lists use enclosing_spans instead of scanning.
+        wt = WikiText('{{a|' + '{{b}}' * 20 + '{{c|{{d}}}}}}')
+        c, d = wt.templates[-2:]
+        d.insert(3, 'x')
+        self.assertEqual(c.string, '{{c|{{dx}}}}')
+        self.assertEqual(wt.templates[0].string, wt.string)
+        wt.templates[1].insert(0, 'y')
+        self.assertEqual(c.string, '{{c|{{dx}}}}')
+        self.assertEqual(wt.templates[0].string, wt.string)
+
+    def test_insert_in_a_table_wrapped_around_many_tables(self):
+        wt = WikiText('{|\n|a\n|}\n' * 16)
+        wt.tables[0].ancestors('Table')
+        wt.insert(0, '{|\n')
+        wt.insert(len(wt.string), '|}\n')
+        outer = wt.tables[-1]
+        self.assertEqual(outer.span, (0, 149))
+        wt.tables[5].insert(3, 'b')
+        self.assertEqual(outer.span, (0, 150))
+
+    def test_insert_at_the_end_of_a_span_followed_by_another(self):
+        wt = WikiText('{{a}}' * 20)
+        t = wt.templates[3]
+        t.insert(5, 'x')
+        self.assertEqual(t.string, '{{a}}x')
+        self.assertEqual(wt.templates[4].string, '{{a}}')
+
 
 class Templates(TestCase):
 
@@ -1109,6 +1187,10 @@ class Tags(TestCase):
         tags = parsed.tags()
         self.assertEqual(tags[0].string, '<references />')
 
+    def test_end_tag_before_the_start_tag(self):
+        parsed = parse('</ref>t<ref>')
+        self.assertEqual([t.span for t in parsed.tags()], [(7, 12)])
+
     def test_start_only(self):
         """Some elements' end tag may be omitted in certain conditions.
 
@@ -1161,6 +1243,335 @@ class Ancestors(TestCase):
         a, b = parse('[[a]][[b]]').wikilinks
         self.assertEqual(b.ancestors(), [])
 
+    def test_ancestors_after_edit(self):
+        parsed = parse('x{{a|{{b}}}}')
+        b = parsed.templates[1]
+        self.assertEqual(b.nesting_level, 2)
+        b.insert(3, '|{{c}}')
+        del parsed[0]
+        c = parsed.templates[2]
+        self.assertEqual(c.string, '{{c}}')
+        self.assertEqual(
+            [a.string for a in c.ancestors()],
+            ['{{b|{{c}}}}', '{{a|{{b|{{c}}}}}}'],
+        )
+        self.assertEqual(c.nesting_level, 3)
+
+    def test_ancestors_after_wrapping_many_tables(self):
+        parsed = parse('{|\n|a\n|}\n' * 16)
+        self.assertEqual(parsed.tables[5].ancestors('Table'), [])
+        parsed.insert(0, '{|\n')
+        parsed.insert(len(parsed.string), '|}\n')
+        outer = parsed.tables[-1]
+        inner = parsed.tables[5]
+        self.assertEqual(
+            [a.span for a in inner.ancestors('Table')], [outer.span])
+        self.assertEqual(inner.parent('Table').span, outer.span)
+        self.assertEqual(
+            [n.span for n in parsed.enclosing(50, 'Table')],
+            [inner.span, outer.span])
+
+
+class Enclosing(TestCase):
+
+    def test_enclosing(self):
+        parsed = parse('x{{a|[[b|{{c|<!--d-->}}]]}}')
+        self.assertEqual(
+            [n.string for n in parsed.enclosing(15)],
+            ['<!--d-->', '{{c|<!--d-->}}', '[[b|{{c|<!--d-->}}]]',
+             '{{a|[[b|{{c|<!--d-->}}]]}}'],
+        )
+        self.assertEqual(
+            [n.string for n in parsed.enclosing(15, 'Template')],
+            ['{{c|<!--d-->}}', '{{a|[[b|{{c|<!--d-->}}]]}}'],
+        )
+        self.assertEqual(parsed.enclosing(0), [])
+
+    def test_enclosing_is_limited_to_sub_nodes(self):
+        wikilink = parse('{{a|[[b|{{c}}]]}}').wikilinks[0]
+        self.assertEqual(
+            [n.string for n in wikilink.enclosing(5)], ['{{c}}'])
+        self.assertEqual(wikilink.enclosing(0), [])
+
+    def test_node_at(self):
+        parsed = parse('x{{a|[[b]]}}')
+        self.assertIsNone(parsed.node_at(0))
+        self.assertEqual(parsed.node_at(-5).string, '[[b]]')
+        self.assertEqual(parsed.node_at(1).string, '{{a|[[b]]}}')
+        self.assertRaises(IndexError, parsed.node_at, 12)
+
+
+class LazyParsing(TestCase):
+
+    """Test the `types` argument of WikiText."""
+
+    def test_parsing_is_deferred(self):
+        wt = WikiText('[[a]]', types={'WikiLink'})
+        self.assertNotIn('_type_to_spans', wt.__dict__)
+        self.assertEqual(wt.wikilinks[0].string, '[[a]]')
+        self.assertIn('_type_to_spans', wt.__dict__)
+
+    def test_only_requested_types_are_parsed(self):
+        wt = WikiText('{{a|[[b|{{c}}]]}}<ref>[[d]]</ref>', types={'WikiLink'})
+        self.assertEqual(
+            [w.string for w in wt.wikilinks], ['[[b|{{c}}]]', '[[d]]'])
+        self.assertNotIn('Template', wt._type_to_spans)
+        self.assertEqual(
+            [t.string for t in wt.templates], ['{{a|[[b|{{c}}]]}}', '{{c}}'])
+
+    def test_edit_before_parsing(self):
+        wt = WikiText('{{a}}[[b]]', types={'Template'})
+        wt.insert(5, '[[c]]{{d}}')
+        self.assertEqual([t.string for t in wt.templates], ['{{a}}', '{{d}}'])
+        del wt[:5]
+        self.assertEqual(
+            [w.string for w in wt.wikilinks], ['[[c]]', '[[b]]'])
+
+    def test_edit_does_not_add_unparsed_types_twice(self):
+        wt = WikiText('[[a]]', types={'WikiLink'})
+        wt.wikilinks[0].text = '{{b}}'
+        self.assertEqual([t.string for t in wt.templates], ['{{b}}'])
+
+    def test_pformat(self):
+        s = '{{a|b=c|[[d|{{e|f}}]]}}'
+        self.assertEqual(
+            WikiText(s, types={'WikiLink'}).pformat(), WikiText(s).pformat())
+
+
+class ApplyEdits(TestCase):
+
+    """Test the apply_edits method."""
+
+    def test_apply_edits(self):
+        parsed = parse('{{a|b}} [[c|d]] {{e|f}} <!--g-->')
+        wikilink = parsed.wikilinks[0]
+        t1, t2 = parsed.templates
+        edits = [(20, 21, '{{h}}'), (0, 7, ''), (-8, None, '')]
+        self.assertEqual(parsed.apply_edits(edits), 3)
+        self.assertEqual(parsed.string, ' [[c|d]] {{e|{{h}}}} ')
+        self.assertEqual(wikilink.string, '[[c|d]]')
+        self.assertEqual(t1.string, '')
+        self.assertEqual(t2.string, '{{e|{{h}}}}')
+        self.assertEqual(
+            [t.string for t in parsed.templates], ['{{e|{{h}}}}', '{{h}}'])
+        self.assertEqual(parsed.comments, [])
+
+    def test_same_as_sequential_edits(self):
+        s = '{{a|b=c|[[d|{{e|f}}]]}}<!--g--> {{{h|i}}}'
+        edits = [(0, 2, '{{x'), (5, 7, ''), (9, 9, '{{y}}'), (14, 30, 'j')]
+        batched = parse(s)
+        self.assertEqual(batched.templates[0].apply_edits(edits), 4)
+        sequential = parse(s)
+        template = sequential.templates[0]
+        for start, stop, text in reversed(edits):
+            template[start:stop] = text
+        self.assertEqual(batched.string, sequential.string)
+        self.assertEqual(
+            batched._type_to_spans, sequential._type_to_spans)
+
+    def test_insertions_at_the_same_index_keep_their_order(self):
+        parsed = parse('ab')
+        parsed.apply_edits([(1, 1, '[[c]]'), (1, 1, '{{d}}')])
+        self.assertEqual(parsed.string, 'a[[c]]{{d}}b')
+        self.assertEqual(parsed.wikilinks[0].string, '[[c]]')
+        self.assertEqual(parsed.templates[0].string, '{{d}}')
+
+    def test_overlapping_edits(self):
+        parsed = parse('abc')
+        self.assertRaises(
+            ValueError, parsed.apply_edits, [(0, 2, ''), (1, 3, '')])
+        self.assertEqual(parsed.string, 'abc')
+        self.assertEqual(parsed.apply_edits([]), 0)
+
+
+class RemoveChildSpans(TestCase):
+
+    """Test that the stored spans of arguments and cells are removed."""
+
+    @staticmethod
+    def child_keys(parsed):
+        return {k for k in parsed._type_to_spans if isinstance(k, int)}
+
+    def test_repeated_edits(self):
+        parsed = parse('{{a|b}}\n{|\n|c\n|}')
+        parsed.templates[0].arguments
+        parsed.tables[0].cells()
+        self.assertEqual(len(self.child_keys(parsed)), 2)
+        for _ in range(1000):
+            parsed.templates[0].arguments
+            parsed.tables[0].cells()
+            parsed[:7] = '{{a|b}}'
+        self.assertEqual(len(self.child_keys(parsed)), 1)
+
+    def test_shrink_update_and_apply_edits(self):
+        parsed = parse('{{a|b}}{{c|d}}{{e|f}}')
+        t1, t2, t3 = parsed.templates
+        for t in t1, t2, t3:
+            t.arguments
+        keys = self.child_keys(parsed)
+        del parsed[:7]
+        self.assertEqual(keys - {id(t1._span)}, self.child_keys(parsed))
+        parsed.apply_edits([(7, 14, '')])
+        self.assertEqual({id(t2._span)}, self.child_keys(parsed))
+        self.assertEqual('{{c|d}}', parsed.string)
+        self.assertEqual(['|d'], [a.string for a in t2.arguments])
+
+
+class Shadow(TestCase):
+
+    """Test the _shadow property of the sub-nodes."""
+
+    def test_sub_nodes_are_not_parsed_again(self):
+        import wikitextparser._wikitext as wikitext
+        s = (
+            '{{a|b={{c|{{ }}}} <!-- {{d}} --> [[e|{{f}}]]|{{{g|h}}}'
+            '<ref>{{i}}</ref>|j { k}}'
+        )
+        parsed = parse(s)
+        templates = parsed.templates
+        parse_to_spans = wikitext.parse_to_spans
+        wikitext.parse_to_spans = None
+        try:
+            shadows = [bytes(t._shadow) for t in templates]
+            arguments = [a.string for a in templates[0].arguments]
+        finally:
+            wikitext.parse_to_spans = parse_to_spans
+        self.assertEqual(shadows, [
+            b'{{a|b=___________                ___________|'
+            b'_________________________|j _ k}}',
+            b'{{c|_____}}', b'{{f}}', b'{{i}}'])
+        self.assertEqual(arguments, [
+            '|b={{c|{{ }}}} <!-- {{d}} --> [[e|{{f}}]]',
+            '|{{{g|h}}}<ref>{{i}}</ref>', '|j { k'])
+        # The same as parsing their strings.
+        for t in templates:
+            self.assertEqual(Template(t.string)._shadow, t._shadow)
+
+    def test_lazy_type_to_spans_is_parsed(self):
+        wt = WikiText('[[a|{{b}}]]', types={'WikiLink'})
+        self.assertEqual(wt.wikilinks[0]._shadow, bytearray(b'[[a|_____]]'))
+        self.assertNotIn('Template', wt._type_to_spans)
+
+    def test_shadows_after_setting_a_string(self):
+        wt = WikiText('{{infobox}}\nText\n== A ==\nx\n')
+        wt.templates[0].string = (
+            '{| class="wikitable"\n|a\n|}\n== Lead ==\nfoo')
+        self.assertEqual([t.span for t in wt.tables], [(0, 26)])
+        self.assertEqual(
+            [s.title for s in wt.sections], ['', ' Lead ', ' A '])
+
+    def test_shadows_after_insert(self):
+        wt = WikiText('{{infobox}}\nText\n== A ==\nx\n')
+        wt.templates[0].insert(0, '\n{|\n|x\n|}\n')
+        self.assertEqual([t.span for t in wt.tables], [(1, 9)])
+        self.assertEqual([s.title for s in wt.sections], ['', ' A '])
+
+
+class IterNodes(TestCase):
+
+    """Test the iter_* methods."""
+
+    def test_same_as_the_properties(self):
+        parsed = parse(
+            '{{a|{{{b}}}}} {{#if:c|d}} [[e]] <!-- f --> http://g.h\n'
+            '== i ==\n{|\n|j\n{|\n|k\n|}\n|}\n=== l ===\n')
+        for name in (
+            'templates', 'parameters', 'parser_functions', 'wikilinks',
+            'comments', 'external_links', 'sections',
+        ):
+            strings = [n.string for n in getattr(parsed, name)]
+            iter_method = getattr(parsed, 'iter_' + name)
+            self.assertEqual(strings, [n.string for n in iter_method()])
+            self.assertEqual(
+                strings[::-1], [n.string for n in iter_method(reverse=True)])
+        self.assertEqual(
+            ['{|\n|j\n{|\n|k\n|}\n|}', '{|\n|k\n|}'],
+            [t.string for t in parsed.iter_tables()])
+
+    def test_nodes_are_created_lazily(self):
+        parsed = parse('{{a}}{{b}}{{c}}')
+        templates = parsed.iter_templates()
+        self.assertEqual('{{a}}', next(templates).string)
+        parsed.insert(0, '{{d}}')
+        # The spans were taken before the first node was yielded.
+        self.assertEqual(
+            ['{{b}}', '{{c}}'], [t.string for t in templates])
+
+    def test_sub_node(self):
+        parsed = parse('{{a}}{{b|{{c}}}}{{d}}')
+        b = parsed.templates[1]
+        self.assertEqual(
+            [t.string for t in b.templates],
+            [t.string for t in b.iter_templates()])
+
+    def test_editing_in_reverse(self):
+        parsed = parse('{{a|{{b}}}} {{c}}')
+        for template in parsed.iter_templates(reverse=True):
+            template.name = template.name.upper()
+        self.assertEqual('{{A|{{B}}}} {{C}}', parsed.string)
+
+    def test_removed_spans_are_skipped(self):
+        parsed = parse('{{a|{{b}}}} {{c}}')
+        names = []
+        for template in parsed.iter_templates():
+            names.append(template.name)
+            if template.name == 'a':
+                template.string = ''
+        self.assertEqual(['a', 'c'], names)
+        self.assertEqual(' {{c}}', parsed.string)
+
+
+class TemplateIndex(TestCase):
+
+    """Test templates_by_name and find_templates."""
+
+    def test_templates_by_name(self):
+        parsed = parse('{{a|{{b}}}} {{ Template:a <!-- c --> }} {{b_}}')
+        self.assertEqual(
+            {'a': ['{{a|{{b}}}}', '{{ Template:a <!-- c --> }}'],
+             'b': ['{{b}}', '{{b_}}']},
+            {name: [t.string for t in templates] for name, templates in
+             parsed.templates_by_name().items()})
+
+    def test_find_templates(self):
+        parsed = parse('{{a}} {{B_c}} {{d|{{b c}}}} {{T:b c#e}}')
+        self.assertEqual(
+            ['{{B_c}}', '{{b c}}', '{{T:b c#e}}'],
+            [t.string for t in parsed.find_templates(
+                ['b c', 'B c', 'x'], rm_namespaces=('T',),
+                capital_links=True)])
+        self.assertEqual(
+            ['{{a}}'], [t.string for t in parsed.find_templates('a')])
+        self.assertEqual([], parsed.find_templates([]))
+
+    def test_name_with_sub_nodes(self):
+        parsed = parse('{{a<!--|-->{{{1|}}}|b}}')
+        self.assertEqual(
+            ['a{{{1|}}}'], list(parsed.templates_by_name()))
+
+    def test_index_is_cached_until_modified(self):
+        parsed = parse('{{a}} {{b}}')
+        index = parsed._template_index(('Template',), False, None)
+        self.assertIs(
+            index, parsed._template_index(('Template',), False, None))
+        self.assertIsNot(
+            index, parsed._template_index(('Template',), True, None))
+        parsed.templates[1].name = 'a'
+        self.assertEqual(
+            ['{{a}}', '{{a}}'],
+            [t.string for t in parsed.find_templates(['a'])])
+        self.assertEqual([], parsed.find_templates(['b']))
+
+    def test_sub_node_index(self):
+        parsed = parse('{{a}} [[b|{{c}}]] {{c}}')
+        wikilink = parsed.wikilinks[0]
+        self.assertEqual(['{{c}}'], [
+            t.string for t in wikilink.find_templates('c')])
+        parsed.insert(0, '{{c}}')
+        self.assertEqual(['{{c}}'], [
+            t.string for t in wikilink.find_templates('c')])
+        self.assertEqual(3, len(parsed.find_templates('c')))
+
 
 if __name__ == '__main__':
     main()
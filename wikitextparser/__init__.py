@@ -3,6 +3,9 @@
 # Scheme: [N!]N(.N)*[{a|b|rc}N][.postN][.devN]
 __version__ = '0.21.6.dev0'
 
+from importlib import import_module as _import_module
+from sys import version_info as _version_info
+
 import regex as _regex
 
 from ._parameter import Parameter
@@ -14,6 +17,7 @@ from ._comment import Comment
 from . import _wikitext
 from ._table import Table
 from ._template import Template
+from ._template import normal_template_name as _normal_template_name
 from ._parser_function import ParserFunction
 from ._tag import Tag
 from ._tag import START_TAG_PATTERN as _START_TAG_PATTERN
@@ -21,6 +25,9 @@ from ._tag import END_TAG_PATTERN as _END_TAG_PATTERN
 from ._tag import START_TAG_FINDITER as _START_TAG_FINDITER
 from ._wikilist import WikiList
 from ._wikilist import LIST_PATTERN_FORMAT as _LIST_PATTERN_FORMAT
+from ._spans import ParserProfile, set_span_engine
+from ._cache import set_parse_cache
+from ._deadline import deadline, ParseTimeout
 
 
 _regex.DEFAULT_VERSION = _regex.VERSION1
@@ -28,6 +35,7 @@ _regex.DEFAULT_VERSION = _regex.VERSION1
 _wikitext.ExternalLink = ExternalLink
 _wikitext.WikiLink = WikiLink
 _wikitext.Template = Template
+_wikitext.normal_template_name = _normal_template_name
 _wikitext.Comment = Comment
 _wikitext.ParserFunction = ParserFunction
 _wikitext.Parameter = Parameter
@@ -42,3 +50,30 @@ _wikitext.START_TAG_FINDITER = _START_TAG_FINDITER
 
 WikiText = _wikitext.WikiText
 parse = WikiText
+
+# The names that are imported from their submodules on first access. These
+# submodules import multiprocessing, xml, etc. which are not needed for
+# parsing and would slow down `import wikitextparser`.
+_LAZY_NAMES = {
+    'SpanProfiler': '._profile',
+    'parse_many': '._pool',
+    'iter_pages': '._dump',
+    'map_pages': '._dump',
+}
+
+if _version_info >= (3, 7):  # PEP 562
+    def __getattr__(name: str):
+        module_name = _LAZY_NAMES.get(name)
+        if module_name is None:
+            raise AttributeError(
+                'module {!r} has no attribute {!r}'.format(__name__, name))
+        value = globals()[name] = getattr(
+            _import_module(module_name, __name__), name)
+        return value
+
+    def __dir__():
+        return sorted(globals().keys() | _LAZY_NAMES.keys())
+else:
+    from ._profile import SpanProfiler
+    from ._pool import parse_many
+    from ._dump import iter_pages, map_pages
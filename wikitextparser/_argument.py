@@ -1,8 +1,10 @@
 ﻿"""Define the Argument class."""
 
 
+from typing import List, Optional, Tuple
+
 from ._wikitext import SubWikiText
-from ._spans import parse_to_spans
+from ._spans import parse_to_spans, DEFAULT_PROFILE
 
 
 class Argument(SubWikiText):
@@ -15,6 +17,12 @@ class Argument(SubWikiText):
     See https://www.mediawiki.org/wiki/Help:Templates for more information.
     """
 
+    # (position, span of the parent, modifications) for the positional
+    # arguments that are created by TlPfMixin.arguments. The position is
+    # valid as long as the string of the parent has not changed, see
+    # PieceTable.span_version.
+    _position_cache = None  # type: Optional[Tuple[int, List[int], int]]
+
     @property
     def name(self) -> str:
         """Return argument's name.
@@ -25,6 +33,12 @@ class Argument(SubWikiText):
         if equal:
             return pipename[1:]
         # positional argument
+        position_cache = self._position_cache
+        if position_cache is not None:
+            position, parent_span, version = position_cache
+            if self._lststr.span_version(parent_span) <= version:
+                return str(position)
+            self._position_cache = None
         position = 1
         lststr0 = self._lststr[0]
         ss = self._span[0]
@@ -37,8 +51,10 @@ class Argument(SubWikiText):
             if '=' in arg_str:
                 # The argument may is still be positional if the equal sign is
                 # inside an atomic sub-spans.
-                byte_array = bytearray(arg_str, 'ascii', 'replace')
-                parse_to_spans(byte_array)  # Remove sub-spans from byte_array
+                profile = self._profile or DEFAULT_PROFILE
+                byte_array = profile.shadow(arg_str)
+                # Remove sub-spans from byte_array
+                parse_to_spans(byte_array, profile=profile)
                 if b'=' in byte_array:
                     # This is a keyword argument.
                     continue
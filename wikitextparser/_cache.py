@@ -0,0 +1,114 @@
+﻿"""Define the ParseCache class and the set_parse_cache function."""
+
+
+from collections import OrderedDict
+from hashlib import sha1
+from sys import getsizeof
+from typing import Optional, Tuple
+
+from . import _spans
+from ._spans import (
+    DEFAULT_PROFILE, parse_to_spans, ParserProfile, TypeToSpans,
+)
+
+
+class ParseCache:
+
+    """An LRU cache of the spans and the shadows of the parsed strings.
+
+    The entries are keyed by the SHA-1 digest of the string (and the name of
+    the span engine and the ParserProfile), so the strings themselves are not
+    kept in memory. Each entry holds the spans packed in arrays and the
+    shadow of the string as bytes. The least recently used entries are
+    evicted when the total size of the entries exceeds max_bytes.
+    """
+
+    __slots__ = (
+        'max_bytes', 'nbytes', 'hits', 'misses', 'evictions', '_entries',
+    )
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        # The total size of the cached arrays and shadows in bytes.
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # type: OrderedDict
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        """Return the string representation of self."""
+        return (
+            '{}(max_bytes={}, nbytes={}, entries={}, hits={}, misses={}, '
+            'evictions={})'.format(
+                type(self).__name__, self.max_bytes, self.nbytes,
+                len(self._entries), self.hits, self.misses, self.evictions)
+        )
+
+    def clear(self) -> None:
+        """Remove all the entries. The counters are not reset."""
+        self._entries.clear()
+        self.nbytes = 0
+
+    def parse(
+        self, string: str, profile: Optional[ParserProfile]=None,
+    ) -> Tuple[TypeToSpans, bytearray]:
+        """Return the spans and the shadow of the string.
+
+        The result is the same as
+        ``TypeToSpans(parse_to_spans(shadow, profile=profile))`` where
+        ``shadow = profile.shadow(string)``, but it is copied
+        from the cache when possible.
+        """
+        key = (
+            _spans.span_engine,
+            DEFAULT_PROFILE if profile is None else profile,
+            sha1(string.encode('utf-8', 'surrogatepass')).digest(),
+        )
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            type_to_spans, shadow, size = entry
+            return type_to_spans.copy_packed(), bytearray(shadow)
+        self.misses += 1
+        shadow = (profile or DEFAULT_PROFILE).shadow(string)
+        type_to_spans = TypeToSpans(parse_to_spans(shadow, profile=profile))
+        cached_shadow = bytes(shadow)
+        cached_spans = type_to_spans.copy_packed()
+        size = getsizeof(cached_shadow) + cached_spans.packed_size()
+        max_bytes = self.max_bytes
+        if size > max_bytes:
+            return type_to_spans, shadow
+        entries[key] = cached_spans, cached_shadow, size
+        nbytes = self.nbytes + size
+        while nbytes > max_bytes:
+            nbytes -= entries.popitem(last=False)[1][2]
+            self.evictions += 1
+        self.nbytes = nbytes
+        return type_to_spans, shadow
+
+
+# The process-wide cache that is used by WikiText objects. See set_parse_cache.
+parse_cache = None  # type: Optional[ParseCache]
+
+
+def set_parse_cache(max_bytes: Optional[int]) -> Optional[ParseCache]:
+    """Enable or disable the process-wide parse cache and return it.
+
+    When enabled, parsing a string that has been parsed before starts from
+    a copy of the cached spans instead of parsing it again. This is useful
+    when the same boilerplate text is parsed over and over.
+
+    :param max_bytes: The maximum total size of the cached spans and
+        shadows. Use None to disable the cache. Each call replaces the
+        previous cache with an empty one.
+    """
+    global parse_cache
+    parse_cache = None if max_bytes is None else ParseCache(max_bytes)
+    return parse_cache
@@ -3,13 +3,16 @@
 
 from typing import Match, MutableSequence, Union, Dict, List
 
-from regex import compile as regex_compile, VERBOSE, DOTALL
+from regex import VERBOSE, DOTALL
 
+from ._deadline import time_left
+from ._spans import LazyMethod
 from ._tag import ATTRS_MATCH, SubWikiTextWithAttrs
 
 
 # https://regex101.com/r/hB4dX2/17
-NEWLINE_CELL_MATCH = regex_compile(
+NEWLINE_CELL_MATCH = LazyMethod(
+    'match',
     rb"""
     # only for matching, not search
     \s*+
@@ -53,13 +56,14 @@ NEWLINE_CELL_MATCH = regex_compile(
         $
     )
     """,
-    VERBOSE
-).match
+    VERBOSE,
+)
 # https://regex101.com/r/qK1pJ8/5
 # In header rows, any "!!" is treated as "||".
 # See: https://github.com/wikimedia/mediawiki/blob/
 # 558a6b7372ee3b729265b7e540c0a92c1d936bcb/includes/parser/Parser.php#L1123
-INLINE_HAEDER_CELL_MATCH = regex_compile(
+INLINE_HAEDER_CELL_MATCH = LazyMethod(
+    'match',
     rb"""
     (?>
         # immediate closure of attrs
@@ -101,10 +105,11 @@ INLINE_HAEDER_CELL_MATCH = regex_compile(
         $
     )
     """,
-    VERBOSE | DOTALL
-).match
+    VERBOSE | DOTALL,
+)
 # https://regex101.com/r/hW8aZ3/7
-INLINE_NONHAEDER_CELL_MATCH = regex_compile(
+INLINE_NONHAEDER_CELL_MATCH = LazyMethod(
+    'match',
     rb"""
     \|\| # catch the matching pipe (style holder).
     (?>
@@ -133,8 +138,8 @@ INLINE_NONHAEDER_CELL_MATCH = regex_compile(
         )
     )
     """,
-    VERBOSE
-).match
+    VERBOSE,
+)
 
 
 class Cell(SubWikiTextWithAttrs):
@@ -155,15 +160,15 @@ class Cell(SubWikiTextWithAttrs):
         super().__init__(string, _type_to_spans, _span, _type)
         self._header = header
         if _match:
-            string = self.string
-            self._match_cache = _match, string
+            modifications = self._lststr.modifications
+            self._match_cache = _match, modifications
             if _attrs_match:
-                self._attrs_match_cache = _attrs_match, string
+                self._attrs_match_cache = _attrs_match, modifications
             else:
                 self._attrs_match_cache = \
-                    ATTRS_MATCH(_match['attrs']), string
+                    ATTRS_MATCH(_match['attrs']), modifications
         else:
-            self._attrs_match_cache = self._match_cache = None, None
+            self._attrs_match_cache = self._match_cache = None, -1
 
     @property
     def _match(self):
@@ -173,20 +178,20 @@ class Cell(SubWikiTextWithAttrs):
         may be something other than zero if the match is cached from the
         parent object (the initial value).
         """
-        cache_match, cache_string = self._match_cache
-        string = self.string
-        if cache_string == string:
+        cache_match, version = self._match_cache
+        lststr = self._lststr
+        if lststr.span_version(self._span) <= version:
             return cache_match
         shadow = self._shadow
         if shadow[0] == 10:  # ord('\n')
-            m = NEWLINE_CELL_MATCH(shadow)
+            m = NEWLINE_CELL_MATCH(shadow, timeout=time_left())
             self._header = m['sep'] == 33  # ord('!')
         elif self._header:
-            m = INLINE_HAEDER_CELL_MATCH(shadow)
+            m = INLINE_HAEDER_CELL_MATCH(shadow, timeout=time_left())
         else:
-            m = INLINE_NONHAEDER_CELL_MATCH(shadow)
-        self._match_cache = m, string
-        self._attrs_match_cache = None, None
+            m = INLINE_NONHAEDER_CELL_MATCH(shadow, timeout=time_left())
+        self._match_cache = m, lststr.modifications
+        self._attrs_match_cache = None, -1
         return m
 
     @property
@@ -208,13 +213,13 @@ class Cell(SubWikiTextWithAttrs):
     @property
     def _attrs_match(self):
         """Return the match object for attributes."""
-        cache, cache_string = self._attrs_match_cache
-        string = self.string
-        if cache_string == string:
+        cache, version = self._attrs_match_cache
+        lststr = self._lststr
+        if lststr.span_version(self._span) <= version:
             return cache
         s, e = self._match.span('attrs')
         attrs_match = ATTRS_MATCH(self._shadow, s, e)
-        self._attrs_match_cache = attrs_match, string
+        self._attrs_match_cache = attrs_match, lststr.modifications
         return attrs_match
 
     def set_attr(self, attr_name: str, attr_value: str) -> None:
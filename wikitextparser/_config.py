@@ -4,6 +4,8 @@
 from collections import defaultdict as _defaultdict
 from typing import List as _List
 
+from regex import escape as _escape
+
 
 def _plant_trie(strings: _List[str]) -> dict:
     """Create a Trie out of a list of words and return an atomic regex pattern.
@@ -40,10 +42,11 @@ def _pattern(trie: dict) -> str:
     alts = []
     for subpattern, chars in subpattern_to_chars.items():
         if len(chars) == 1:
-            alts.append(chars[0] + subpattern)
+            alts.append(_escape(chars[0]) + subpattern)
         else:
             chars.sort(reverse=True)
-            alts.append('[' + ''.join(chars) + ']' + subpattern)
+            alts.append(
+                '[' + ''.join(map(_escape, chars)) + ']' + subpattern)
 
     if len(alts) == 1:
         result = alts[0]
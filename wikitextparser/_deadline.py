@@ -0,0 +1,68 @@
+﻿"""Define the deadline context manager and the ParseTimeout exception."""
+
+
+from contextlib import contextmanager
+from threading import local
+from time import perf_counter
+from typing import Iterator, Optional
+
+
+class ParseTimeout(TimeoutError):
+
+    """Raised when parsing or evaluating a property outlasts the deadline."""
+
+
+class DeadlineState(local):
+
+    """Hold the deadline of each thread separately."""
+
+    # The perf_counter() value at which the active deadline expires, if any.
+    expires_at = None  # type: Optional[float]
+
+
+state = DeadlineState()
+
+
+def time_left() -> Optional[float]:
+    """Return the seconds left until the active deadline, or None.
+
+    Raise ParseTimeout if the deadline has already passed. The result is
+    meant to be passed as the `timeout` argument of the regex functions
+    that are called next, which is a no-op when there is no deadline.
+    """
+    expires_at = state.expires_at
+    if expires_at is None:
+        return None
+    left = expires_at - perf_counter()
+    if left <= 0:
+        raise ParseTimeout('the parse deadline has passed')
+    return left
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Limit the time that parsing may take inside the with statement.
+
+    While the deadline is active, the regex scans of parse_to_spans and of
+    the expensive properties, e.g. tables, sections, Table.data, and the
+    attributes and contents of tags, are stopped when it passes, and
+    ParseTimeout is raised. The time is also checked between the passes of
+    the parser. Nested deadlines cannot extend the enclosing one. The
+    deadline only applies to the current thread.
+
+    :param seconds: The number of seconds from now. None adds no deadline.
+    """
+    previous = state.expires_at
+    if seconds is not None:
+        new = perf_counter() + seconds
+        if previous is None or new < previous:
+            state.expires_at = new
+    try:
+        yield
+    except ParseTimeout:
+        raise
+    except TimeoutError as e:
+        # Raised by the regex module.
+        raise ParseTimeout(str(e)) from e
+    finally:
+        state.expires_at = previous
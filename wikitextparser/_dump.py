@@ -0,0 +1,210 @@
+﻿"""Define functions for reading MediaWiki XML dumps."""
+
+
+from bz2 import open as bz2_open
+from collections import namedtuple
+from gzip import open as gzip_open
+from os import getpid
+from queue import Full, Queue
+from threading import Event, Thread
+from time import perf_counter
+from typing import (
+    Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple, Union,
+)
+from xml.etree.ElementTree import iterparse
+
+from ._pool import _map_chunks, _tasks, ChunkResult, Task, WorkerStats
+from ._wikitext import SPAN_PARSER_TYPES, WikiText
+
+
+# The size of the blocks that are read and decompressed in the background.
+BLOCK_SIZE = 1 << 20
+# The maximum number of blocks that are read ahead.
+MAX_PENDING_BLOCKS = 8
+
+DumpPage = namedtuple('DumpPage', 'title ns revision_id wikitext')
+DumpPage.__doc__ = """A revision of a page in a dump.
+
+wikitext is a `WikiText` object that is parsed when it is used for the first
+time.
+"""
+
+# (title, ns, revision_id, text)
+Revision = Tuple[str, int, int, str]
+
+
+class _BackgroundReader:
+
+    """A file-like object that reads the given file in a separate thread.
+
+    The bz2, gzip, and file objects release the GIL while reading, therefore
+    reading and decompressing the dump overlaps with tokenizing the XML.
+    """
+
+    def __init__(self, file: BinaryIO) -> None:
+        self._blocks = Queue(MAX_PENDING_BLOCKS)  # type: Queue
+        self._block = b''
+        self._offset = 0
+        self._stop = Event()
+        self._thread = Thread(target=self._read_blocks, args=(file,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read_blocks(self, file: BinaryIO) -> None:
+        """Put the blocks of the file in self._blocks. Run in the thread."""
+        put = self._put
+        try:
+            while True:
+                block = file.read(BLOCK_SIZE)
+                if not put(block) or not block:
+                    return
+        except BaseException as e:
+            put(e)
+
+    def _put(self, item: Union[bytes, BaseException]) -> bool:
+        """Put the item in self._blocks. Return False if reading is stopped.
+        """
+        stop_is_set = self._stop.is_set
+        blocks_put = self._blocks.put
+        while not stop_is_set():
+            try:
+                blocks_put(item, timeout=.1)
+            except Full:
+                continue
+            return True
+        return False
+
+    def read(self, size: int=-1) -> bytes:
+        """Return at most size bytes. Return b'' at the end of the file."""
+        block = self._block
+        offset = self._offset
+        if offset == len(block):
+            block = self._blocks.get()
+            if isinstance(block, BaseException):
+                raise block
+            if not block:
+                # Let the following calls also return b''.
+                self._blocks.put(block)
+                return block
+            self._block = block
+            offset = 0
+        if size < 0:
+            size = len(block)
+        self._offset = offset + size
+        return block[offset:offset + size]
+
+    def close(self) -> None:
+        """Stop the reading thread and wait for it to end."""
+        self._stop.set()
+        self._thread.join()
+
+
+def _open(file: str) -> BinaryIO:
+    """Open the dump file. Decompress .bz2 and .gz files on the fly."""
+    if file.endswith('.bz2'):
+        return bz2_open(file)
+    if file.endswith('.gz'):
+        return gzip_open(file)
+    return open(file, 'rb')
+
+
+def _iter_revisions(file: Union[str, BinaryIO]) -> Iterator[Revision]:
+    """Yield (title, ns, revision_id, text) of each revision in the dump."""
+    if isinstance(file, str):
+        file = _open(file)
+        close = file.close
+    else:
+        close = None
+    reader = _BackgroundReader(file)
+    try:
+        root = None
+        title = ''
+        ns = 0
+        for event, element in iterparse(reader, ('start', 'end')):
+            if root is None:
+                root = element
+            if event == 'start':
+                continue
+            tag = element.tag.rpartition('}')[2]
+            if tag == 'revision':
+                revision_id = 0
+                text = ''
+                for child in element:
+                    child_tag = child.tag.rpartition('}')[2]
+                    if child_tag == 'id':
+                        revision_id = int(child.text)
+                    elif child_tag == 'text':
+                        text = child.text or ''
+                yield title, ns, revision_id, text
+                element.clear()
+            elif tag == 'title':
+                title = element.text or ''
+            elif tag == 'ns':
+                ns = int(element.text)
+            elif tag == 'page':
+                # Only keep one page in memory.
+                root.clear()
+    finally:
+        reader.close()
+        if close is not None:
+            close()
+
+
+def iter_pages(
+    file: Union[str, BinaryIO], types: Iterable[str]=None,
+) -> Iterator[DumpPage]:
+    """Yield a DumpPage for each revision in the given MediaWiki XML dump.
+
+    :param file: The path of the dump, e.g. a pages-articles.xml.bz2 file,
+        or a binary file object. Paths ending with .bz2 or .gz are
+        decompressed incrementally.
+    :param types: Passed to `WikiText`. The default is to parse all types.
+        In both cases parsing is deferred until the wikitext is used.
+
+    The dump is read in a background thread and only one page is kept in
+    memory at a time.
+    """
+    types = SPAN_PARSER_TYPES if types is None else frozenset(types)
+    for title, ns, revision_id, text in _iter_revisions(file):
+        yield DumpPage(title, ns, revision_id, WikiText(text, types=types))
+
+
+def _parse_page_chunk(task: Task) -> ChunkResult:
+    """Create the DumpPage of each revision and return extract's results.
+
+    See `_parse_chunk` in _pool.py.
+    """
+    extract, types, revisions = task
+    start = perf_counter()
+    results = [
+        extract(DumpPage(title, ns, revision_id, WikiText(text, types=types)))
+        for title, ns, revision_id, text in revisions
+    ]  # type: List[Any]
+    return (
+        getpid(), len(revisions),
+        sum(len(revision[3]) for revision in revisions),
+        perf_counter() - start, results,
+    )
+
+
+def map_pages(
+    file: Union[str, BinaryIO],
+    extract: Callable[[DumpPage], Any],
+    workers: int=None,
+    chunksize: int=64,
+    ordered: bool=True,
+    types: Iterable[str]=None,
+    stats: Dict[int, WorkerStats]=None,
+) -> Iterator[Any]:
+    """Yield extract's result for the DumpPage of each revision in the dump.
+
+    The current process reads and tokenizes the dump, while the pages are
+    parsed by `extract` in a pool of processes. See `parse_many` and
+    `iter_pages` for the description of the parameters.
+    """
+    types = SPAN_PARSER_TYPES if types is None else frozenset(types)
+    yield from _map_chunks(
+        _parse_page_chunk,
+        _tasks(_iter_revisions(file), extract, types, chunksize),
+        workers, ordered, stats,
+    )
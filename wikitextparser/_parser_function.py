@@ -33,12 +33,16 @@ class TlPfMixin(SubWikiText):
         if split_spans:
             arguments_append = arguments.append
             type_to_spans = self._type_to_spans
-            ss, se = span = self._span
+            span = self._span
+            ss = span[0]
             type_ = id(span)
             lststr = self._lststr
-            string = lststr[0]
+            modifications = lststr.modifications
             arg_spans = type_to_spans.setdefault(type_, [])
             span_tuple_to_span_get = {(s[0], s[1]): s for s in arg_spans}.get
+            # The positions of the positional arguments are found here, using
+            # the shadow, and are cached on the arguments. See Argument.name.
+            position = 1
             for arg_self_start, arg_self_end in split_spans:
                 s, e = arg_span = [ss + arg_self_start, ss + arg_self_end]
                 old_span = span_tuple_to_span_get((s, e))
@@ -47,8 +51,11 @@ class TlPfMixin(SubWikiText):
                 else:
                     arg_span = old_span
                 arg = Argument(lststr, type_to_spans, arg_span, type_)
-                arg._shadow_cache = (
-                    string[s:e], shadow[arg_self_start:arg_self_end])
+                arg_shadow = shadow[arg_self_start:arg_self_end]
+                arg._shadow_cache = arg_shadow, modifications
+                if 61 not in arg_shadow:  # ord('=')
+                    arg._position_cache = position, span, modifications
+                    position += 1
                 arguments_append(arg)
             arg_spans.sort()
         return arguments
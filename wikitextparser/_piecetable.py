@@ -0,0 +1,192 @@
+﻿"""Define the PieceTable class."""
+
+
+from bisect import bisect
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional
+
+
+# The preferred size of each chunk. Chunks that grow larger than twice this
+# size are split and the ones that become empty are removed.
+CHUNK_SIZE = 4096
+# The minimum number of span versions that are kept before pruning them.
+MIN_PRUNED_VERSIONS = 1024
+
+
+class PieceTable:
+
+    """The mutable string that is shared between a node and its sub-nodes.
+
+    The string is kept in chunks of about CHUNK_SIZE characters so that
+    replacing a part of it only copies the chunks that are involved instead of
+    the whole string. The full string is joined lazily, i.e. only when it is
+    requested, and is cached until the next change.
+
+    For backward compatibility the full string can also be accessed or
+    replaced using index 0, like the list that was used previously.
+
+    `modifications` is the number of times that the string has been changed.
+    `versions` maps the id of each span whose text has been changed to the
+    number of the last modification that changed it, see
+    WikiText._touch_spans. The spans that are not in it were last changed
+    by modification number `base_version`. The nodes that share the string
+    cache their results along with the value of `modifications` and use
+    span_version to invalidate them, i.e. without comparing the strings.
+    `versions` is pruned when its size exceeds `max_versions`.
+    """
+
+    __slots__ = (
+        '_chunks', '_starts', '_string', '_length', 'modifications',
+        'versions', 'base_version', 'max_versions',
+    )
+
+    def __init__(self, string: str) -> None:
+        """Initialize the object with the given string."""
+        self._string = string  # type: Optional[str]
+        self._chunks = None  # type: Optional[List[str]]
+        self._starts = None  # type: Optional[List[int]]
+        self._length = len(string)
+        self.modifications = self.base_version = 0
+        self.versions = {}  # type: Dict[int, int]
+        self.max_versions = MIN_PRUNED_VERSIONS
+
+    def __getitem__(self, index: int) -> str:
+        """Return the full string. index must be 0."""
+        if index != 0:
+            raise IndexError('PieceTable index out of range')
+        string = self._string
+        if string is None:
+            string = self._string = ''.join(self._chunks)
+        return string
+
+    def __setitem__(self, index: int, string: str) -> None:
+        """Replace the full string. index must be 0."""
+        if index != 0:
+            raise IndexError('PieceTable index out of range')
+        self._reset(string)
+
+    def _reset(self, string: str) -> None:
+        """Replace the full string and count it as a modification.
+
+        All the spans are considered changed.
+        """
+        modifications = self.modifications
+        self.__init__(string)
+        self.modifications = self.base_version = modifications + 1
+
+    def __reduce__(self) -> tuple:
+        """Copy or pickle the string without the versions of the spans.
+
+        The copied spans are new objects, so they are all considered changed
+        by the last modification.
+        """
+        return type(self), (self[0],), self.modifications
+
+    def __setstate__(self, modifications: int) -> None:
+        """Set the state of a copied or unpickled object."""
+        self.modifications = self.base_version = modifications
+
+    def span_version(self, span: List[int]) -> int:
+        """Return the number of the last modification that changed the span.
+
+        A result that is cached along with the value of `modifications` is
+        valid as long as it is not less than the version of its span.
+        """
+        return self.versions.get(id(span), self.base_version)
+
+    def prune_versions(self, live_ids: Iterable[int]) -> None:
+        """Forget the versions of the spans that are not in live_ids.
+
+        The spans that are removed may still be used by some nodes, so the
+        base_version is increased to the current modification.
+        """
+        versions = self.versions
+        self.versions = {
+            i: versions[i] for i in live_ids if i in versions}
+        self.base_version = self.modifications
+        self.max_versions = max(MIN_PRUNED_VERSIONS, 2 * len(self.versions))
+
+    def __len__(self) -> int:
+        """Return the length of the full string."""
+        return self._length
+
+    def __repr__(self) -> str:
+        """Return the string representation of self."""
+        return 'PieceTable({!r})'.format(self[0])
+
+    def _chunk_starts(self) -> List[int]:
+        """Return the start offset of each chunk. Create the chunks if needed.
+        """
+        starts = self._starts
+        if starts is not None:
+            return starts
+        chunks = self._chunks
+        if chunks is None:
+            string = self._string
+            chunks = self._chunks = [
+                string[i:i + CHUNK_SIZE]
+                for i in range(0, len(string), CHUNK_SIZE)
+            ] or ['']
+        starts = self._starts = [0]
+        starts.extend(accumulate(map(len, chunks[:-1])))
+        return starts
+
+    def substring(self, start: int, stop: int) -> str:
+        """Return self[0][start:stop] without joining all the chunks."""
+        string = self._string
+        if string is not None:
+            return string[start:stop]
+        if not 0 <= start <= stop <= self._length:
+            # E.g. the span of a removed node. Use the slicing rules of str.
+            return self[0][start:stop]
+        starts = self._chunk_starts()
+        chunks = self._chunks
+        i = bisect(starts, start) - 1
+        j = bisect(starts, stop, i) - 1
+        if i == j:
+            offset = starts[i]
+            return chunks[i][start - offset:stop - offset]
+        return (
+            chunks[i][start - starts[i]:]
+            + ''.join(chunks[i + 1:j])
+            + chunks[j][:stop - starts[j]]
+        )
+
+    def splice(self, start: int, stop: int, value: str) -> None:
+        """Replace self[0][start:stop] with the given value.
+
+        Only the chunks that contain the replaced part are copied.
+        """
+        if not 0 <= start <= stop <= self._length:
+            string = self[0]
+            self._reset(string[:start] + value + string[stop:])
+            return
+        self.modifications += 1
+        starts = self._chunk_starts()
+        chunks = self._chunks
+        i = bisect(starts, start) - 1
+        j = bisect(starts, stop, i) - 1
+        chunk = (
+            chunks[i][:start - starts[i]] + value
+            + chunks[j][stop - starts[j]:]
+        )
+        if len(chunk) > 2 * CHUNK_SIZE:
+            new_chunks = [
+                chunk[k:k + CHUNK_SIZE]
+                for k in range(0, len(chunk), CHUNK_SIZE)
+            ]
+        elif chunk or len(chunks) == j - i + 1:
+            new_chunks = [chunk]
+        else:
+            new_chunks = []
+        chunks[i:j + 1] = new_chunks
+        self._length += len(value) + start - stop
+        self._string = None
+        if len(new_chunks) == 1 and i == j:
+            # Only the starts of the following chunks need to be shifted.
+            shift = len(value) + start - stop
+            if shift:
+                for k in range(i + 1, len(starts)):
+                    starts[k] += shift
+        else:
+            self._starts = None
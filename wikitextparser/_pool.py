@@ -0,0 +1,176 @@
+﻿"""Define the parse_many function."""
+
+
+from collections import deque
+from itertools import islice
+from multiprocessing import cpu_count, Pool
+from os import getpid
+from queue import Queue
+from time import perf_counter
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union,
+)
+
+from ._wikitext import WikiText
+
+
+# (extract, types, items), e.g. the items are strings in parse_many
+Task = Tuple[Callable[[Any], Any], Optional[frozenset], List[Any]]
+# (pid, number of pages, number of characters, seconds, results)
+ChunkResult = Tuple[int, int, int, float, List[Any]]
+
+
+class WorkerStats:
+
+    """The throughput of one of the worker processes of `parse_many`."""
+
+    __slots__ = 'pages', 'chars', 'seconds'
+
+    def __init__(self) -> None:
+        self.pages = 0
+        self.chars = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return 'WorkerStats(pages={}, chars={}, seconds={:.3f})'.format(
+            self.pages, self.chars, self.seconds)
+
+    @property
+    def pages_per_second(self) -> float:
+        """Return the number of parsed pages per second."""
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chars_per_second(self) -> float:
+        """Return the number of parsed characters per second."""
+        return self.chars / self.seconds if self.seconds else 0.0
+
+
+def _parse_chunk(task: Task) -> ChunkResult:
+    """Parse the strings of a chunk and return the extracted results.
+
+    Also return the pid, the number of pages, the number of characters, and
+    the time spent, so that the stats can be aggregated in the main process.
+    """
+    extract, types, strings = task
+    start = perf_counter()
+    results = [extract(WikiText(s, types=types)) for s in strings]
+    return (
+        getpid(), len(strings), sum(map(len, strings)),
+        perf_counter() - start, results,
+    )
+
+
+def _tasks(
+    items: Iterable[Any],
+    extract: Callable[[Any], Any],
+    types: Optional[frozenset],
+    chunksize: int,
+) -> Iterator[Task]:
+    """Yield the argument of the chunk function for each chunk of items."""
+    items = iter(items)
+    chunk = list(islice(items, chunksize))
+    while chunk:
+        yield extract, types, chunk
+        chunk = list(islice(items, chunksize))
+
+
+def parse_many(
+    strings: Iterable[str],
+    extract: Callable[[WikiText], Any],
+    workers: int=None,
+    chunksize: int=64,
+    ordered: bool=True,
+    types: Iterable[str]=None,
+    stats: Dict[int, WorkerStats]=None,
+) -> Iterator[Any]:
+    """Parse the strings in a pool of processes and yield extract's results.
+
+    `extract` is called in the worker processes with the `WikiText` object of
+    each string. Only its result is sent back, therefore it should be
+    picklable, e.g. a string or a list of strings, and extract itself should
+    be a module-level function.
+
+    The strings are consumed lazily; only a few chunks per worker are queued
+    at any time, so `strings` can be a generator over a large dump.
+
+    :param workers: The number of worker processes. The default is the number
+        of CPUs. If it is 1, the strings are parsed in the current process.
+    :param chunksize: The number of strings that are sent to a worker at once.
+    :param ordered: If False, yield the results of each chunk as soon as it is
+        ready. The results are no longer in the order of the input strings.
+    :param types: Passed to `WikiText`. See `WikiText.__init__`.
+    :param stats: A dict that is updated with the `WorkerStats` of each
+        worker, keyed by its pid, as the results are consumed.
+    """
+    yield from _map_chunks(
+        _parse_chunk,
+        _tasks(
+            strings, extract, None if types is None else frozenset(types),
+            chunksize),
+        workers, ordered, stats,
+    )
+
+
+def _map_chunks(
+    function: Callable[[Any], ChunkResult],
+    tasks: Iterable[Any],
+    workers: Optional[int],
+    ordered: bool,
+    stats: Optional[Dict[int, WorkerStats]],
+) -> Iterator[Any]:
+    """Call function on each task in a pool and yield the chunk results.
+
+    See `parse_many` for the description of the other parameters.
+    """
+    if workers == 1:
+        for chunk_result in map(function, tasks):
+            yield from _chunk_results(chunk_result, stats)
+        return
+    if workers is None:
+        workers = cpu_count()
+    max_pending = 2 * workers
+    with Pool(workers) as pool:
+        if ordered:
+            pending = deque()  # type: deque
+            for task in tasks:
+                pending.append(pool.apply_async(function, (task,)))
+                if len(pending) >= max_pending:
+                    yield from _chunk_results(pending.popleft().get(), stats)
+            while pending:
+                yield from _chunk_results(pending.popleft().get(), stats)
+            return
+        done = Queue()  # type: Queue
+        pending_count = 0
+        for task in tasks:
+            pool.apply_async(
+                function, (task,),
+                callback=done.put, error_callback=done.put)
+            pending_count += 1
+            if pending_count >= max_pending:
+                pending_count -= 1
+                yield from _chunk_results(done.get(), stats)
+        while pending_count:
+            pending_count -= 1
+            yield from _chunk_results(done.get(), stats)
+
+
+def _chunk_results(
+    chunk_result: Union[ChunkResult, BaseException],
+    stats: Optional[Dict[int, WorkerStats]],
+) -> List[Any]:
+    """Return the results of a parsed chunk and update stats.
+
+    Raise the exception if the chunk has failed.
+    """
+    if isinstance(chunk_result, BaseException):
+        raise chunk_result
+    pid, pages, chars, seconds, results = chunk_result
+    if stats is not None:
+        worker_stats = stats.get(pid)
+        if worker_stats is None:
+            worker_stats = stats[pid] = WorkerStats()
+        worker_stats.pages += pages
+        worker_stats.chars += chars
+        worker_stats.seconds += seconds
+    return results
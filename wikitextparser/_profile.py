@@ -0,0 +1,193 @@
+﻿"""Define the SpanProfiler class."""
+
+
+from time import perf_counter
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple,
+)
+
+from . import _spans
+from ._spans import DEFAULT_PROFILE, ParserProfile
+
+
+class PhaseStats:
+
+    """The statistics of one phase of parse_to_spans.
+
+    - scans: The number of times that the regex of the phase has been run
+        over a region of the string.
+    - matches: The total number of the matches of those runs.
+    - spans: The number of the spans that have been found. Some phases, e.g.
+        the removal of single braces, only remove matches and find no spans.
+    - seconds: The time spent in the phase, excluding the time spent in the
+        phases that are called from it.
+    """
+
+    __slots__ = 'scans', 'matches', 'spans', 'seconds'
+
+    def __init__(self) -> None:
+        self.scans = 0
+        self.matches = 0
+        self.spans = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return 'PhaseStats(scans={}, matches={}, spans={}, seconds={:.6f})'\
+            .format(self.scans, self.matches, self.spans, self.seconds)
+
+
+class SpanProfiler:
+
+    """Collect per-phase statistics of parse_to_spans.
+
+    Use it as a context manager. While active, parse_to_spans delegates to
+    it, and the parsing functions of _spans use its finditer and engine
+    methods to record a PhaseStats for each phase in `phases` and for each
+    (phase, pass) pair in `passes`:
+
+        with SpanProfiler() as profiler:
+            parse(text).templates
+        print(profiler.phases['templates'])
+
+    The phases of the 'regex' span engine are 'comments', 'extension_tags',
+    'wikilinks', and the phases of `parse_pm_tl_pf`:
+    'invalid_template_names', 'single_braces', 'parser_functions',
+    'parameters', and 'templates'. The pass is the number of the scans
+    of the same phase over the same region before the current one, i.e. the
+    nesting level that the scan resolves. The 'stack' span engine visits the
+    string only once, so it is recorded as a single 'stack' phase.
+
+    When no profiler is active, the only cost is a single check at the start
+    of each of those functions.
+    """
+
+    __slots__ = (
+        'phases', 'passes', 'parses', 'seconds', '_inner', '_scans',
+        '_previous',
+    )
+
+    def __init__(self) -> None:
+        self.phases = {}  # type: Dict[str, PhaseStats]
+        self.passes = {}  # type: Dict[Tuple[str, int], PhaseStats]
+        # The number of parse_to_spans calls and the total time spent in them.
+        self.parses = 0
+        self.seconds = 0.0
+        # The total time recorded so far. Used to exclude the time of the
+        # inner phases from the enclosing ones.
+        self._inner = 0.0
+        # (phase, start, end) -> the number of scans of the region in the
+        # current parse_to_spans call
+        self._scans = {}  # type: Dict[Tuple[str, Any, Any], int]
+        self._previous = None  # type: Optional[SpanProfiler]
+
+    def __repr__(self) -> str:
+        return 'SpanProfiler(parses={}, seconds={:.6f}, phases={})'.format(
+            self.parses, self.seconds, self.phases)
+
+    def __enter__(self) -> 'SpanProfiler':
+        self._previous = _spans.span_profiler
+        _spans.span_profiler = self
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        _spans.span_profiler = self._previous
+        self._previous = None
+
+    def clear(self) -> None:
+        """Remove all the collected statistics."""
+        self.phases.clear()
+        self.passes.clear()
+        self.parses = 0
+        self.seconds = 0.0
+        self._inner = 0.0
+
+    def _record(
+        self, phase: str, pass_: int, seconds: float, matches: int,
+        spans: int,
+    ) -> None:
+        """Add a scan of the given phase to the statistics."""
+        self._inner += seconds
+        for stats_dict, key in (
+            (self.phases, phase), (self.passes, (phase, pass_)),
+        ):
+            stats = stats_dict.get(key)
+            if stats is None:
+                stats = stats_dict[key] = PhaseStats()
+            stats.scans += 1
+            stats.matches += matches
+            stats.spans += spans
+            stats.seconds += seconds
+
+    def parse_to_spans(
+        self, byte_array: bytearray, types: Optional[Iterable[str]]=None,
+        profile: Optional[ParserProfile]=None,
+    ) -> Dict[str, List[List[int]]]:
+        """Return the result of _spans.find_spans and profile it."""
+        self.parses += 1
+        self._scans.clear()
+        t0 = perf_counter()
+        try:
+            return _spans.find_spans(
+                byte_array, types, profile or DEFAULT_PROFILE)
+        finally:
+            self.seconds += perf_counter() - t0
+
+    def finditer(
+        self, phase: str, finditer: Callable, finds_spans: bool=True,
+    ) -> Callable:
+        """Return a finditer that records its scans as the given phase.
+
+        Used by the functions of _spans while the profiler is active.
+
+        :param finds_spans: False if the matches of the phase are only
+            removed and are not spans.
+        """
+        scans = self._scans
+        record = self._record
+
+        def profiled_finditer(
+            string: bytearray, pos: Optional[int]=None,
+            endpos: Optional[int]=None, **kwargs: Any
+        ) -> Iterator[Any]:
+            # The pass is the number of the previous scans of the region.
+            key = phase, pos, endpos
+            pass_ = scans.get(key, 0)
+            scans[key] = pass_ + 1
+            n = 0
+            t0 = perf_counter()
+            inner = self._inner
+            try:
+                for match in finditer(string, pos, endpos, **kwargs):
+                    n += 1
+                    yield match
+            finally:
+                record(
+                    phase, pass_,
+                    perf_counter() - t0 - (self._inner - inner),
+                    n, n if finds_spans else 0)
+
+        return profiled_finditer
+
+    def engine(
+        self, phase: str, engine: Callable,
+        span_lists: Tuple[List[List[int]], ...],
+    ) -> Callable:
+        """Return a span engine that records each call as the given phase.
+
+        :param span_lists: The lists that the engine adds the spans to.
+        """
+        record = self._record
+
+        def profiled_engine(
+            byte_array: bytearray, start: int, end: Optional[int],
+            *appends: Callable, profile: ParserProfile
+        ) -> None:
+            found = sum(map(len, span_lists))
+            t0 = perf_counter()
+            inner = self._inner
+            engine(byte_array, start, end, *appends, profile=profile)
+            n = sum(map(len, span_lists)) - found
+            record(
+                phase, 0, perf_counter() - t0 - (self._inner - inner), n, n)
+
+        return profiled_engine
@@ -1,52 +1,107 @@
 ﻿"""Define the functions required for parsing wikitext into spans."""
 
 
-from typing import Dict, List, Callable, Any, Optional
+from array import array
+from bisect import bisect, bisect_left
+from itertools import chain, islice
+from sys import getsizeof
+from typing import Dict, List, Callable, Any, Optional, Iterable, Union
 
-from regex import VERBOSE, IGNORECASE
+from regex import VERBOSE, IGNORECASE, VERSION0
 from regex import compile as regex_compile
 
+from ._config import (
+    _bare_external_link_schemes, _parsable_tag_extensions, _parser_functions,
+    _unparsable_tag_extensions, regex_pattern,
+)
+from ._deadline import time_left
+
+
+class LazyMethod:
+
+    """A method of a regex pattern that is compiled on its first call.
+
+    Used for the patterns that are only needed by some features, e.g. tables
+    or tags, so that importing the package does not compile them. VERSION0
+    is always passed to the compiler, see compile_profile.
+    """
+
+    __slots__ = 'name', 'pattern', 'flags', '_method'
+
+    def __init__(
+        self, name: str, pattern: Union[bytes, str], flags: int=0,
+    ) -> None:
+        self.name = name
+        self.pattern = pattern
+        self.flags = flags
+        self._method = None  # type: Optional[Callable]
+
+    def __repr__(self) -> str:
+        return 'LazyMethod({!r}, {!r}, {!r})'.format(
+            self.name, self.pattern, self.flags)
+
+    @property
+    def method(self) -> Callable:
+        """Return the method of the compiled pattern. Compile it if needed.
+
+        Hot loops should call this method directly to avoid the overhead of
+        calling self.
+        """
+        method = self._method
+        if method is None:
+            method = self._method = getattr(
+                regex_compile(self.pattern, self.flags | VERSION0), self.name)
+        return method
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return (self._method or self.method)(*args, **kwargs)
+
 
 # According to https://www.mediawiki.org/wiki/Manual:$wgLegalTitleChars
 # illegal title characters are: r'[]{}|#<>[\u0000-\u0020]'
 VALID_TITLE_CHARS_PATTERN = rb'[^\x00-\x1f\|\{\}\[\]<>\n]++'
 # Templates
-TEMPLATE_FINDITER = regex_compile(
+TEMPLATE_PATTERN = (
     rb'\{\{\s*+'
     # name
     + VALID_TITLE_CHARS_PATTERN + rb'''
     \s*+
     (?>\|[^{}]*+)?+  # optional args
-    \}\}''',
-    VERBOSE,
-).finditer
-INVALID_TL_NAME_FINDITER = regex_compile(
-    rb'''
+    \}\}'''
+)
+TEMPLATE_FINDITER = regex_compile(TEMPLATE_PATTERN, VERBOSE).finditer
+INVALID_TL_NAME_PATTERN = rb'''
     \{\{
     [\s_]*+ # invalid name
     (?>\|[^{}]*)?+  # optional args
     \}\}
-    ''',
-    VERBOSE,
-).finditer
+    '''
+INVALID_TL_NAME_FINDITER = regex_compile(
+    INVALID_TL_NAME_PATTERN, VERBOSE).finditer
 # Parameters
-PARAMETER_FINDITER = regex_compile(
-    rb'''
+PARAMETER_PATTERN = rb'''
     \{\{\{
     [^{}]*+
     \}\}\}
-    ''',
-    VERBOSE,
-).finditer
+    '''
+PARAMETER_FINDITER = regex_compile(PARAMETER_PATTERN, VERBOSE).finditer
 # Parser functions
 # According to https://www.mediawiki.org/wiki/Help:Magic_words
 # See also:
 # https://translatewiki.net/wiki/MediaWiki:Sp-translate-data-MagicWords/fa
-PARSER_FUNCTION_FINDITER = regex_compile(
-    rb'\{\{\s*+'
+
+
+def parser_function_pattern(names_pattern: bytes) -> bytes:
+    """Return the pattern of parser functions with the given names."""
+    return (
+        rb'\{\{\s*+(?>\#[^{}\s:]++|' + names_pattern + rb')'
+        rb':[^{}]*+\}\}'
+    )
+
+
+PARSER_FUNCTION_PATTERN = parser_function_pattern(
     # generated pattern: _config.regex_pattern(_config._parser_functions)
-    # with \#[^{}\s:]++ added manually.
-    rb'(?>\#[^{}\s:]++|u(?>rlencode|c(?:first)?+)|s(?>ubst|afesubst)|raw|p(?>l'
+    rb'(?>u(?>rlencode|c(?:first)?+)|s(?>ubst|afesubst)|raw|p(?>l'
     rb'ural|ad(?>right|left))|nse?+|msg(?:nw)?+|l(?>ocalurl|c(?:first)?+)|int|'
     rb'g(?>rammar|ender)|f(?>ullurl|ormatnum|ilepath)|canonicalurl|anchorencod'
     rb'e|TALK(?>SPACEE?+|PAGENAMEE?+)|SUB(?>PAGENAMEE?+|JECT(?>SPACEE?+|PAGENA'
@@ -57,9 +112,8 @@ PARSER_FUNCTION_FINDITER = regex_compile(
     rb'MBER|E)?+)|FULLPAGENAMEE?+|D(?>ISPLAYTITLE|EFAULT(?>SORT(?:KEY)?+|CATEG'
     rb'ORYSORT))|CASCADINGSOURCES|BASEPAGENAMEE?+|ARTICLE(?>SPACEE?+|PAGENAMEE'
     rb'?+))'
-    # end of generated part
-    rb':[^{}]*+\}\}',
-).finditer
+)
+PARSER_FUNCTION_FINDITER = regex_compile(PARSER_FUNCTION_PATTERN).finditer
 # External links
 INVALID_EXTLINK_CHARS = rb' \t\n<>\[\]"'
 VALID_EXTLINK_CHARS = rb'[^' + INVALID_EXTLINK_CHARS + rb']++'
@@ -72,33 +126,62 @@ BARE_EXTLINK_SCHEMES_PATTERN = (
     rb'?>s://|://)|http(?>s://|://)|g(?>opher://|it://|eo:)|ftp(?>s://|://)|bi'
     rb'tcoin:)'
 )
-BARE_EXTERNALLINK_PATTERN = (
-    rb'(?>' + BARE_EXTLINK_SCHEMES_PATTERN + rb')' + VALID_EXTLINK_CHARS
-)
+
+
+def bare_externallink_pattern(schemes_pattern: bytes) -> bytes:
+    """Return the pattern of bare external links with the given schemes."""
+    return rb'(?>' + schemes_pattern + rb')' + VALID_EXTLINK_CHARS
+
+
+def externallink_pattern(schemes_pattern: bytes) -> bytes:
+    """Return the pattern of bare and bracketed external links."""
+    return (
+        rb'(?:' + bare_externallink_pattern(schemes_pattern) + rb'|'
+        rb'\[(?>//|' + schemes_pattern + rb')' + VALID_EXTLINK_CHARS
+        + rb'\ *+[^\]\n]*+\])'
+    )
+
+
+BARE_EXTERNALLINK_PATTERN = bare_externallink_pattern(
+    BARE_EXTLINK_SCHEMES_PATTERN)
+EXTERNALLINK_FINDITER = LazyMethod(
+    'finditer', externallink_pattern(BARE_EXTLINK_SCHEMES_PATTERN), IGNORECASE)
+
+
 # Wikilinks
 # https://www.mediawiki.org/wiki/Help:Links#Internal_links
-WIKILINK_FINDITER = regex_compile(
-    rb'''
-    \[\[
-    (?!\ *+''' + BARE_EXTERNALLINK_PATTERN + rb')'
-    + VALID_TITLE_CHARS_PATTERN.replace(rb'\{\}', rb'', 1) + rb'''
-    (?:
-        \]\]
-        |
-        \| # Text of the wikilink
-        (?> # Any character that is not the start of another wikilink
-            [^[\]]+
-            |
-            \[(?!\[)
+def wikilink_pattern(schemes_pattern: bytes) -> bytes:
+    """Return the pattern of wikilinks.
+
+    The targets of wikilinks cannot start with external links of the given
+    schemes.
+    """
+    return (
+        rb'''
+        \[\[
+        (?!\ *+''' + bare_externallink_pattern(schemes_pattern) + rb')'
+        + VALID_TITLE_CHARS_PATTERN.replace(rb'\{\}', rb'', 1) + rb'''
+        (?:
+            \]\]
             |
-            # this group is lazy, therefore \] is not followed by another \]
-            \]
-        )*?
-        \]\]
+            \| # Text of the wikilink
+            (?> # Any character that is not the start of another wikilink
+                [^[\]]+
+                |
+                \[(?!\[)
+                |
+                # the group is lazy, therefore \] is not followed by another \]
+                \]
+            )*?
+            \]\]
+        )
+        '''
     )
-    ''',
-    IGNORECASE | VERBOSE,
-).finditer
+
+
+WIKILINK_PATTERN = wikilink_pattern(BARE_EXTLINK_SCHEMES_PATTERN)
+WIKILINK_FINDITER = regex_compile(
+    WIKILINK_PATTERN, IGNORECASE | VERBOSE).finditer
 
 # generated pattern: _config.regex_pattern(_config._parsable_tag_extensions)
 PARSABLE_TAG_EXTENSIONS_PATTERN = (
@@ -110,23 +193,36 @@ UNPARSABLE_TAG_EXTENSIONS_PATTERN = (
     rb'(?>t(?>imeline|emplatedata)|s(?>yntaxhighlight|ource|core)|pre|nowiki|m'
     rb'ath|hiero|graph|charinsert)'
 )
-TAG_BY_NAME_PATTERN = (
-    rb'< (' + UNPARSABLE_TAG_EXTENSIONS_PATTERN + rb'|(' +
-    PARSABLE_TAG_EXTENSIONS_PATTERN + rb''')) \b [^>]*+ (?<!/)>
-    # content
-    (?>
-        # Contains no other tags or
-        [^<]++
-        |
-        # the nested-tag is something else or
-        < (?! \1 \b [^>]*+ >)
-        |
-        # the nested tag closes itself
-        <\1\b[^>]*/>
-    )*?
-    # tag-end
-    </\1\s*+>'''
-)
+
+
+def tag_by_name_pattern(
+    unparsable_pattern: bytes, parsable_pattern: bytes,
+) -> bytes:
+    """Return the pattern of the extension tags with the given names.
+
+    The second group of the matches is not None for the parsable tags.
+    """
+    return (
+        rb'< (' + unparsable_pattern + rb'|(' + parsable_pattern + rb'''))
+        \b [^>]*+ (?<!/)>
+        # content
+        (?>
+            # Contains no other tags or
+            [^<]++
+            |
+            # the nested-tag is something else or
+            < (?! \1 \b [^>]*+ >)
+            |
+            # the nested tag closes itself
+            <\1\b[^>]*/>
+        )*?
+        # tag-end
+        </\1\s*+>'''
+    )
+
+
+TAG_BY_NAME_PATTERN = tag_by_name_pattern(
+    UNPARSABLE_TAG_EXTENSIONS_PATTERN, PARSABLE_TAG_EXTENSIONS_PATTERN)
 
 # The idea of the following regex is to detect innermost HTML tags. From
 # http://blog.stevenlevithan.com/archives/match-innermost-html-element
@@ -138,6 +234,8 @@ EXTENSION_TAGS_FINDITER = regex_compile(
 ).finditer
 COMMENT_PATTERN = r'<!--(?>[^-]++|-(?!->))*+-->'
 COMMENT_FINDITER = regex_compile(COMMENT_PATTERN.encode()).finditer
+# The types that parse_to_spans finds by matching braces.
+BRACE_TYPES = frozenset(('Parameter', 'ParserFunction', 'Template'))
 SINGLE_BRACES_FINDITER = regex_compile(
     rb'''
     (?<!{) { (?=[^{|])
@@ -148,7 +246,10 @@ SINGLE_BRACES_FINDITER = regex_compile(
 ).finditer
 
 
-def parse_to_spans(byte_array: bytearray) -> Dict[str, List[List[int]]]:
+def parse_to_spans(
+    byte_array: bytearray, types: Optional[Iterable[str]]=None,
+    profile: Optional['ParserProfile']=None,
+) -> Dict[str, List[List[int]]]:
     """Calculate and set self._type_to_spans.
 
     The result is a dictionary containing lists of spans:
@@ -161,9 +262,57 @@ def parse_to_spans(byte_array: bytearray) -> Dict[str, List[List[int]]]:
         'WikiLink': wikilink_spans,
     }
 
+    :param types: If not None, only find the spans of the given types and the
+        types that they depend on and leave the other ones out of the result.
+        Comments are always found. Extension tags depend on comments,
+        wikilinks depend on extension tags, and parameters, parser functions,
+        and templates depend on all the other types.
+    :param profile: The ParserProfile of the wiki. The default is
+        DEFAULT_PROFILE. The byte_array should be created by its shadow
+        method.
+
     """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if span_profiler is not None:
+        type_to_spans = span_profiler.parse_to_spans(
+            byte_array, types, profile)
+    else:
+        type_to_spans = find_spans(byte_array, types, profile)
+    if profile._shadow_table is not None:
+        byte_array[:] = byte_array.translate(PLACEHOLDERS_TO_QUESTION_MARKS)
+    return type_to_spans
+
+
+def find_spans(
+    byte_array: bytearray, types: Optional[Iterable[str]],
+    profile: 'ParserProfile',
+) -> Dict[str, List[List[int]]]:
+    """Find the spans of parse_to_spans and mask them in byte_array."""
+    comment_finditer = COMMENT_FINDITER
+    extension_tags_finditer = profile.extension_tags_finditer
+    if span_profiler is not None:
+        comment_finditer = span_profiler.finditer(
+            'comments', comment_finditer)
+        extension_tags_finditer = span_profiler.finditer(
+            'extension_tags', extension_tags_finditer)
+    # Comments and extension tags are found in a single pass and therefore
+    # their spans are already sorted.
     comment_spans = []  # type: List[List[int]]
     comment_spans_append = comment_spans.append
+    # HTML <!-- comments -->
+    for match in comment_finditer(byte_array, timeout=time_left()):
+        ms, me = match.span()
+        comment_spans_append([ms, me])
+        byte_array[ms:me] = b' ' * (me - ms)
+    if types is None or not BRACE_TYPES.isdisjoint(types):
+        parse_region = SPAN_ENGINES[span_engine]
+    elif 'WikiLink' in types:
+        parse_region = parse_wikilinks
+    elif 'ExtensionTag' in types:
+        parse_region = None
+    else:
+        return {'Comment': comment_spans}
     extension_tag_spans = []  # type: List[List[int]]
     extension_tag_spans_append = extension_tag_spans.append
     wikilink_spans = []  # type: List[List[int]]
@@ -174,50 +323,55 @@ def parse_to_spans(byte_array: bytearray) -> Dict[str, List[List[int]]]:
     parser_function_spans_append = parser_function_spans.append
     template_spans = []  # type: List[List[int]]
     template_spans_append = template_spans.append
-    # HTML <!-- comments -->
-    for match in COMMENT_FINDITER(byte_array):
-        ms, me = match.span()
-        comment_spans_append([ms, me])
-        byte_array[ms:me] = b' ' * (me - ms)
+    if span_profiler is not None and parse_region is parse_with_stack:
+        # The stack engine visits the string only once, so it is profiled
+        # as a single phase.
+        parse_region = span_profiler.engine(
+            'stack', parse_region, (
+                wikilink_spans, parameter_spans, parser_function_spans,
+                template_spans))
     # <extension tags>
-    for match in EXTENSION_TAGS_FINDITER(byte_array):
+    for match in extension_tags_finditer(
+        byte_array, timeout=time_left(),
+    ):
         ms, me = match.span()
         extension_tag_spans_append([ms, me])
-        if match[2]:  # parsable tag extension group
-            parse_tag_extensions(
+        if match[2] and parse_region:  # parsable tag extension group
+            parse_region(
                 byte_array, ms, me,
                 wikilink_spans_append,
                 parameter_spans_append,
                 parser_function_spans_append,
                 template_spans_append,
+                profile=profile,
             )
         byte_array[ms:me] = b'_' * (me - ms)
+    if parse_region is None:
+        return {
+            'Comment': comment_spans,
+            'ExtensionTag': extension_tag_spans,
+        }
     # Remove the braces inside WikiLinks.
     # WikiLinks may contain braces that interfere with
     # detection of templates. For example when parsing `{{text |[[A|}}]] }}`,
     # the span of the template should be the whole byte_array.
-    match = True
-    while match:
-        match = False
-        for match in WIKILINK_FINDITER(byte_array):
-            ms, me = match.span()
-            wikilink_spans_append([ms, me])
-            parse_pm_tl_pf(
-                byte_array, ms, me,
-                parameter_spans_append,
-                parser_function_spans_append,
-                template_spans_append,
-            )
-            byte_array[ms:me] = b'_' * (me - ms)
-    parse_pm_tl_pf(
+    parse_region(
         byte_array, 0, None,
+        wikilink_spans_append,
         parameter_spans_append,
         parser_function_spans_append,
         template_spans_append,
+        profile=profile,
     )
+    if parse_region is parse_wikilinks:
+        return {
+            'Comment': comment_spans,
+            'ExtensionTag': extension_tag_spans,
+            'WikiLink': sorted(wikilink_spans),
+        }
     return {
-        'Comment': sorted(comment_spans),
-        'ExtensionTag': sorted(extension_tag_spans),
+        'Comment': comment_spans,
+        'ExtensionTag': extension_tag_spans,
         'Parameter': sorted(parameter_spans),
         'ParserFunction': sorted(parser_function_spans),
         'Template': sorted(template_spans),
@@ -225,6 +379,34 @@ def parse_to_spans(byte_array: bytearray) -> Dict[str, List[List[int]]]:
     }
 
 
+def parse_wikilinks(
+    byte_array: bytearray,
+    start: int,
+    end: Optional[int],
+    wikilink_spans_append: Callable,
+    *_: Callable,
+    profile: 'ParserProfile'
+) -> None:
+    """Find the spans of wikilinks, but not of the elements inside them.
+
+    Used by parse_to_spans when none of the types that are enclosed in
+    double braces are requested. The rest of the span appenders are ignored.
+    """
+    wikilink_finditer = profile.wikilink_finditer
+    if span_profiler is not None:
+        wikilink_finditer = span_profiler.finditer(
+            'wikilinks', wikilink_finditer)
+    match = True  # type: Any
+    while match:
+        match = False
+        for match in wikilink_finditer(
+            byte_array, start, end, timeout=time_left(),
+        ):
+            ms, me = match.span()
+            wikilink_spans_append([ms, me])
+            byte_array[ms:me] = b'_' * (me - ms)
+
+
 def parse_tag_extensions(
     byte_array: bytearray,
     start: int,
@@ -233,19 +415,30 @@ def parse_tag_extensions(
     parameter_spans_append: Callable,
     pfunction_spans_append: Callable,
     template_spans_append: Callable,
+    *,
+    profile: 'ParserProfile'
 ) -> None:
     """Parse the byte_array to spans.
 
     This function is basically the same as `parse_to_spans`, but accepts an
     start that indicates the starting start of the given byte_array.
     `byte_array`s that are passed to this function are the contents of
-    PARSABLE_TAG_EXTENSIONS.
+    PARSABLE_TAG_EXTENSIONS or the whole byte_array after the comments and
+    extension tags have been removed.
+
+    This is the default (the 'regex') span engine.
 
     """
+    wikilink_finditer = profile.wikilink_finditer
+    if span_profiler is not None:
+        wikilink_finditer = span_profiler.finditer(
+            'wikilinks', wikilink_finditer)
     match = True  # type: Any
     while match:
         match = False
-        for match in WIKILINK_FINDITER(byte_array, start, end):
+        for match in wikilink_finditer(
+            byte_array, start, end, timeout=time_left(),
+        ):
             ms, me = match.span()
             wikilink_spans_append([ms, me])
             # See if the other WIKILINK_FINDITER call can help.
@@ -254,6 +447,7 @@ def parse_tag_extensions(
                 parameter_spans_append,
                 pfunction_spans_append,
                 template_spans_append,
+                profile=profile,
             )
             byte_array[ms:me] = b'_' * (me - ms)
     parse_pm_tl_pf(
@@ -261,6 +455,7 @@ def parse_tag_extensions(
         parameter_spans_append,
         pfunction_spans_append,
         template_spans_append,
+        profile=profile,
     )
 
 
@@ -269,6 +464,8 @@ def parse_pm_tl_pf(
     parameter_spans_append: Callable,
     pfunction_spans_append: Callable,
     template_spans_append: Callable,
+    *,
+    profile: 'ParserProfile'
 ) -> None:
     """Find the spans of parameters, parser functions, and templates.
 
@@ -281,25 +478,43 @@ def parse_pm_tl_pf(
     and n times for each of the n WikiLinks.
 
     """
+    # The patterns of this function cannot backtrack catastrophically, so
+    # checking the deadline once per call is enough.
+    time_left()
+    invalid_tl_name_finditer = INVALID_TL_NAME_FINDITER
+    single_braces_finditer = SINGLE_BRACES_FINDITER
+    parser_function_finditer = profile.parser_function_finditer
+    parameter_finditer = PARAMETER_FINDITER
+    template_finditer = TEMPLATE_FINDITER
+    if span_profiler is not None:
+        profiled = span_profiler.finditer
+        invalid_tl_name_finditer = profiled(
+            'invalid_template_names', invalid_tl_name_finditer, False)
+        single_braces_finditer = profiled(
+            'single_braces', single_braces_finditer, False)
+        parser_function_finditer = profiled(
+            'parser_functions', parser_function_finditer)
+        parameter_finditer = profiled('parameters', parameter_finditer)
+        template_finditer = profiled('templates', template_finditer)
     # Remove empty double braces
     match = True  # type: Any
     while match:
         match = False
-        for match in INVALID_TL_NAME_FINDITER(byte_array, start, end):
+        for match in invalid_tl_name_finditer(byte_array, start, end):
             ms, me = match.span()
             byte_array[ms:me] = (me - ms) * b'_'
     ms = True
     while ms is not None:
         # Single braces will interfere with detection of other elements and
         # should be removed beforehand.
-        for m in SINGLE_BRACES_FINDITER(byte_array, start, end):
+        for m in single_braces_finditer(byte_array, start, end):
             byte_array[m.start()] = 95  # 95 == ord('_')
         ms = None
         # Parser functions
         match = True
         while match:
             match = False
-            for match in PARSER_FUNCTION_FINDITER(byte_array, start, end):
+            for match in parser_function_finditer(byte_array, start, end):
                 ms, me = match.span()
                 pfunction_spans_append([ms, me])
                 byte_array[ms:me] = b'_' * (me - ms)
@@ -307,13 +522,853 @@ def parse_pm_tl_pf(
         match = True
         while match:
             match = False
-            for match in PARAMETER_FINDITER(byte_array, start, end):
+            for match in parameter_finditer(byte_array, start, end):
                 ms, me = match.span()
                 parameter_spans_append([ms, me])
                 byte_array[ms:me] = b'_' * (me - ms)
         # Templates
         # match is False at this point
-        for match in TEMPLATE_FINDITER(byte_array, start, end):
+        for match in template_finditer(byte_array, start, end):
             ms, me = match.span()
             template_spans_append([ms, me])
             byte_array[ms:me] = b'_' * (me - ms)
+
+
+def mask_known_spans(
+    byte_array: bytearray, type_to_spans: Dict[str, List[List[int]]],
+    start: int, end: int, skip_whole: bool,
+) -> None:
+    """Mask the known sub-spans of byte_array[start:end] in place.
+
+    byte_array is the encoded string[start:end] and type_to_spans is the
+    result of parse_to_spans for the whole string, possibly shifted by
+    later edits. The result is what parse_to_spans does to byte_array,
+    but without finding the spans again: comments are replaced by spaces,
+    other spans by underscores, and so are the double braces with invalid
+    names and the single braces that parse_pm_tl_pf removes without adding
+    any span. Only the spans that start within [start, end] are visited.
+
+    :param skip_whole: Do not mask the spans that are exactly [start, end].
+    """
+    def mask(type_: str, mask_byte: bytes) -> None:
+        spans = type_to_spans[type_]
+        for s, e in islice(
+            spans, bisect_left(spans, [start]), bisect_left(spans, [end + 1]),
+        ):
+            if e > end or skip_whole and s == start and e == end:
+                continue
+            byte_array[s - start:e - start] = mask_byte * (e - s)
+
+    mask('Comment', b' ')
+    mask('ExtensionTag', b'_')
+    mask('WikiLink', b'_')
+    # The regex engine removes invalid template names before finding any
+    # parameters, parser functions, or templates.
+    match = True  # type: Any
+    while match:
+        match = False
+        for match in INVALID_TL_NAME_FINDITER(byte_array):
+            ms, me = match.span()
+            byte_array[ms:me] = (me - ms) * b'_'
+    mask('Parameter', b'_')
+    mask('ParserFunction', b'_')
+    mask('Template', b'_')
+    for m in SINGLE_BRACES_FINDITER(byte_array):
+        byte_array[m.start()] = 95  # 95 == ord('_')
+
+
+# The following patterns are used by the 'stack' span engine.
+BRACKETS_FINDITER = LazyMethod('finditer', rb'\[\[++|\]\]')
+BRACES_FINDITER = LazyMethod('finditer', rb'\{++|\}++')
+WIKILINK_FULLMATCH = LazyMethod(
+    'fullmatch', WIKILINK_PATTERN, IGNORECASE | VERBOSE)
+TEMPLATE_FULLMATCH = LazyMethod('fullmatch', TEMPLATE_PATTERN, VERBOSE)
+PARAMETER_FULLMATCH = LazyMethod('fullmatch', PARAMETER_PATTERN, VERBOSE)
+PARSER_FUNCTION_FULLMATCH = LazyMethod('fullmatch', PARSER_FUNCTION_PATTERN)
+# Found elements and single braces are temporarily replaced with this byte so
+# that they can be told apart from underscores. It never appears in an
+# ascii-encoded string.
+MARKER = 255
+# The phases of each round of parse_pm_tl_pf. See parse_braces_with_stack.
+SINGLES, PF, PM, TL = range(4)
+# The regex engine removes invalid template names before anything else, i.e.
+# when there are no found elements or removed single braces in the arguments.
+INVALID_TL_NAME_FULLMATCH = LazyMethod(
+    'fullmatch',
+    INVALID_TL_NAME_PATTERN.replace(rb'[^{}]', rb'[^{}\xff]'), VERBOSE)
+MARKERS_TO_UNDERSCORES = bytes.maketrans(b'\xff', b'_')
+
+
+def parse_with_stack(
+    byte_array: bytearray,
+    start: int,
+    end: Optional[int],
+    wikilink_spans_append: Callable,
+    parameter_spans_append: Callable,
+    pfunction_spans_append: Callable,
+    template_spans_append: Callable,
+    *,
+    profile: 'ParserProfile'
+) -> None:
+    """Find the spans of wikilinks, parameters, parser functions, templates.
+
+    This is the 'stack' span engine. Unlike `parse_tag_extensions`, which
+    runs the finditers over the region once for each level of nesting, this
+    function visits every `[[`, `]]`, `{`, and `}` run of the region only once
+    and pairs them using a stack. Each pair is then validated using the same
+    patterns that the regex engine uses.
+    """
+    if end is None:
+        end = len(byte_array)
+    # Only the WIKILINK_FULLMATCH calls are limited by the time that is left
+    # at the start of the region. The other patterns are linear.
+    timeout = time_left()
+    wikilink_fullmatch = profile.wikilink_fullmatch
+    stack = []  # type: List[int]
+    stack_pop = stack.pop
+    for match in BRACKETS_FINDITER(byte_array, start, end):
+        ms, me = match.span()
+        if byte_array[ms] == 91:  # ord('[')
+            # In `[[[[a]]]]` both the `[[a]]` and the whole string are
+            # wikilinks, but in `[[[a]]` the first `[` is just a character.
+            stack.extend(range(ms + (me - ms) % 2, me, 2))
+            continue
+        if not stack:
+            continue
+        s = stack_pop()
+        if wikilink_fullmatch(byte_array, s, me, timeout=timeout) is None:
+            continue
+        wikilink_spans_append([s, me])
+        parse_braces_with_stack(
+            byte_array, s, me,
+            parameter_spans_append,
+            pfunction_spans_append,
+            template_spans_append,
+            profile=profile,
+        )
+        byte_array[s:me] = b'_' * (me - s)
+    parse_braces_with_stack(
+        byte_array, start, end,
+        parameter_spans_append,
+        pfunction_spans_append,
+        template_spans_append,
+        profile=profile,
+    )
+    byte_array[start:end] = byte_array[start:end].translate(
+        MARKERS_TO_UNDERSCORES)
+
+
+def parse_braces_with_stack(
+    byte_array: bytearray, start: int, end: int,
+    parameter_spans_append: Callable,
+    pfunction_spans_append: Callable,
+    template_spans_append: Callable,
+    *,
+    profile: 'ParserProfile'
+) -> None:
+    """Find the spans of parameters, parser functions, and templates.
+
+    This is the stack counterpart of `parse_pm_tl_pf`. The found elements are
+    replaced with MARKER bytes.
+
+    In `parse_pm_tl_pf` each iteration of the main loop removes single braces
+    and then finds parser functions, parameters, and templates, in that order.
+    To produce the same results, the time at which each element would have
+    been found by that loop is tracked as `round * 4 + phase` where the phase
+    is one of SINGLES, PF, PM, or TL.
+    """
+    # Each item is a [start, count, poisoned, time] list describing a run of
+    # opening braces. A run is poisoned when there are unmatched braces after
+    # it; such braces prevent the regex engine from matching around them.
+    # The time is the latest time at which an element after the run was found.
+    time_left()
+    parser_function_fullmatch = profile.parser_function_fullmatch
+    stack = []  # type: List[List[Any]]
+    stack_pop = stack.pop
+    for match in BRACES_FINDITER(byte_array, start, end):
+        ms, me = match.span()
+        n = me - ms
+        if byte_array[ms] == 123:  # ord('{')
+            if n != 1:
+                stack.append([ms, n, False, 0])
+            # The rest is what SINGLE_BRACES_FINDITER does.
+            elif me < end:
+                if byte_array[me] != 124:  # ord('|')
+                    byte_array[ms] = MARKER
+                elif stack:
+                    stack[-1][2] = True
+            continue
+        if n == 1:
+            if ms > start and byte_array[ms - 1] == 124:  # ord('|')
+                if stack:
+                    stack[-1][2] = True
+            elif me < end:
+                byte_array[ms] = MARKER
+            continue
+        close = ms
+        time = 0
+        while n > 1 and stack:
+            run = stack[-1]
+            os, oc, poisoned, content_time = run
+            if poisoned:
+                # The braces remain unmatched and will prevent the enclosing
+                # run from matching, too.
+                stack_pop()
+                if stack:
+                    stack[-1][2] = True
+                break
+            s = os + oc - 2
+            e = close + 2
+            if INVALID_TL_NAME_FULLMATCH(byte_array, s, e) is not None:
+                # Remove it without adding any span.
+                byte_array[s:e] = b'_' * (e - s)
+                spans_append = None
+                width = 2
+            else:
+                spans_append = False
+                r, phase = divmod(content_time, 4)
+                if parser_function_fullmatch(byte_array, s, e) is not None:
+                    time = found_time(r, phase, PF)
+                    spans_append = pfunction_spans_append
+                    width = 2
+                if oc > 2 and n > 2:
+                    pm_time = found_time(r, phase, PM)
+                    if (
+                        (not spans_append or pm_time < time)
+                        and PARAMETER_FULLMATCH(byte_array, s - 1, e + 1)
+                    ):
+                        time = pm_time
+                        spans_append = parameter_spans_append
+                        width = 3
+                tl_time = found_time(r, phase, TL)
+                if (
+                    (not spans_append or tl_time < time)
+                    and TEMPLATE_FULLMATCH(byte_array, s, e) is not None
+                ):
+                    time = tl_time
+                    spans_append = template_spans_append
+                    width = 2
+                if not spans_append:
+                    stack_pop()
+                    if stack:
+                        stack[-1][2] = True
+                    break
+                if width == 3:
+                    s -= 1
+                    e += 1
+                spans_append([s, e])
+                byte_array[s:e] = bytes((MARKER,)) * (e - s)
+            oc -= width
+            n -= width
+            close += width
+            if oc > 1:
+                run[1] = oc
+                if time > content_time:
+                    run[3] = time
+                continue
+            stack_pop()
+            if oc:
+                # The remaining single brace will be removed in the next round.
+                byte_array[os] = MARKER
+                time = (time // 4 + 1) * 4  # + SINGLES
+            if stack:
+                run = stack[-1]
+                if time > run[3]:
+                    run[3] = time
+        if n == 1 and close + 1 < end:
+            byte_array[close] = MARKER
+            if stack:
+                run = stack[-1]
+                time = (time // 4 + 1) * 4  # + SINGLES
+                if time > run[3]:
+                    run[3] = time
+
+
+def found_time(r: int, phase: int, target_phase: int) -> int:
+    """Return the earliest time at which an element can be found.
+
+    :param r: The round in which the last element of the contents was found.
+    :param phase: The phase in which the last element of the contents was
+        found.
+    :param target_phase: The phase in which the element is searched for.
+    """
+    # The loops of PF and PM phases run until nothing is found, but TL has
+    # only a single pass.
+    if phase < target_phase or phase == target_phase != TL:
+        return r * 4 + target_phase
+    return r * 4 + 4 + target_phase
+
+
+# Functions that can be used by parse_to_spans to find the spans of wikilinks,
+# parameters, parser functions, and templates inside a given region.
+SPAN_ENGINES = {
+    'regex': parse_tag_extensions,
+    'stack': parse_with_stack,
+}
+span_engine = 'regex'
+# The SpanProfiler that parse_to_spans delegates to, if any. See _profile.py.
+span_profiler = None  # type: Any
+
+
+def set_span_engine(name: str) -> None:
+    """Set the engine that is used for parsing the spans.
+
+    :param name: The name of the engine, one of the keys of SPAN_ENGINES:
+        - 'regex', the default engine, runs each regex over the whole string
+            once per nesting level.
+        - 'stack' visits every delimiter only once. It is usually faster
+            on deeply nested pages, but for some ill-formed markups its
+            results may differ from the default engine.
+    """
+    if name not in SPAN_ENGINES:
+        raise ValueError('unknown span engine: ' + repr(name))
+    global span_engine
+    span_engine = name
+
+
+# Used by parse_to_spans to replace the placeholders of non-ASCII characters
+# with `?` in the shadows, see ParserProfile.shadow.
+PLACEHOLDERS_TO_QUESTION_MARKS = bytes(range(128)) + b'?' * 128
+
+
+def shadow_table(words: Iterable[str]) -> Optional[Dict[int, str]]:
+    """Return the str.translate table of the shadows of a profile, or None.
+
+    Each distinct non-ASCII character of the words is mapped to a unique
+    character in range(128, 256), i.e. a byte that does not occur in ASCII
+    shadows, and the other characters of that range are mapped to `?`. Only
+    the first 128 distinct characters can have a placeholder, the rest are
+    replaced with `?` like the other non-ASCII characters.
+    None means that the words are all ASCII.
+    """
+    chars = sorted({c for word in words for c in word if c > '\x7f'})
+    if not chars:
+        return None
+    table = dict.fromkeys(range(128, 256), '?')  # type: Dict[int, str]
+    table.update(zip(map(ord, chars), map(chr, range(128, 256))))
+    return table
+
+
+def words_pattern(
+    words: Iterable[str], table: Optional[Dict[int, str]]=None,
+) -> bytes:
+    """Return a pattern that matches any of the words in a shadow.
+
+    :param table: The result of shadow_table. Non-ASCII characters are
+        replaced in the same way as in the shadows of the profile.
+    """
+    if table is None:
+        words = [w.encode('ascii', 'replace').decode() for w in words]
+        if not words:
+            return rb'(?!)'
+        return regex_pattern(words).encode()
+    words = [
+        w.translate(table).encode('latin-1', 'replace').decode('latin-1')
+        for w in words]
+    if not words:
+        return rb'(?!)'
+    return regex_pattern(words).encode('latin-1')
+
+
+def compile_profile(
+    parser_functions: frozenset,
+    parsable_tag_extensions: frozenset,
+    unparsable_tag_extensions: frozenset,
+    bare_external_link_schemes: frozenset,
+) -> tuple:
+    """Compile the regexes of a ParserProfile. See ParserProfile._key.
+
+    The patterns are written for VERSION0 of the regex module, but the
+    default version is changed to VERSION1 when the package is imported.
+    """
+    table = shadow_table(chain(
+        parser_functions, parsable_tag_extensions, unparsable_tag_extensions,
+        bare_external_link_schemes))
+    schemes_pattern = rb'\b' + words_pattern(
+        bare_external_link_schemes, table)
+    wikilink = regex_compile(
+        wikilink_pattern(schemes_pattern), IGNORECASE | VERBOSE | VERSION0)
+    parser_function = regex_compile(
+        parser_function_pattern(words_pattern(parser_functions, table)),
+        VERSION0)
+    return (
+        wikilink.finditer,
+        wikilink.fullmatch,
+        parser_function.finditer,
+        parser_function.fullmatch,
+        regex_compile(
+            tag_by_name_pattern(
+                words_pattern(unparsable_tag_extensions, table),
+                words_pattern(parsable_tag_extensions, table)),
+            IGNORECASE | VERBOSE | VERSION0,
+        ).finditer,
+        regex_compile(
+            externallink_pattern(schemes_pattern), IGNORECASE | VERSION0,
+        ).finditer,
+        table,
+    )
+
+
+# ParserProfile._key -> the result of compile_profile
+compiled_profiles = {}  # type: Dict[tuple, tuple]
+
+
+class ParserProfile:
+
+    """The wiki-specific names that the parser recognizes.
+
+    A profile holds the names of the parser functions, the extension tags,
+    and the bare external link schemes of a wiki, and the regexes that are
+    generated from them. The regexes are compiled once for each distinct
+    combination of names and are shared by all the profiles that have the
+    same names, therefore one process can parse the pages of several wikis
+    without compiling anything per page. Profiles are immutable.
+
+    The default names are the ones in _config. Parser functions that start
+    with `#` are always recognized. The non-ASCII characters of the names
+    are matched case-sensitively, see the shadow method.
+    """
+
+    __slots__ = (
+        'parser_functions', 'parsable_tag_extensions',
+        'unparsable_tag_extensions', 'tag_extensions',
+        'bare_external_link_schemes', '_key',
+        'wikilink_finditer', 'wikilink_fullmatch',
+        'parser_function_finditer', 'parser_function_fullmatch',
+        'extension_tags_finditer', 'externallink_finditer', '_shadow_table',
+    )
+
+    def __init__(
+        self,
+        parser_functions: Optional[Iterable[str]]=None,
+        parsable_tag_extensions: Optional[Iterable[str]]=None,
+        unparsable_tag_extensions: Optional[Iterable[str]]=None,
+        bare_external_link_schemes: Optional[Iterable[str]]=None,
+    ) -> None:
+        """Initialize the profile. Use None to keep the default names.
+
+        :param parser_functions: The names of the parser functions and
+            variables, e.g. 'PAGENAME' or 'urlencode', without the colon.
+        :param parsable_tag_extensions: The names of the extension tags
+            whose contents are parsed as wikitext, e.g. 'ref'.
+        :param unparsable_tag_extensions: The names of the other extension
+            tags, e.g. 'nowiki'.
+        :param bare_external_link_schemes: The schemes of the external links
+            that do not need brackets, e.g. 'https://' or 'mailto:'.
+        """
+        self.parser_functions = frozenset(
+            _parser_functions if parser_functions is None
+            else parser_functions)
+        self.parsable_tag_extensions = frozenset(
+            _parsable_tag_extensions if parsable_tag_extensions is None
+            else parsable_tag_extensions)
+        self.unparsable_tag_extensions = frozenset(
+            _unparsable_tag_extensions if unparsable_tag_extensions is None
+            else unparsable_tag_extensions)
+        self.tag_extensions = \
+            self.parsable_tag_extensions | self.unparsable_tag_extensions
+        self.bare_external_link_schemes = frozenset(
+            _bare_external_link_schemes if bare_external_link_schemes is None
+            else bare_external_link_schemes)
+        key = self._key = (
+            self.parser_functions,
+            self.parsable_tag_extensions,
+            self.unparsable_tag_extensions,
+            self.bare_external_link_schemes,
+        )
+        compiled = compiled_profiles.get(key)
+        if compiled is None:
+            compiled = compiled_profiles[key] = compile_profile(*key)
+        (
+            self.wikilink_finditer,
+            self.wikilink_fullmatch,
+            self.parser_function_finditer,
+            self.parser_function_fullmatch,
+            self.extension_tags_finditer,
+            self.externallink_finditer,
+            self._shadow_table,
+        ) = compiled
+
+    def shadow(self, string: str) -> bytearray:
+        """Return the byte array of the string for parse_to_spans.
+
+        Each character becomes one byte. Non-ASCII characters are replaced
+        with `?`, except the ones that occur in the names of the profile.
+        Those are replaced with unique bytes that are not ASCII, so that the
+        names do not match other non-ASCII characters. parse_to_spans
+        replaces the remaining ones with `?`.
+        """
+        table = self._shadow_table
+        if table is None:
+            return bytearray(string, 'ascii', 'replace')
+        return bytearray(string.translate(table), 'latin-1', 'replace')
+
+    @classmethod
+    def from_siteinfo(cls, siteinfo: dict) -> 'ParserProfile':
+        """Create a profile from the siteinfo of a wiki.
+
+        :param siteinfo: The decoded JSON response of
+            ``api.php?action=query&meta=siteinfo&format=json&siprop=``
+            ``magicwords|functionhooks|variables|extensiontags|protocols``,
+            or its 'query' item. Missing properties keep the defaults.
+            Extension tags are considered parsable if they are parsable by
+            default.
+        """
+        siteinfo = siteinfo.get('query', siteinfo)
+        parser_functions = None  # type: Optional[set]
+        if 'functionhooks' in siteinfo or 'variables' in siteinfo:
+            ids = {
+                *siteinfo.get('functionhooks', ()),
+                *siteinfo.get('variables', ()),
+            }
+            aliases = {
+                magic_word['name']: magic_word['aliases']
+                for magic_word in siteinfo.get('magicwords', ())
+            }
+            parser_functions = set()
+            for id_ in ids:
+                for alias in aliases.get(id_, (id_,)):
+                    alias = alias.rstrip(':')
+                    if alias and alias[0] != '#':
+                        parser_functions.add(alias)
+        parsable = unparsable = None  # type: Optional[set]
+        if 'extensiontags' in siteinfo:
+            tags = {tag.strip('<>') for tag in siteinfo['extensiontags']}
+            parsable = tags & _parsable_tag_extensions
+            unparsable = tags - parsable
+        schemes = None  # type: Optional[set]
+        if 'protocols' in siteinfo:
+            schemes = set(siteinfo['protocols']) - {'//'}
+        return cls(parser_functions, parsable, unparsable, schemes)
+
+    def __repr__(self) -> str:
+        return (
+            'ParserProfile(parser_functions={}, parsable_tag_extensions={}, '
+            'unparsable_tag_extensions={}, bare_external_link_schemes={})'
+            .format(*map(sorted, self._key))
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ParserProfile):
+            return NotImplemented
+        return self._key == other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __reduce__(self) -> tuple:
+        """Pickle the names; the regexes are compiled again if needed."""
+        return type(self), self._key
+
+    def __copy__(self) -> 'ParserProfile':
+        return self
+
+    def __deepcopy__(self, memo: dict) -> 'ParserProfile':
+        return self
+
+
+compiled_profiles[(
+    frozenset(_parser_functions),
+    frozenset(_parsable_tag_extensions),
+    frozenset(_unparsable_tag_extensions),
+    frozenset(_bare_external_link_schemes),
+)] = (
+    WIKILINK_FINDITER,
+    WIKILINK_FULLMATCH,
+    PARSER_FUNCTION_FINDITER,
+    PARSER_FUNCTION_FULLMATCH,
+    EXTENSION_TAGS_FINDITER,
+    EXTERNALLINK_FINDITER,
+    None,
+)
+# The profile that is used when no profile is given.
+DEFAULT_PROFILE = ParserProfile()
+
+
+# Span lists that are shorter than this are scanned by enclosing_spans.
+MIN_INDEXED_SPANS = 16
+
+
+class TypeToSpans(dict):
+
+    """A dict of span types to span lists that stores the spans compactly.
+
+    The spans of each type are kept in an array of alternating start and end
+    offsets until the span list of that type is accessed for the first time.
+    Node objects share and mutate their [start, end] lists in place,
+    therefore the lists are created once and stored in the dict from then on.
+    Methods that need all the values, e.g. values() which is used for
+    updating the spans after each change, unpack all the remaining arrays.
+
+    The ParserProfile that the spans have been parsed with, if it is not the
+    default one, is kept in `_profile` so that the nodes that share the spans
+    parse their new strings with the same profile. `_parse_version` is the
+    number of the modifications of the string when it was parsed; the spans
+    are only known to match the string until it is modified, see
+    WikiText._shadow. Both are only set by WikiText.
+    """
+
+    __slots__ = '_arrays', '_parents', '_profile', '_parse_version'
+
+    def __init__(
+        self, type_to_spans: Optional[Dict[str, List[List[int]]]]=None,
+    ) -> None:
+        super().__init__()
+        # The cache of enclosing_spans.
+        self._parents = {}  # type: Dict[str, Dict[int, tuple]]
+        arrays = self._arrays = {}  # type: Dict[str, array]
+        if type_to_spans is None:
+            return
+        for type_, spans in type_to_spans.items():
+            if spans:
+                arrays[type_] = array('q', chain.from_iterable(spans))
+            else:
+                dict.__setitem__(self, type_, spans)
+
+    def __missing__(self, key: str) -> List[List[int]]:
+        """Unpack the array of the given type into a list of spans."""
+        offsets = iter(self._arrays.pop(key))
+        spans = [[s, e] for s, e in zip(offsets, offsets)]
+        dict.__setitem__(self, key, spans)
+        return spans
+
+    def __reduce__(self) -> tuple:
+        """Copy or pickle the unpacked spans.
+
+        The spans are passed as dictitems so that deepcopy can keep them
+        identical to the spans of the copied nodes.
+        """
+        self._unpack_all()
+        profile = getattr(self, '_profile', None)
+        return (
+            type(self), (),
+            None if profile is None else (None, {'_profile': profile}),
+            None, iter(dict.items(self)),
+        )
+
+    def _unpack_all(self) -> None:
+        """Unpack all the remaining arrays."""
+        for key in list(self._arrays):
+            self.__missing__(key)
+
+    def __setitem__(self, key: str, value: List[List[int]]) -> None:
+        """Set the span list of the given type."""
+        self._arrays.pop(key, None)
+        self._parents.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __contains__(self, key: Any) -> bool:
+        """Return True if there are spans of the given type."""
+        return dict.__contains__(self, key) or key in self._arrays
+
+    def __iter__(self):
+        """Iterate over the types without unpacking them."""
+        yield from dict.__iter__(self)
+        yield from self._arrays
+
+    def __len__(self) -> int:
+        """Return the number of types."""
+        return dict.__len__(self) + len(self._arrays)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compare the spans after unpacking them."""
+        self._unpack_all()
+        if isinstance(other, TypeToSpans):
+            other._unpack_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other: Any) -> bool:
+        """Compare the spans after unpacking them."""
+        return not self == other
+
+    def __repr__(self) -> str:
+        """Return the repr of the unpacked dict."""
+        self._unpack_all()
+        return dict.__repr__(self)
+
+    def get(self, key: str, default: Any=None) -> Any:
+        """Return self[key] if key is in self, else default."""
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key: str, default: Any=None) -> Any:
+        """Return self[key] if key is in self, else set it to default."""
+        if key in self._arrays:
+            return self.__missing__(key)
+        return dict.setdefault(self, key, default)
+
+    def keys(self):
+        """Return the keys view after unpacking all the arrays."""
+        self._unpack_all()
+        return dict.keys(self)
+
+    def values(self):
+        """Return the values view after unpacking all the arrays."""
+        self._unpack_all()
+        return dict.values(self)
+
+    def items(self):
+        """Return the items view after unpacking all the arrays."""
+        self._unpack_all()
+        return dict.items(self)
+
+    def copy_packed(self) -> 'TypeToSpans':
+        """Return a copy of self with all the spans packed in arrays.
+
+        The arrays are never modified, only replaced by lists when they are
+        unpacked, therefore they are shared between self and the copy.
+        """
+        copy = TypeToSpans()
+        profile = getattr(self, '_profile', None)
+        if profile is not None:
+            copy._profile = profile
+        arrays = copy._arrays
+        arrays.update(self._arrays)
+        for type_, spans in dict.items(self):
+            if spans:
+                arrays[type_] = array('q', chain.from_iterable(spans))
+            else:
+                dict.__setitem__(copy, type_, [])
+        return copy
+
+    def packed_size(self) -> int:
+        """Return the size of the arrays in bytes."""
+        return sum(map(getsizeof, self._arrays.values()))
+
+
+def enclosing_spans(
+    type_to_spans: Dict[str, List[List[int]]], type_: str,
+    start: int, end: int,
+) -> List[List[int]]:
+    """Return the spans of the given type that contain [start, end].
+
+    The result is ordered from the innermost span to the outermost one.
+
+    The parent of each span, i.e. the innermost span of the same type that
+    contains it, is cached in the `_parents` of TypeToSpans objects.
+    Shifting the spans after an edit does not change which span contains
+    which, and removed spans become [-1, -1], so the cache remains valid.
+    New spans must be added using insort_span, which keeps the cache up to
+    date. Reaching a span that is not in the cache causes the parents of that
+    type to be recalculated. Short span lists and lists with overlapping spans
+    are scanned instead.
+    """
+    spans = type_to_spans[type_]
+    type_to_parents = getattr(type_to_spans, '_parents', {})
+    parents = type_to_parents.get(type_, {})
+    if parents is None or len(spans) < MIN_INDEXED_SPANS:
+        return scan_enclosing_spans(spans, start, end)
+    i = bisect_left(spans, [start, end])
+    if i < len(spans) and spans[i][0] == start:
+        # The innermost span that starts at the same position.
+        span = spans[i]  # type: Optional[List[int]]
+    elif i:
+        # The innermost span that starts at the last start before [start]
+        # and contains [start, end], or the outermost one if none does.
+        last_start = spans[i - 1][0]
+        span = spans[
+            min(bisect_left(spans, [last_start, end], 0, i), i - 1)]
+    else:
+        return []
+    enclosing = []  # type: List[List[int]]
+    enclosing_append = enclosing.append
+    while span is not None:
+        span_parent = parents.get(id(span))
+        if span_parent is None or span_parent[0] is not span:
+            parents = type_to_parents[type_] = span_parents(spans)
+            if parents is None:
+                return scan_enclosing_spans(spans, start, end)
+            span_parent = parents[id(span)]
+        s, e = span
+        if s <= start and end <= e:
+            enclosing_append(span)
+        parent = span_parent[1]
+        if parent is not None and (s < parent[0] or parent[1] < e):
+            # An edit has changed the relation of the two spans.
+            type_to_parents[type_] = {}
+            return enclosing_spans(type_to_spans, type_, start, end)
+        span = parent
+    if start == end:
+        # The spans that end at start contain it, but they do not contain
+        # the spans that start at it, so they are not in the same chain.
+        found = set(map(id, enclosing))
+        enclosing += [
+            span for span in enclosing_spans(
+                type_to_spans, type_, start - 1, start)
+            if id(span) not in found
+        ]
+        enclosing.sort(key=lambda span: (-span[0], span[1]))
+    return enclosing
+
+
+def insort_span(
+    type_to_spans: Dict[Any, List[List[int]]], type_: Any, span: List[int],
+) -> None:
+    """Insert the span into the sorted spans of the given type.
+
+    If the parents of the type are cached by enclosing_spans and the new span
+    does not contain or overlap any of the existing spans, e.g. the spans of
+    an inserted string which are added in order, the parent of the new span
+    is added to the cache. Otherwise the new span may be the parent of some
+    of the cached spans and the cache of the type is cleared.
+    """
+    spans = type_to_spans[type_]
+    i = bisect(spans, span)
+    type_to_parents = getattr(type_to_spans, '_parents', None)
+    if not type_to_parents or not type_to_parents.get(type_):
+        spans.insert(i, span)
+        return
+    s, e = span
+    # The first span that starts after s.
+    j = bisect_left(spans, [s + 1], i)
+    if s < e and not (
+        # A span that starts at s and is contained in the new one.
+        i and spans[i - 1][0] == s and spans[i - 1][1] < e
+    ) and (
+        # The next span starts after the new one or only touches it.
+        j == len(spans) or e < spans[j][0]
+        or (e == spans[j][0] and e < spans[j][1])
+    ):
+        enclosing = enclosing_spans(type_to_spans, type_, s, s + 1)
+        # The innermost span that contains s should also contain e.
+        if not enclosing or e <= enclosing[0][1]:
+            parents = type_to_parents.get(type_)
+            if parents:
+                spans.insert(i, span)
+                parents[id(span)] = span, enclosing[0] if enclosing else None
+                return
+    type_to_parents[type_] = {}
+    spans.insert(i, span)
+
+
+def scan_enclosing_spans(
+    spans: List[List[int]], start: int, end: int,
+) -> List[List[int]]:
+    """Return the spans that contain [start, end] without using the cache."""
+    enclosing = [
+        span for span in spans[:bisect(spans, [start + 1])] if end <= span[1]
+    ]
+    enclosing.sort(key=lambda span: (-span[0], span[1]))
+    return enclosing
+
+
+def span_parents(spans: List[List[int]]) -> Optional[Dict[int, tuple]]:
+    """Return a dict mapping id of each span to the (span, parent) tuple.
+
+    Keeping the span in the value also prevents its id from being reused.
+    Return None if some of the spans overlap without one containing the other.
+    """
+    parents = {}  # type: Dict[int, tuple]
+    stack = []  # type: List[List[int]]
+    stack_append = stack.append
+    stack_pop = stack.pop
+    # Each span should come after the spans that contain it.
+    for span in sorted(spans, key=lambda span: (span[0], -span[1])):
+        s, e = span
+        while stack and stack[-1][1] < e:
+            if s < stack_pop()[1]:
+                return None
+        parents[id(span)] = span, stack[-1] if stack else None
+        stack_append(span)
+    return parents
@@ -5,7 +5,7 @@ from bisect import insort
 from typing import List, Any, Union, Optional, TypeVar, Dict, Tuple
 from warnings import warn
 
-from regex import compile as regex_compile, VERBOSE
+from regex import VERBOSE
 
 from ._cell import (
     Cell,
@@ -13,11 +13,14 @@ from ._cell import (
     INLINE_HAEDER_CELL_MATCH,
     INLINE_NONHAEDER_CELL_MATCH
 )
+from ._deadline import time_left
+from ._spans import LazyMethod
 from ._tag import ATTRS_MATCH, SubWikiTextWithAttrs
 from ._wikitext import WS
 
 
-CAPTION_MATCH = regex_compile(
+CAPTION_MATCH = LazyMethod(
+    'match',
     r"""
     # Everything until the caption line
     (?P<preattrs>
@@ -45,8 +48,8 @@ CAPTION_MATCH = regex_compile(
         \|\|
     )
     """,
-    VERBOSE
-).match
+    VERBOSE,
+)
 T = TypeVar('T')
 
 
@@ -54,11 +57,34 @@ class Table(SubWikiTextWithAttrs):
 
     """Create a new Table object."""
 
-    _attrs_match_cache = None, None
+    _attrs_match_cache = None, -1
+    _results_cache = None, -1  # type: Any
+
+    @property
+    def _results(self) -> Dict[Any, Any]:
+        """Return a dict for caching the results of the table methods.
+
+        The dict is replaced with an empty one whenever the string of the
+        table is modified, see PieceTable.span_version.
+        """
+        results, version = self._results_cache
+        lststr = self._lststr
+        if lststr.span_version(self._span) > version:
+            results = {}
+            self._results_cache = results, lststr.modifications
+        return results
 
     @property
     def _match_table(self) -> List[List[Any]]:
-        """Return match_table."""
+        """Return match_table. Cache the result."""
+        results = self._results
+        match_table = results.get('match_table')
+        if match_table is None:
+            match_table = results['match_table'] = self._find_match_table()
+        return match_table
+
+    def _find_match_table(self) -> List[List[Any]]:
+        """Match the rows and the cells of the table."""
         shadow = self._shadow
         # Remove table-start and table-end marks.
         pos = shadow.find(10)  # ord('\n')
@@ -72,11 +98,16 @@ class Table(SubWikiTextWithAttrs):
         match_table = []
         pos = _semi_caption_increase(shadow, pos)
         rsp = _row_separator_increase(shadow, pos)
+        newline_cell_match = NEWLINE_CELL_MATCH.method
+        inline_nonheader_cell_match = INLINE_NONHAEDER_CELL_MATCH.method
+        inline_header_cell_match = INLINE_HAEDER_CELL_MATCH.method
         pos = -1
         while pos != rsp:
             pos = rsp
+            # Check the deadline once per row and limit each match of the row.
+            timeout = time_left()
             # We have a new row.
-            m = NEWLINE_CELL_MATCH(shadow, pos)
+            m = newline_cell_match(shadow, pos, timeout=timeout)
             # Don't add a row if there are no new cells.
             if m:
                 match_row = []  # type: List[Any]
@@ -86,19 +117,23 @@ class Table(SubWikiTextWithAttrs):
                 sep = m['sep']
                 pos = m.end()
                 if sep == b'|':
-                    m = INLINE_NONHAEDER_CELL_MATCH(shadow, pos)
+                    m = inline_nonheader_cell_match(
+                            shadow, pos, timeout=timeout)
                     while m:
                         match_row.append(m)
                         pos = m.end()
-                        m = INLINE_NONHAEDER_CELL_MATCH(shadow, pos)
+                        m = inline_nonheader_cell_match(
+                            shadow, pos, timeout=timeout)
                 elif sep == b'!':
-                    m = INLINE_HAEDER_CELL_MATCH(shadow, pos)
+                    m = inline_header_cell_match(
+                            shadow, pos, timeout=timeout)
                     while m:
                         match_row.append(m)
                         pos = m.end()
-                        m = INLINE_HAEDER_CELL_MATCH(shadow, pos)
+                        m = inline_header_cell_match(
+                            shadow, pos, timeout=timeout)
                 pos = _semi_caption_increase(shadow, pos)
-                m = NEWLINE_CELL_MATCH(shadow, pos)
+                m = newline_cell_match(shadow, pos, timeout=timeout)
             rsp = _row_separator_increase(shadow, pos)
         return match_table
 
@@ -128,7 +163,19 @@ class Table(SubWikiTextWithAttrs):
             won't look inside templates, parser functions, etc.
             See https://www.mediawiki.org/wiki/Extension:Pipe_Escape for how
             wiki-tables can be inserted within templates.
+
+        The result is cached until the string is modified, so calling this
+        method for each row or column does not match the table again.
         """
+        results = self._results
+        key = 'data', span, strip
+        table_data = results.get(key)
+        if table_data is None:
+            table_data = results[key] = self._data(span, strip)
+        return _select(table_data, row, column)
+
+    def _data(self, span: bool, strip: bool) -> List[List[str]]:
+        """Return the data of all the cells. See self.data."""
         match_table = self._match_table
         # Note string is only used for extracting data, matching is done over
         # the shadow.
@@ -149,28 +196,30 @@ class Table(SubWikiTextWithAttrs):
                 for m in match_row:
                     s, e = m.span('data')
                     row_data.append(string[s:e])
-        if table_data:
-            if span:
-                table_attrs = []  # type: List[List[Dict[str, str]]]
-                for match_row in match_table:
-                    row_attrs = []  # type: List[Dict[str, str]]
-                    table_attrs.append(row_attrs)
-                    row_attrs_append = row_attrs.append
-                    for m in match_row:
-                        s, e = m.span('attrs')
-                        captures = ATTRS_MATCH(
-                            string.encode('ascii', 'replace'), s, e).captures
-                        row_attrs_append(dict(zip(
-                            captures('attr_name'), captures('attr_value')
-                        )))
-                table_data = _apply_attr_spans(table_attrs, table_data)
-        if row is None:
-            if column is None:
-                return table_data
-            return [r[column] for r in table_data]
-        if column is None:
-            return table_data[row]
-        return table_data[row][column]
+        if table_data and span:
+            table_data = _apply_attr_spans(self._cell_attrs, table_data)
+        return table_data
+
+    @property
+    def _cell_attrs(self) -> List[List[Dict[bytes, bytes]]]:
+        """Return the attributes of each cell as a dict. Cache the result."""
+        results = self._results
+        table_attrs = results.get('cell_attrs')
+        if table_attrs is not None:
+            return table_attrs
+        byte_string = self.string.encode('ascii', 'replace')
+        table_attrs = results['cell_attrs'] = []
+        for match_row in self._match_table:
+            row_attrs = []  # type: List[Dict[bytes, bytes]]
+            table_attrs.append(row_attrs)
+            row_attrs_append = row_attrs.append
+            for m in match_row:
+                s, e = m.span('attrs')
+                captures = ATTRS_MATCH(byte_string, s, e).captures
+                row_attrs_append(dict(zip(
+                    captures('attr_name'), captures('attr_value')
+                )))
+        return table_attrs
 
     def cells(
         self, row: int=None, column: int=None, span: bool=True,
@@ -185,8 +234,18 @@ class Table(SubWikiTextWithAttrs):
         If both row and column are provided, return the relevant cell object.
 
         If only need the values inside cells, then use the ``data`` method
-        instead.
+        instead. Like ``data``, the result is cached until the string is
+        modified.
         """
+        results = self._results
+        key = 'cells', span
+        table_cells = results.get(key)
+        if table_cells is None:
+            table_cells = results[key] = self._cells(span)
+        return _select(table_cells, row, column)
+
+    def _cells(self, span: bool) -> List[List[Cell]]:
+        """Return the Cell objects of all the cells. See self.cells."""
         tbl_span = self._span
         ss = tbl_span[0]
         match_table = self._match_table
@@ -194,6 +253,7 @@ class Table(SubWikiTextWithAttrs):
         type_ = id(tbl_span)
         type_to_spans = self._type_to_spans
         spans = type_to_spans.setdefault(type_, [])
+        span_tuple_to_span_get = {(s[0], s[1]): s for s in spans}.get
         table_cells = []  # type: List[List[Cell]]
         table_attrs = []  # type: List[List[Dict[str, str]]]
         attrs_match = None
@@ -219,7 +279,7 @@ class Table(SubWikiTextWithAttrs):
                     row_attrs_append(dict(zip(
                         captures('attr_name'), captures('attr_value')
                     )))
-                old_span = next((s for s in spans if s == cell_span), None)
+                old_span = span_tuple_to_span_get((ss + ms, ss + me))
                 if old_span is None:
                     insort(spans, cell_span)
                 else:
@@ -237,13 +297,7 @@ class Table(SubWikiTextWithAttrs):
                 )
         if table_cells and span:
             table_cells = _apply_attr_spans(table_attrs, table_cells)
-        if row is None:
-            if column is None:
-                return table_cells
-            return [r[column] for r in table_cells]
-        if column is None:
-            return table_cells[row]
-        return table_cells[row][column]
+        return table_cells
 
     def getrdata(self, i: int, span: bool=True) -> List[str]:
         """Use Table.data(span, row=i) instead."""
@@ -288,13 +342,13 @@ class Table(SubWikiTextWithAttrs):
 
     @property
     def _attrs_match(self) -> Any:
-        cache_match, cache_string = self._attrs_match_cache
-        string = self.string
-        if cache_string == string:
+        cache_match, version = self._attrs_match_cache
+        lststr = self._lststr
+        if lststr.span_version(self._span) <= version:
             return cache_match
         shadow = self._shadow
         attrs_match = ATTRS_MATCH(shadow, 2, shadow.find(10))  # ord('\n')
-        self._attrs_match_cache = attrs_match, string
+        self._attrs_match_cache = attrs_match, lststr.modifications
         return attrs_match
 
     @property
@@ -347,6 +401,23 @@ class Table(SubWikiTextWithAttrs):
             self[len(preattrs):len(preattrs + oldattrs)] = attrs
 
 
+def _select(
+    table: List[List[T]], row: Optional[int], column: Optional[int],
+) -> Union[List[List[T]], List[T], T]:
+    """Return the given row, column, or cell of the table.
+
+    The returned lists are copies, so the cached table is not affected if the
+    caller modifies them.
+    """
+    if row is None:
+        if column is None:
+            return [r[:] for r in table]
+        return [r[column] for r in table]
+    if column is None:
+        return table[row][:]
+    return table[row][column]
+
+
 def _apply_attr_spans(
     table_attrs: List[List[Dict[str, str]]], table_data: List[List[T]]
 ) -> List[List[T]]:
@@ -12,8 +12,10 @@ For more info see:
 from typing import Dict, Optional, Union, List, MutableSequence, Any
 from warnings import warn
 
-from regex import compile as regex_compile, VERBOSE, DOTALL
+from regex import VERBOSE, DOTALL
 
+from ._deadline import time_left
+from ._spans import LazyMethod
 from ._wikitext import SubWikiText
 
 
@@ -50,10 +52,11 @@ ATTR_VAL = (
 ATTR_PATTERN = (
     rb'(?P<attr>[' + SPACE_CHARS + rb']++' + ATTR_NAME + ATTR_VAL + rb')'
 )
-ATTRS_MATCH = regex_compile(
+ATTRS_MATCH = LazyMethod(
+    'match',
     # Leading space is not required at the start of the attribute string.
     rb'(?P<attr>[' + SPACE_CHARS + rb']*+' + ATTR_NAME + ATTR_VAL + rb')*+',
-).match
+)
 # VOID_ELEMENTS = (
 #     'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
 #     'link', 'meta', 'param', 'source', 'track', 'wbr'
@@ -68,7 +71,8 @@ END_TAG_PATTERN = rb'(?P<end></{name}[' + SPACE_CHARS + rb']*+>)'
 END_TAG = END_TAG_PATTERN.replace(rb'{name}', rb'(?P<end_name>(?P=name))')
 TAG_CONTENTS = rb'(?P<contents>.*?)'
 # Note that the following regex won't check for nested tags
-TAG_FULLMATCH = regex_compile(
+TAG_FULLMATCH = LazyMethod(
+    'fullmatch',
     rb'''
     # Note that the start group does not include the > character
     (?P<start>
@@ -85,7 +89,7 @@ TAG_FULLMATCH = regex_compile(
     )
     ''',
     DOTALL | VERBOSE,
-).fullmatch
+)
 # Todo: can the tags method be implemented using a TAG_FINDITER? Will
 # that be more performant?
 # TAG_FINDITER should not find any tag containing other tags.
@@ -102,9 +106,8 @@ START_TAG_PATTERN = (
     rb'(?:(?P<self_closing>/>)|>)'
     rb')'
 )
-START_TAG_FINDITER = regex_compile(
-    START_TAG_PATTERN.replace(b'{name}', TAG_NAME)
-).finditer
+START_TAG_FINDITER = LazyMethod(
+    'finditer', START_TAG_PATTERN.replace(b'{name}', TAG_NAME))
 
 
 class SubWikiTextWithAttrs(SubWikiText):
@@ -216,17 +219,17 @@ class Tag(SubWikiTextWithAttrs):
 
     """Create a new Tag object."""
 
-    _match_cache = None, None  # type: Any
+    _match_cache = None, -1  # type: Any
 
     @property
     def _match(self) -> Any:
         """Return the match object for the current tag. Cache the result."""
-        cached_match, cached_string = self._match_cache
-        string = self.string
-        if cached_string == string:
+        cached_match, version = self._match_cache
+        lststr = self._lststr
+        if lststr.span_version(self._span) <= version:
             return cached_match
-        match = TAG_FULLMATCH(self._shadow)
-        self._match_cache = match, string
+        match = TAG_FULLMATCH(self._shadow, timeout=time_left())
+        self._match_cache = match, lststr.modifications
         return match
 
     _attrs_match = _match
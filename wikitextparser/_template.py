@@ -1,7 +1,8 @@
 """Define the Template class."""
 
 
-from typing import List, Optional, TypeVar, Iterable, Dict, Tuple
+from collections import OrderedDict
+from typing import List, Optional, TypeVar, Iterable, Dict, Tuple, Any
 
 from regex import compile as regex_compile, REVERSE
 
@@ -26,6 +27,51 @@ SPACE_AFTER_SEARCH = regex_compile(r'\s*+(?=\|)').search
 T = TypeVar('T')
 
 
+def normal_template_name(
+    name: str,
+    rm_namespaces: Iterable[str]=('Template',),
+    capital_links: bool=False,
+    code: Optional[str]=None,
+) -> str:
+    """Return the normal form of the given template name.
+
+    See Template.normal_name for the details.
+    """
+    # Remove comments
+    if '<' in name:
+        name = COMMENT_SUB('', name)
+    name = name.strip(WS)
+    # Remove code
+    if code:
+        head, sep, tail = name.partition(':')
+        if not head and sep:
+            name = tail.strip(' ')
+            head, sep, tail = name.partition(':')
+        if code.lower() == head.strip(' ').lower():
+            name = tail.strip(' ')
+    # Remove namespace
+    head, sep, tail = name.partition(':')
+    if not head and sep:
+        name = tail.strip(' ')
+        head, sep, tail = name.partition(':')
+    if head:
+        ns = head.strip(' ').lower()
+        for namespace in rm_namespaces:
+            if namespace.lower() == ns:
+                name = tail.strip(' ')
+                break
+    # Use space instead of underscore
+    name = name.replace('_', ' ')
+    if capital_links and name:
+        # Use uppercase for the first letter
+        n0 = name[0]
+        if n0.islower():
+            name = n0.upper() + name[1:]
+    # Remove #anchor
+    name, sep, tail = name.partition('#')
+    return ' '.join(name.split())
+
+
 class Template(TlPfMixin):
 
     """Convert strings to Template objects.
@@ -34,6 +80,26 @@ class Template(TlPfMixin):
     """
 
     _args_matcher = BAR_SPLITS_FULLMATCH
+    _arg_index_cache = None, -1  # type: Any
+
+    @property
+    def _arg_index(self) -> 'OrderedDict[str, Argument]':
+        """Return an OrderedDict of stripped argument names to arguments.
+
+        The names are in the order of their first occurrence and each one is
+        mapped to the last argument with that name. The result is cached
+        until the string of the template is modified, see
+        PieceTable.span_version.
+        """
+        cached_index, version = self._arg_index_cache
+        lststr = self._lststr
+        if lststr.span_version(self._span) <= version:
+            return cached_index
+        index = OrderedDict()  # type: OrderedDict[str, Argument]
+        for arg in self.arguments:
+            index[arg.name.strip(WS)] = arg
+        self._arg_index_cache = index, lststr.modifications
+        return index
 
     @property
     def name(self) -> str:
@@ -78,37 +144,66 @@ class Template(TlPfMixin):
             ... ).normal_name(code='en')
             'T 1'
         """
-        # Remove comments
-        name = COMMENT_SUB('', self.name).strip(WS)
-        # Remove code
-        if code:
-            head, sep, tail = name.partition(':')
-            if not head and sep:
-                name = tail.strip(' ')
-                head, sep, tail = name.partition(':')
-            if code.lower() == head.strip(' ').lower():
-                name = tail.strip(' ')
-        # Remove namespace
-        head, sep, tail = name.partition(':')
-        if not head and sep:
-            name = tail.strip(' ')
-            head, sep, tail = name.partition(':')
-        if head:
-            ns = head.strip(' ').lower()
-            for namespace in rm_namespaces:
-                if namespace.lower() == ns:
-                    name = tail.strip(' ')
-                    break
-        # Use space instead of underscore
-        name = name.replace('_', ' ')
-        if capital_links:
-            # Use uppercase for the first letter
-            n0 = name[0]
-            if n0.islower():
-                name = n0.upper() + name[1:]
-        # Remove #anchor
-        name, sep, tail = name.partition('#')
-        return ' '.join(name.split())
+        return normal_template_name(
+            self.name, rm_namespaces, capital_links, code)
+
+    def to_dict(
+        self, strip: bool=True, duplicates: str='last',
+    ) -> Dict[str, Any]:
+        """Return a dict of the argument names to their values.
+
+        The names of positional arguments are their positions. The dict is
+        built directly from the shadow of the template, without creating any
+        Argument objects, therefore it is much faster than reading the name
+        and the value of each item of self.arguments.
+
+        :param strip: Strip the whitespace around the names and the values
+            of the keyword arguments. Just like MediaWiki, the values of
+            positional arguments are never stripped.
+        :param duplicates: What to do with duplicate names. If 'last', map
+            each name to the value of its last argument, just like
+            MediaWiki. If 'list', map each name to the list of the values of
+            all the arguments with that name.
+
+        Example:
+            >>> Template('{{t| a = b |c| a = d}}').to_dict()
+            {'a': 'd', '1': 'c'}
+            >>> Template('{{t| a = b |c| a = d}}').to_dict(duplicates='list')
+            {'a': ['b', 'd'], '1': ['c']}
+        """
+        if duplicates == 'last':
+            as_list = False
+        elif duplicates == 'list':
+            as_list = True
+        else:
+            raise ValueError(
+                "duplicates should be 'last' or 'list', not {!r}".format(
+                    duplicates))
+        shadow = self._shadow
+        string = self.string
+        result = {}  # type: Dict[str, Any]
+        position = 1
+        for s, e in self._args_matcher(shadow).spans('arg'):
+            equal = shadow.find(61, s, e)  # ord('=')
+            if equal == -1:
+                name = str(position)
+                position += 1
+                value = string[s + 1:e]
+            else:
+                name = string[s + 1:equal]
+                value = string[equal + 1:e]
+                if strip:
+                    name = name.strip(WS)
+                    value = value.strip(WS)
+            if as_list:
+                values = result.get(name)
+                if values is None:
+                    result[name] = [value]
+                else:
+                    values.append(value)
+            else:
+                result[name] = value
+        return result
 
     def rm_first_of_dup_args(self) -> None:
         """Eliminate duplicate arguments by removing the first occurrences.
@@ -120,12 +215,16 @@ class Template(TlPfMixin):
         Also see `rm_dup_args_safe` function.
         """
         names = set()  # type: set
+        ss = self._span[0]
+        edits = []  # type: List[Tuple[int, int, str]]
         for a in reversed(self.arguments):
             name = a.name.strip(WS)
             if name in names:
-                del a[:len(a.string)]
+                s, e = a._span
+                edits.append((s - ss, e - ss, ''))
             else:
                 names.add(name)
+        self.apply_edits(edits)
 
     def rm_dup_args_safe(self, tag: str=None) -> None:
         """Remove duplicate arguments in a safe manner.
@@ -148,8 +247,18 @@ class Template(TlPfMixin):
         """
         name_to_lastarg_vals = {} \
             # type: Dict[str, Tuple[Argument, List[str]]]
+        ss = self._span[0]
+        edits = []  # type: List[Tuple[int, int, str]]
+
+        def remove(argument: Argument) -> None:
+            s, e = argument._span
+            edits.append((s - ss, e - ss, ''))
+
         # Removing positional args affects their name. By reversing the list
         # we avoid encountering those kind of args.
+        # The edits are all applied at the end. Only the arguments after the
+        # current one are edited, so the names and values of the remaining
+        # ones are not affected in the meantime.
         for arg in reversed(self.arguments):
             name = arg.name.strip(WS)
             if arg.positional:
@@ -162,28 +271,31 @@ class Template(TlPfMixin):
                 # This is a duplicate argument.
                 if not val:
                     # This duplicate argument is empty. It's safe to remove it.
-                    del arg[0:len(arg.string)]
+                    remove(arg)
                 else:
                     # Try to remove any of the detected duplicates of this
                     # that are empty or their value equals to this one.
                     lastarg, dup_vals = name_to_lastarg_vals[name]
                     if val in dup_vals:
-                        del arg[0:len(arg.string)]
+                        remove(arg)
                     elif '' in dup_vals:
                         # This happens only if the last occurrence of name has
                         # been an empty string; other empty values will
                         # be removed as they are seen.
                         # In other words index of the empty argument in
                         # dup_vals is always 0.
-                        del lastarg[0:len(lastarg.string)]
+                        remove(lastarg)
                         dup_vals.pop(0)
                     else:
                         # It was not possible to remove any of the duplicates.
                         dup_vals.append(val)
                         if tag:
-                            arg.value += tag
+                            value = arg.value
+                            e = arg._span[1] - ss
+                            edits.append((e - len(value), e, value + tag))
             else:
                 name_to_lastarg_vals[name] = (arg, [val])
+        self.apply_edits(edits)
 
     def set_arg(
         self, name: str,
@@ -204,8 +316,8 @@ class Template(TlPfMixin):
           argument. Ignore `preserve_spacing` if positional is True.
           If it's None, do what seems more appropriate.
         """
-        args = list(reversed(self.arguments))
-        arg = get_arg(name, args)
+        index = self._arg_index
+        arg = None if name is None else index.get(name.strip(WS))
         # Updating an existing argument.
         if arg:
             if positional:
@@ -217,6 +329,7 @@ class Template(TlPfMixin):
                 arg.value = value
             return
         # Adding a new argument
+        args = list(reversed(self.arguments))
         if not name and positional is None:
             positional = True
         # Calculate the whitespace needed before arg-name and after arg-value.
@@ -256,10 +369,10 @@ class Template(TlPfMixin):
                 addstring = '|' + name + '=' + value
         # Place the addstring in the right position.
         if before:
-            arg = get_arg(before, args)
+            arg = index.get(before.strip(WS))
             arg.insert(0, addstring)
         elif after:
-            arg = get_arg(after, args)
+            arg = index.get(after.strip(WS))
             arg.insert(len(arg.string), addstring)
         else:
             if args and not positional:
@@ -285,7 +398,18 @@ class Template(TlPfMixin):
 
         Return None if no argument with that name is found.
         """
-        return get_arg(name, reversed(self.arguments))
+        return self._arg_index.get(name.strip(WS))
+
+    def get_args(self, names: Iterable[str]) -> List[Optional[Argument]]:
+        """Return the last argument of each of the given names.
+
+        The result is in the same order as names and has None in place of
+        the names that are not found. All the names are looked up using
+        the same argument index, e.g.
+            >>> width, height = template.get_args(('width', 'height'))
+        """
+        get = self._arg_index.get
+        return [get(name.strip(WS)) for name in names]
 
     def has_arg(self, name: str, value: str=None) -> bool:
         """Return true if the is an arg named `name`.
@@ -296,18 +420,14 @@ class Template(TlPfMixin):
             better to get_arg directly and then check if the returned value
             is None.
         """
-        for arg in reversed(self.arguments):
-            if arg.name.strip(WS) == name.strip(WS):
-                if value:
-                    if arg.positional:
-                        if arg.value == value:
-                            return True
-                        return False
-                    if arg.value.strip(WS) == value.strip(WS):
-                        return True
-                    return False
-                return True
-        return False
+        arg = self._arg_index.get(name.strip(WS))
+        if arg is None:
+            return False
+        if value:
+            if arg.positional:
+                return arg.value == value
+            return arg.value.strip(WS) == value.strip(WS)
+        return True
 
 
 def mode(list_: List[T]) -> T:
@@ -337,7 +457,8 @@ def get_arg(name: str, args: Iterable[Argument]) -> Optional[Argument]:
     function was created so that other methods that have already computed
     the arguments use it instead of calling self.get_arg directly.
     """
+    name = name.strip(WS)
     for arg in args:
-        if arg.name.strip(WS) == name.strip(WS):
+        if arg.name.strip(WS) == name:
             return arg
     return None
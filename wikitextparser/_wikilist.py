@@ -41,27 +41,27 @@ class WikiList(SubWikiText):
         super().__init__(string, _type_to_spans, _span, _type)
         self.pattern = pattern
         if _match:
-            self._match_cache = _match, self.string
+            self._match_cache = _match, self._lststr.modifications
         else:
             self._match_cache = fullmatch(
                 LIST_PATTERN_FORMAT.replace(b'{pattern}', pattern.encode()),
                 self._shadow,
                 MULTILINE,
-            ), self.string
+            ), self._lststr.modifications
 
     @property
     def _match(self):
         """Return the match object for the current list."""
-        cache_match, cache_string = self._match_cache
-        string = self.string
-        if cache_string == string:
+        cache_match, version = self._match_cache
+        lststr = self._lststr
+        if lststr.span_version(self._span) <= version:
             return cache_match
         cache_match = fullmatch(
             LIST_PATTERN_FORMAT.replace(b'{pattern}', self.pattern.encode()),
             self._shadow,
             MULTILINE,
         )
-        self._match_cache = cache_match, string
+        self._match_cache = cache_match, lststr.modifications
         return cache_match
 
     @property
@@ -4,47 +4,44 @@
 # Todo: consider using a tree structure (interval or segment tree).
 # Todo: Consider using separate strings for each node.
 
-from bisect import bisect, insort
+from bisect import bisect, bisect_left
 from copy import deepcopy
-from operator import attrgetter
+from itertools import accumulate, islice
+from operator import attrgetter, itemgetter
 from typing import (
     MutableSequence, Dict, List, Tuple, Union, Generator, Any, Optional,
+    Iterable,
 )
 from warnings import warn
 
-from regex import VERBOSE, DOTALL, MULTILINE, IGNORECASE, search
+from regex import VERBOSE, DOTALL, MULTILINE, search
 from regex import compile as regex_compile
 from wcwidth import wcswidth
 
+from . import _cache
 # noinspection PyProtectedMember
-from ._config import _tag_extensions
+from ._deadline import deadline, time_left
+from ._piecetable import PieceTable
 from ._spans import (
     parse_to_spans,
+    mask_known_spans,
+    enclosing_spans,
+    insort_span,
+    MIN_INDEXED_SPANS,
+    TypeToSpans,
     INVALID_EXTLINK_CHARS,
-    VALID_EXTLINK_CHARS,
-    BARE_EXTLINK_SCHEMES_PATTERN,
+    LazyMethod,
+    DEFAULT_PROFILE,
+    ParserProfile,
 )
 
 
-# External links (comment inclusive)
-BRACKET_EXTERNALLINK_PATTERN = (
-    rb'\[(?>//|' + BARE_EXTLINK_SCHEMES_PATTERN + rb')'
-    + VALID_EXTLINK_CHARS + rb'\ *+[^\]\n]*+\]'
-)
-BARE_EXTERNALLINK_PATTERN = (
-    rb'(?>' + BARE_EXTLINK_SCHEMES_PATTERN + rb')' + VALID_EXTLINK_CHARS
-)
-EXTERNALLINK_FINDITER = regex_compile(
-    rb'(?:' + BARE_EXTERNALLINK_PATTERN
-    + rb'|' + BRACKET_EXTERNALLINK_PATTERN + rb')',
-    IGNORECASE,
-).finditer
-INVALID_EXT_CHARS_SUB = regex_compile(
-    rb'[' + INVALID_EXTLINK_CHARS + rb']'
-).sub
+INVALID_EXT_CHARS_SUB = LazyMethod(
+    'sub', rb'[' + INVALID_EXTLINK_CHARS + rb']')
 
 # Sections
-SECTIONS_FULLMATCH = regex_compile(
+SECTIONS_FULLMATCH = LazyMethod(
+    'fullmatch',
     rb'''
     (?<section>.*?)
     (?<section>
@@ -53,10 +50,11 @@ SECTIONS_FULLMATCH = regex_compile(
     )*  # todo: why can't be made possessive?
     ''',
     DOTALL | MULTILINE | VERBOSE,
-).fullmatch
+)
 
 # Tables
-TABLE_FINDITER = regex_compile(
+TABLE_FINDITER = LazyMethod(
+    'finditer',
     rb"""
     # Table-start
     # Always starts on a new line with optional leading spaces or indentation.
@@ -72,8 +70,8 @@ TABLE_FINDITER = regex_compile(
     \n\s*+
     (?> \|} | \Z )
     """,
-    DOTALL | MULTILINE | VERBOSE
-).finditer
+    DOTALL | MULTILINE | VERBOSE,
+)
 
 # Types which are detected by the
 SPAN_PARSER_TYPES = {
@@ -81,9 +79,131 @@ SPAN_PARSER_TYPES = {
     'ExtensionTag',
 }
 
+# The span types that are masked in shadows. See WikiText._shadow.
+MASKED_TYPES = (
+    'Comment', 'ExtensionTag', 'WikiLink', 'Parameter', 'ParserFunction',
+    'Template',
+)
+
 WS = '\r\n\t '
 
 
+def _edited_span(
+    span: List[int], edit: Tuple[int, int, str], delta: int,
+    self_span: List[int],
+) -> Optional[List[int]]:
+    """Return the new span after doing ``self[start:stop] = text``.
+
+    This follows the rules of `_close_subspans`, `_insert_update`, and
+    `_shrink_update`. self_span is the span of self at the time of the edit.
+    Return None if the span is removed.
+    """
+    s, e = span
+    start, stop, text = edit
+    if start <= s < stop and e <= stop and span != self_span:
+        # Closed sub-span
+        return None
+    if delta > 0:
+        # Insertion of delta characters at start
+        if start < e or e == start == self_span[1]:
+            e += delta
+            if start < s or s == start != self_span[0]:
+                s += delta
+    elif delta < 0:
+        # Removal of the characters between stop + delta and stop
+        rmstart = stop + delta
+        if stop <= s:
+            s += delta
+            e += delta
+        elif rmstart <= s:
+            if stop < e:
+                s = rmstart
+                e += delta
+            else:
+                return None
+        elif stop <= e:
+            e += delta
+        elif rmstart < e:
+            if span != self_span:
+                # The end of the span is removed.
+                return None
+            e = rmstart
+    return [s, e]
+
+
+class LazyTypeToSpans(TypeToSpans):
+
+    """A _type_to_spans dict that parses the missing span types on demand.
+
+    Used for the objects that are created with the `types` argument.
+    """
+
+    __slots__ = '_lststr',
+
+    def __init__(
+        self,
+        lststr: MutableSequence[str],
+        type_to_spans: Dict[str, List[List[int]]],
+    ) -> None:
+        super().__init__(type_to_spans)
+        self._lststr = lststr
+
+    def __reduce__(self) -> tuple:
+        """Copy or pickle the spans along with the lststr."""
+        return (type(self), (self._lststr, {})) + super().__reduce__()[2:]
+
+    def __missing__(self, key: str) -> List[List[int]]:
+        """Parse the current string and add the spans of the missing types."""
+        if key in self._arrays or key not in SPAN_PARSER_TYPES:
+            return super().__missing__(key)
+        profile = getattr(self, '_profile', None) or DEFAULT_PROFILE
+        for type_, spans in parse_to_spans(
+            profile.shadow(self._lststr[0]), profile=profile,
+        ).items():
+            if type_ not in self:
+                self[type_] = spans
+        return self[key]
+
+
+class ParseOnAccess:
+
+    """Parse the string of a lazy object when its spans are needed.
+
+    This is a non-data descriptor, i.e. once the _type_to_spans attribute is
+    set on the instance, it takes precedence and the descriptor is no longer
+    called.
+
+    The string given to __init__ is parsed, not the current one. All the
+    methods that change the string access _type_to_spans right after
+    changing it and will update the spans accordingly.
+    """
+
+    def __get__(
+        self, instance: Optional['WikiText'], owner: type,
+    ) -> Union['ParseOnAccess', Dict[str, List[List[int]]]]:
+        """Return the parsed _type_to_spans of the instance."""
+        if instance is None:
+            return self
+        instance_dict = instance.__dict__
+        try:
+            string, types, profile = instance_dict['_lazy_parse']
+        except KeyError:
+            raise AttributeError('_type_to_spans') from None
+        # Keep _lazy_parse until parsing succeeds, so that it can be retried
+        # after a ParseTimeout.
+        spans = parse_to_spans(
+            (profile or DEFAULT_PROFILE).shadow(string), types, profile)
+        del instance_dict['_lazy_parse']
+        type_to_spans = instance._type_to_spans = LazyTypeToSpans(
+            instance._lststr, spans)
+        if profile is not None:
+            type_to_spans._profile = profile
+        # The string given to __init__ is the one before the first change.
+        type_to_spans._parse_version = 0
+        type_to_spans[instance._type] = [instance._span]
+        return type_to_spans
+
+
 class WikiText:
 
     """The WikiText class."""
@@ -92,11 +212,20 @@ class WikiText:
     # Therefore: self._span can be found in self._type_to_spans[self._type].
     # The following acts as a default value.
     _type = 'WikiText'
+    _type_to_spans = ParseOnAccess()
+    # (shadow, the value of self._lststr.modifications when it was cached)
+    _shadow_cache = None, -1  # type: Any
+    # (index, the normal_template_name arguments, modifications), see
+    # _template_index
+    _template_index_cache = None, None, -1  # type: Any
 
     def __init__(
         self,
         string: Union[MutableSequence[str], str],
         _type_to_spans: Dict[str, List[List[int]]]=None,
+        types: Optional[Iterable[str]]=None,
+        timeout: Optional[float]=None,
+        profile: Optional[ParserProfile]=None,
     ) -> None:
         """Initialize the object.
 
@@ -107,21 +236,62 @@ class WikiText:
         :param _type_to_spans: If the lststr is already parsed, pass its
             _type_to_spans property as _type_to_spans to avoid parsing it
             again.
+        :param types: The span types that are going to be used, e.g.
+            ``{'WikiLink'}``. If given, parsing is deferred until the spans
+            are needed for the first time and then only the given types (and
+            the types that they depend on) are parsed. Any other type in
+            SPAN_PARSER_TYPES is parsed when it is accessed for the first time.
+        :param timeout: The maximum number of seconds that parsing the string
+            may take. ParseTimeout is raised if it takes longer. It does not
+            apply to deferred parsing; use the `deadline` context manager to
+            limit that and the expensive properties.
+        :param profile: The ParserProfile of the wiki that the string belongs
+            to. The default profile is used if it is None. The sub-nodes and
+            the strings that are later inserted are parsed using the same
+            profile.
         """
         if _type_to_spans:
             self._type_to_spans = _type_to_spans
-            self._lststr = string  # type: MutableSequence[str]
+            if not isinstance(string, PieceTable):
+                # A list containing the string.
+                string = PieceTable(string[0])
+            self._lststr = string  # type: PieceTable
             return
-        self._lststr = [string]
+        self._lststr = PieceTable(string)
         span = [0, len(string)]
         self._span = span
-        byte_array = bytearray(string, 'ascii', 'replace')
+        if types is not None:
+            # See ParseOnAccess.
+            self._lazy_parse = string, frozenset(types), profile
+            return
+        if timeout is None:
+            self._parse(string, span, profile)
+            return
+        with deadline(timeout):
+            self._parse(string, span, profile)
+
+    def _parse(
+        self, string: str, span: List[int],
+        profile: Optional[ParserProfile],
+    ) -> None:
+        """Set self._type_to_spans and self._shadow_cache for a new root."""
         _type = self._type
         if _type not in SPAN_PARSER_TYPES:
-            type_to_spans = self._type_to_spans = parse_to_spans(byte_array)
+            parse_cache = _cache.parse_cache
+            if parse_cache is None:
+                byte_array = (profile or DEFAULT_PROFILE).shadow(string)
+                type_to_spans = TypeToSpans(
+                    parse_to_spans(byte_array, profile=profile))
+            else:
+                type_to_spans, byte_array = parse_cache.parse(string, profile)
+            if profile is not None:
+                type_to_spans._profile = profile
+            type_to_spans._parse_version = self._lststr.modifications
+            self._type_to_spans = type_to_spans
             type_to_spans[_type] = [span]
-            self._shadow_cache = string, byte_array
+            self._shadow_cache = byte_array, self._lststr.modifications
         else:
+            byte_array = (profile or DEFAULT_PROFILE).shadow(string)
             # In SPAN_PARSER_TYPES, we can't pass the original byte_array to
             # parser to generate the shadow because it will replace the whole
             # string with '_'. OTH, we can't modify before passing because
@@ -130,8 +300,12 @@ class WikiText:
             head = byte_array[:2]
             tail = byte_array[-2:]
             byte_array[-2:] = byte_array[:2] = b'__'
-            type_to_spans = parse_to_spans(byte_array)
-            self._shadow_cache = string, byte_array
+            type_to_spans = TypeToSpans(
+                parse_to_spans(byte_array, profile=profile))
+            if profile is not None:
+                type_to_spans._profile = profile
+            type_to_spans._parse_version = self._lststr.modifications
+            self._shadow_cache = byte_array, self._lststr.modifications
             type_to_spans[_type].insert(0, span)
             self._type_to_spans = type_to_spans
             byte_array[:2] = head
@@ -221,9 +395,8 @@ class WikiText:
         """
         start, stop = self._check_index(key)
         # Update lststr
-        lststr = self._lststr
-        lststr0 = lststr[0]
-        lststr[0] = lststr0[:start] + value + lststr0[stop:]
+        self._lststr.splice(start, stop, value)
+        self._touch_spans(start, stop)
         # Set the length of all subspans to zero because
         # they are all being replaced.
         self._close_subspans(start, stop)
@@ -238,11 +411,15 @@ class WikiText:
             )
         # Add the newly added spans contained in the value.
         type_to_spans = self._type_to_spans
+        profile = getattr(type_to_spans, '_profile', None) or DEFAULT_PROFILE
         for type_, spans in parse_to_spans(
-            bytearray(value, 'ascii', 'replace')
+            profile.shadow(value), profile=profile,
         ).items():
+            # The missing types of a LazyTypeToSpans will be parsed later.
+            if type_ not in type_to_spans:
+                continue
             for s, e in spans:
-                insort(type_to_spans[type_], [s + start, e + start])
+                insort_span(type_to_spans, type_, [s + start, e + start])
 
     def __delitem__(self, key: Union[slice, int]) -> None:
         """Remove the specified range or character from self.string.
@@ -252,10 +429,9 @@ class WikiText:
         possibility of insertion into the wrong spans.
         """
         start, stop = self._check_index(key)
-        lststr = self._lststr
-        lststr0 = lststr[0]
         # Update lststr
-        lststr[0] = lststr0[:start] + lststr0[stop:]
+        self._lststr.splice(start, stop, '')
+        self._touch_spans(start, stop)
         # Update spans
         self._shrink_update(start, stop)
 
@@ -271,8 +447,6 @@ class WikiText:
         If parse is False, don't parse the inserted string.
         """
         ss, se = self._span
-        lststr = self._lststr
-        lststr0 = lststr[0]
         if index < 0:
             index += se - ss
             if index < 0:
@@ -281,7 +455,8 @@ class WikiText:
             index = se - ss
         index += ss
         # Update lststr
-        lststr[0] = lststr0[:index] + string + lststr0[index:]
+        self._lststr.splice(index, index, string)
+        self._touch_spans(index, index)
         string_len = len(string)
         # Update spans
         self._insert_update(
@@ -290,11 +465,129 @@ class WikiText:
         )
         # Remember newly added spans by the string.
         type_to_spans = self._type_to_spans
+        profile = getattr(type_to_spans, '_profile', None) or DEFAULT_PROFILE
         for type_, spans in parse_to_spans(
-            bytearray(string, 'ascii', 'replace')
+            profile.shadow(string), profile=profile,
         ).items():
+            # The missing types of a LazyTypeToSpans will be parsed later.
+            if type_ not in type_to_spans:
+                continue
             for s, e in spans:
-                insort(type_to_spans[type_], [index + s, index + e])
+                insort_span(type_to_spans, type_, [index + s, index + e])
+
+    def apply_edits(self, edits: Iterable[Tuple[int, int, str]]) -> int:
+        """Replace several non-overlapping slices of self.string at once.
+
+        Each edit is a (start, stop, text) tuple, indexed like self.string.
+        The result is the same as doing ``self[start:stop] = text`` for each
+        of the edits from right to left, i.e. the given positions all refer
+        to the current string, but the string is rebuilt once and the spans
+        are updated in a single sweep.
+
+        Raise ValueError if any of the edits overlap. Return the number of
+        edits that were applied.
+        """
+        check_index = self._check_index
+        edits = sorted(
+            (
+                check_index(slice(start, stop)) + (text,)
+                for start, stop, text in edits
+            ),
+            key=itemgetter(0, 1),
+        )
+        if not edits:
+            return 0
+        last_stop = edits[0][0]
+        for start, stop, text in edits:
+            if start < last_stop:
+                raise ValueError('edits overlap')
+            last_stop = stop
+        # Edits are applied from right to left. For the k-th edit record its
+        # length change, the sum of the changes of edits[:k + 1], and the
+        # span of self right before it is applied.
+        deltas = [len(text) + start - stop for start, stop, text in edits]
+        cumulative_deltas = list(accumulate(deltas))
+        stops = [stop for start, stop, text in edits]
+        starts = [start for start, stop, text in edits]
+        self_spans = [None] * len(edits)  # type: List[Any]
+        self_span = self._span[:]
+        for k in range(len(edits) - 1, -1, -1):
+            self_spans[k] = self_span
+            self_span = _edited_span(
+                self_span, edits[k], deltas[k], self_span
+            ) or [-1, -1]
+
+        def update(s: int, e: int, k: int) -> Optional[List[int]]:
+            """Return the new span for (s, e) after applying edits[:k + 1].
+
+            Return None if the span is removed.
+            """
+            span = [s, e]
+            while k >= 0:
+                if stops[k] < span[0] and stops[k] < span[1]:
+                    # The rest of the edits are before span.
+                    shift = cumulative_deltas[k]
+                    span[0] += shift
+                    span[1] += shift
+                    return span
+                span = _edited_span(span, edits[k], deltas[k], self_spans[k])
+                if span is None:
+                    return None
+                k -= 1
+            return span
+
+        # Update lststr
+        lststr = self._lststr
+        substring = lststr.substring
+        first_start = edits[0][0]
+        pieces = []  # type: List[str]
+        pieces_append = pieces.append
+        last_stop = first_start
+        for start, stop, text in edits:
+            pieces_append(substring(last_stop, start))
+            pieces_append(text)
+            last_stop = stop
+        lststr.splice(first_start, last_stop, ''.join(pieces))
+        touch_spans = self._touch_spans
+        for start, stop, text in edits:
+            touch_spans(start, stop)
+        # Update spans
+        type_to_spans = self._type_to_spans
+        removed_spans = []  # type: List[List[int]]
+        for spans in type_to_spans.values():
+            removed = set()  # type: set
+            for span in spans:
+                s, e = span
+                # Edits that start after the span do not change it.
+                new_span = update(s, e, bisect(starts, max(s, e)) - 1)
+                if new_span is None:
+                    span[:] = -1, -1
+                    removed.add(id(span))
+                    removed_spans.append(span)
+                else:
+                    span[:] = new_span
+            if removed:
+                spans[:] = [span for span in spans if id(span) not in removed]
+            # The spans that lost their start now start where the removal
+            # did, possibly before the shorter spans that started in it.
+            spans.sort()
+        self._remove_child_spans(removed_spans)
+        # Add the newly added spans contained in the texts.
+        profile = getattr(type_to_spans, '_profile', None) or DEFAULT_PROFILE
+        for k, (start, stop, text) in enumerate(edits):
+            if not text:
+                continue
+            for type_, spans in parse_to_spans(
+                profile.shadow(text), profile=profile,
+            ).items():
+                # The missing types of a LazyTypeToSpans will be parsed later.
+                if type_ not in type_to_spans:
+                    continue
+                for s, e in spans:
+                    new_span = update(s + start, e + start, k - 1)
+                    if new_span is not None:
+                        insort_span(type_to_spans, type_, new_span)
+        return len(edits)
 
     @property
     def span(self) -> tuple:
@@ -305,7 +598,7 @@ class WikiText:
     def string(self) -> str:
         """Return str(self)."""
         start, end = self._span
-        return self._lststr[0][start:end]
+        return self._lststr.substring(start, end)
 
     @string.setter
     def string(self, newstring: str) -> None:
@@ -316,10 +609,11 @@ class WikiText:
         """Partition self.string where `char`'s not in atomic sub-spans."""
         s, e = self._span
         index = self._shadow.find(char)
+        substring = self._lststr.substring
         if index == -1:
-            return self._lststr[0][s:e], '', ''
-        lststr0 = self._lststr[0]
-        return lststr0[s:s + index], chr(char), lststr0[s + index + 1:e]
+            return substring(s, e), '', ''
+        return (
+            substring(s, s + index), chr(char), substring(s + index + 1, e))
 
     def _subspans(self, type_: str) -> List[List[int]]:
         """Return all the sub-span including self._span."""
@@ -328,13 +622,66 @@ class WikiText:
     def _close_subspans(self, start: int, stop: int) -> None:
         """Close all sub-spans of (start, stop)."""
         ss, se = self._span
+        removed_spans = []  # type: List[List[int]]
         for spans in self._type_to_spans.values():
             b = bisect(spans, [start])
             for i, (s, e) in enumerate(spans[b:bisect(spans, [stop], b)]):
                 if e <= stop:
                     if ss != s or se != e:
-                        spans.pop(i + b)[:] = -1, -1
+                        span = spans.pop(i + b)
+                        span[:] = -1, -1
+                        removed_spans.append(span)
                         b -= 1
+        self._remove_child_spans(removed_spans)
+
+    def _remove_child_spans(self, removed_spans: List[List[int]]) -> None:
+        """Forget the sub-spans that are stored under the removed spans.
+
+        TlPfMixin.arguments and Table.cells store the spans of arguments and
+        cells under the id of the span of their template or table. Once that
+        span is removed, the stored spans can no longer be reached; keeping
+        them would grow _type_to_spans with each edit and slow down the
+        updates that visit all the spans.
+        """
+        if not removed_spans:
+            return
+        type_to_spans = self._type_to_spans
+        parents = getattr(type_to_spans, '_parents', None)
+        for span in removed_spans:
+            key = id(span)
+            if type_to_spans.pop(key, None) is not None and parents:
+                parents.pop(key, None)
+
+    def _touch_spans(self, start: int, stop: int) -> None:
+        """Set the version of the spans that intersect [start, stop].
+
+        Must be called right after self._lststr is modified, while the spans
+        still refer to the old string. Spans that only touch the boundaries
+        are also included. See PieceTable.span_version.
+        """
+        lststr = self._lststr
+        versions = lststr.versions
+        version = lststr.modifications
+        type_to_spans = self._type_to_spans
+        for type_, spans in type_to_spans.items():
+            # s <= stop
+            i = bisect_left(spans, [stop + 1])
+            if i < MIN_INDEXED_SPANS:
+                # Scanning short lists is faster than using enclosing_spans.
+                for span in islice(spans, i):
+                    if start <= span[1]:
+                        versions[id(span)] = version
+                continue
+            # s <= start <= e
+            for span in enclosing_spans(type_to_spans, type_, start, start):
+                versions[id(span)] = version
+            # start <= s <= stop
+            for span in islice(spans, bisect_left(spans, [start], 0, i), i):
+                versions[id(span)] = version
+        if len(versions) > lststr.max_versions:
+            lststr.prune_versions(
+                id(span) for spans in type_to_spans.values()
+                for span in spans)
 
     def _shrink_update(self, rmstart: int, rmstop: int) -> None:
         """Update self._type_to_spans according to the removed span.
@@ -345,63 +692,121 @@ class WikiText:
         can cause data loss in self._type_to_spans.
         """
         # Note: No span should be removed from _type_to_spans.
-        for spans in self._type_to_spans.values():
-            i = len(spans) - 1
-            while i >= 0:
-                s, e = span = spans[i]
-                if rmstop <= s:
-                    # rmstart <= rmstop <= s <= e
-                    rmlength = rmstop - rmstart
-                    span[:] = s - rmlength, e - rmlength
+        rmlength = rmstop - rmstart
+        self_span = self._span
+        type_to_spans = self._type_to_spans
+        removed_spans = []  # type: List[List[int]]
+        removed_spans_append = removed_spans.append
+        for type_, spans in type_to_spans.items():
+            if len(spans) < MIN_INDEXED_SPANS:
+                # Scanning short lists is faster than using enclosing_spans.
+                i = len(spans) - 1
+                while i >= 0:
+                    span = spans[i]
+                    s, e = span
+                    if rmstop <= s:
+                        # rmstart <= rmstop <= s <= e
+                        span[:] = s - rmlength, e - rmlength
+                    elif rmstart <= s:
+                        if rmstop < e:
+                            # rmstart <= s < rmstop < e
+                            span[:] = rmstart, e - rmlength
+                        else:
+                            # rmstart <= s <= e <= rmstop
+                            spans.pop(i)[:] = -1, -1
+                            removed_spans_append(span)
+                    elif rmstart < e:
+                        if rmstop <= e:
+                            # s < rmstart < rmstop <= e
+                            span[1] = e - rmlength
+                        elif span is self_span:
+                            span[1] = rmstart
+                        else:
+                            # s < rmstart < e < rmstop, the end is removed.
+                            spans.pop(i)[:] = -1, -1
+                            removed_spans_append(span)
                     i -= 1
-                    continue
-                break
-            else:
                 continue
-            while True:
-                if rmstart <= s:
-                    if rmstop < e:
-                        # rmstart < s <= rmstop < e
-                        span[:] = rmstart, e + rmstart - rmstop
-                        i -= 1
-                        if i < 0:
-                            break
-                        s, e = span = spans[i]
-                        continue
-                    # rmstart <= s <= e < rmstop
-                    spans.pop(i)[:] = -1, -1
-                    i -= 1
-                    if i < 0:
-                        break
-                    s, e = span = spans[i]
+            # s < rmstart < e, find them before changing the other spans.
+            enclosing = []  # type: List[List[int]]
+            for span in enclosing_spans(
+                type_to_spans, type_, rmstart, rmstart + 1,
+            ):
+                if rmstart <= span[0]:
                     continue
-                break
-            while i >= 0:
-                if e <= rmstart:
-                    # s <= e <= rmstart <= rmstop
-                    i -= 1
-                    if i < 0:
-                        break
-                    s, e = span = spans[i]
+                if rmstop <= span[1]:
+                    enclosing.append(span)
                     continue
-                # s <= rmstart <= rmstop <= e
-                span[1] -= rmstop - rmstart
-                i -= 1
-                if i < 0:
-                    break
-                s, e = span = spans[i]
-                continue
+                if span is self_span:
+                    span[1] = rmstart
+                    continue
+                # s < rmstart < e < rmstop, the end is removed.
+                i = bisect_left(spans, span)
+                while spans[i] is not span:
+                    i += 1
+                del spans[i]
+                span[:] = -1, -1
+                removed_spans_append(span)
+            i = bisect_left(spans, [rmstop])
+            for span in islice(spans, i, None):
+                # rmstart <= rmstop <= s <= e
+                span[0] -= rmlength
+                span[1] -= rmlength
+            for i in range(i - 1, bisect_left(spans, [rmstart], 0, i) - 1, -1):
+                span = spans[i]
+                e = span[1]
+                if rmstop < e:
+                    # rmstart <= s < rmstop < e
+                    span[:] = rmstart, e - rmlength
+                    continue
+                # rmstart <= s <= e <= rmstop
+                spans.pop(i)[:] = -1, -1
+                removed_spans_append(span)
+            for span in enclosing:
+                # s < rmstart < rmstop <= e
+                span[1] -= rmlength
+        for spans in type_to_spans.values():
+            # The remaining spans that started in the removed range now start
+            # at rmstart. Keep them sorted by their new ends.
+            i = bisect_left(spans, [rmstart])
+            j = bisect_left(spans, [rmstart + 1], i)
+            if j - i > 1:
+                spans[i:j] = sorted(spans[i:j])
+        self._remove_child_spans(removed_spans)
 
     def _insert_update(self, index: int, length: int) -> None:
         """Update self._type_to_spans according to the added length."""
         ss, se = self._span
-        for spans in self._type_to_spans.values():
-            for span in spans:
-                if index < span[1] or span[1] == index == se:
-                    span[1] += length
+        type_to_spans = self._type_to_spans
+        for type_, spans in type_to_spans.items():
+            if len(spans) < MIN_INDEXED_SPANS:
+                # Scanning short lists is faster than using enclosing_spans.
+                for span in spans:
+                    if index < span[1] or span[1] == index == se:
+                        span[1] += length
+                        # index is before s, or at s but not on self_span
+                        if index < span[0] or span[0] == index != ss:
+                            span[0] += length
+                continue
+            # s < index <= e, find them before changing the other spans.
+            enclosing = [
+                span for span in enclosing_spans(
+                    type_to_spans, type_, index, index)
+                if span[0] < index
+            ]
+            for span in islice(spans, bisect_left(spans, [index]), None):
+                # index <= s <= e
+                s, e = span
+                if index < e or index == se:
+                    span[1] = e + length
                     # index is before s, or at s but not on self_span
-                    if index < span[0] or span[0] == index != ss:
-                        span[0] += length
+                    if index < s or s != ss:
+                        span[0] = s + length
+            for span in enclosing:
+                # s < index <= e
+                e = span[1]
+                if index < e or e == se:
+                    span[1] = e + length
 
     @property
     def nesting_level(self) -> int:
@@ -411,14 +816,16 @@ class WikiText:
         ParserFunction increases the level by one.
         """
         ss, se = self._span
-        level = 0
         type_to_spans = self._type_to_spans
-        for type_ in ('Template', 'ParserFunction'):
-            spans = type_to_spans[type_]
-            for s, e in spans[:bisect(spans, [ss + 1])]:
-                if se <= e:
-                    level += 1
-        return level
+        return (
+            len(enclosing_spans(type_to_spans, 'Template', ss, se))
+            + len(enclosing_spans(type_to_spans, 'ParserFunction', ss, se))
+        )
+
+    @property
+    def _profile(self) -> Optional[ParserProfile]:
+        """Return the ParserProfile that self has been parsed with, if any."""
+        return getattr(self._type_to_spans, '_profile', None)
 
     @property
     def _shadow(self) -> bytearray:
@@ -434,30 +841,67 @@ class WikiText:
 
         This function is called upon extracting tables or extracting the data
         inside them.
+
+        The shadow of the root is found while parsing. If the string has not
+        been changed since it was parsed, the known sub-spans are masked, see
+        mask_known_spans. Otherwise self.string is parsed again, because the
+        known spans may no longer match it, e.g. after a template is replaced
+        with the start of a table.
         """
-        ss, se = self._span
-        string = self._lststr[0][ss:se]
-        cached_string, shadow = getattr(
-            self, '_shadow_cache', (None, None))
-        if cached_string == string:
+        shadow, version = self._shadow_cache
+        lststr = self._lststr
+        span = self._span
+        if lststr.span_version(span) <= version:
             return shadow
-        # In the old method the existing spans were used to create the shadow.
-        # But it was slow because there can be thousands of spans and iterating
-        # over them to find the relevant sub-spans could take a significant
-        # amount of time. The new method tries to parse the self.string which
-        # is usually much more faster because there are usually far less
-        # sub-spans for individual objects.
+        ss, se = span
+        string = lststr.substring(ss, se)
         shadow = bytearray(string, 'ascii', 'replace')
-        if self._type in SPAN_PARSER_TYPES:
-            head = shadow[:2]
-            tail = shadow[-2:]
-            shadow[:2] = shadow[-2:] = b'__'
-            parse_to_spans(shadow)
-            shadow[:2] = head
-            shadow[-2:] = tail
+        type_ = self._type
+        is_span_parser_type = type_ in SPAN_PARSER_TYPES
+        # All sub-spans start with '{', '[', or '<', and the other masked
+        # characters are braces. The first and the last two characters of
+        # SPAN_PARSER_TYPES are their own marks.
+        find = shadow.find
+        if is_span_parser_type:
+            i, j = 2, se - ss - 2
         else:
-            parse_to_spans(shadow)
-        self._shadow_cache = string, shadow
+            i, j = 0, se - ss
+        if -1 == find(123, i, j) == find(125, i, j) == find(
+            91, i, j
+        ) == find(60, i, j):
+            # There is nothing to mask.
+            pass
+        elif type_ != 'Comment' and type_ != 'ExtensionTag' and (
+            lststr.modifications == getattr(
+                self._type_to_spans, '_parse_version', -1)
+        ) and all(t in self._type_to_spans for t in MASKED_TYPES):
+            # The sub-spans are already known and the string has not been
+            # changed since they were parsed. Mask them instead of parsing
+            # self.string again. The contents of comments and extension tags
+            # may not be parsed, and the types of a LazyTypeToSpans may not
+            # be parsed yet.
+            if is_span_parser_type:
+                head = shadow[:2]
+                tail = shadow[-2:]
+                shadow[:2] = shadow[-2:] = b'__'
+                mask_known_spans(shadow, self._type_to_spans, ss, se, True)
+                shadow[:2] = head
+                shadow[-2:] = tail
+            else:
+                mask_known_spans(shadow, self._type_to_spans, ss, se, False)
+        else:
+            profile = self._profile or DEFAULT_PROFILE
+            shadow = profile.shadow(string)
+            if is_span_parser_type:
+                head = shadow[:2]
+                tail = shadow[-2:]
+                shadow[:2] = shadow[-2:] = b'__'
+                parse_to_spans(shadow, profile=profile)
+                shadow[:2] = head
+                shadow[-2:] = tail
+            else:
+                parse_to_spans(shadow, profile=profile)
+        self._shadow_cache = shadow, lststr.modifications
         return shadow
 
     @property
@@ -468,8 +912,8 @@ class WikiText:
         'ParserFunction', 'Parameter') only invalid characters are replaced.
         """
         ss, se = self._span
-        string = self._lststr[0][ss:se]
-        byte_array = bytearray(string, 'ascii', 'replace')
+        string = self._lststr.substring(ss, se)
+        byte_array = (self._profile or DEFAULT_PROFILE).shadow(string)
         subspans = self._subspans
         for type_ in 'Template', 'ParserFunction', 'Parameter':
             for s, e in subspans(type_):
@@ -484,15 +928,19 @@ class WikiText:
         Only return sub-spans and change the them to fit the new scope, i.e
         self.string.
         """
+        type_to_spans = self._type_to_spans
+        # Make sure that the types that are not parsed yet are included.
+        for type_ in SPAN_PARSER_TYPES:
+            type_to_spans[type_]
         ss, se = self._span
-        if ss == 0 and se == len(self._lststr[0]):
-            return deepcopy(self._type_to_spans)
-        return {
+        if ss == 0 and se == len(self._lststr):
+            return deepcopy(type_to_spans)
+        return TypeToSpans({
             type_: [
                 [s - ss, e - ss] for s, e in spans[bisect(spans, [ss]):]
                 if e <= se
-            ] for type_, spans in self._type_to_spans.items()
-        }
+            ] for type_, spans in type_to_spans.items()
+        })
 
     def pprint(self, indent: str= '    ', remove_comments=False):
         """Deprecated, use self.pformat instead."""
@@ -513,20 +961,20 @@ class WikiText:
         ws = WS
         # Do not try to do inplace pformat. It will overwrite on some spans.
         string = self.string
-        parsed = WikiText([string], self._pp_type_to_spans())
+        parsed = WikiText(PieceTable(string), self._pp_type_to_spans())
         # Since _type_to_spans arg of WikiText has been used, parsed._span
         # is not set yet.
         span = [0, len(string)]
         parsed._span = span
         parsed._type_to_spans['WikiText'] = [span]
         if remove_comments:
-            for c in parsed.comments:
-                del c[:]
+            parsed.apply_edits(
+                (s, e, '') for s, e in parsed._type_to_spans['Comment'])
         else:
             # Only remove comments that contain whitespace.
-            for c in parsed.comments:
-                if not c.contents.strip(ws):
-                    del c[:]
+            parsed.apply_edits(
+                (c._span[0], c._span[1], '') for c in parsed.comments
+                if not c.contents.strip(ws))
         # First remove all current spacings.
         for template in reversed(parsed.templates):
             stripped_tl_name = template.name.strip(ws)
@@ -689,6 +1137,26 @@ class WikiText:
             functions = parsed.parser_functions
         return parsed.string
 
+    def _iter_nodes(
+        self, type_: str, node_class: type, reverse: bool,
+        spans: Optional[List[List[int]]]=None,
+    ) -> Generator[Any, None, None]:
+        """Yield a node_class object for each span of the given type.
+
+        The spans are taken before yielding the first node so that the nodes
+        can be edited during the iteration. The spans that are removed by
+        such edits are skipped.
+        """
+        if spans is None:
+            spans = list(self._subspans(type_))
+        if reverse:
+            spans.reverse()
+        lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        for span in spans:
+            if span[1] != -1:
+                yield node_class(lststr, type_to_spans, span)
+
     @property
     def parameters(self) -> List['Parameter']:
         """Return a list of parameter objects."""
@@ -700,6 +1168,19 @@ class WikiText:
             ) for span in self._subspans('Parameter')
         ]
 
+    def iter_parameters(
+        self, reverse: bool=False
+    ) -> Generator['Parameter', None, None]:
+        """Yield the parameter objects in the order of their appearance.
+
+        Unlike the parameters property, the objects are created lazily.
+
+        :param reverse: Yield the last parameter first. Editing a node does
+            not change the spans that come before it, so use this when the
+            yielded nodes are going to be edited.
+        """
+        return self._iter_nodes('Parameter', Parameter, reverse)
+
     @property
     def parser_functions(self) -> List['ParserFunction']:
         """Return a list of parser function objects."""
@@ -711,6 +1192,12 @@ class WikiText:
             ) for span in self._subspans('ParserFunction')
         ]
 
+    def iter_parser_functions(
+        self, reverse: bool=False
+    ) -> Generator['ParserFunction', None, None]:
+        """Yield the parser function objects lazily, see iter_parameters."""
+        return self._iter_nodes('ParserFunction', ParserFunction, reverse)
+
     @property
     def templates(self) -> List['Template']:
         """Return a list of templates as template objects."""
@@ -722,6 +1209,95 @@ class WikiText:
             ) for span in self._subspans('Template')
         ]
 
+    def iter_templates(
+        self, reverse: bool=False
+    ) -> Generator['Template', None, None]:
+        """Yield the template objects lazily, see iter_parameters."""
+        return self._iter_nodes('Template', Template, reverse)
+
+    def _template_index(
+        self, rm_namespaces: Iterable[str], capital_links: bool,
+        code: Optional[str],
+    ) -> Dict[str, List[List[int]]]:
+        """Return a dict of normal template names to template spans.
+
+        The spans of each name are in the order of their appearance. The
+        index of the last given arguments is cached until self is modified.
+        """
+        key = tuple(rm_namespaces), capital_links, code
+        cached_index, cached_key, version = self._template_index_cache
+        lststr = self._lststr
+        if cached_key == key and lststr.span_version(self._span) <= version:
+            return cached_index
+        index = {}  # type: Dict[str, List[List[int]]]
+        index_setdefault = index.setdefault
+        type_to_spans = self._type_to_spans
+        string = self.string
+        ss = self._span[0]
+        for span in self._subspans('Template'):
+            s, e = span
+            template_string = string[s - ss:e - ss]
+            bar = template_string.find('|')
+            name = template_string[2:bar if bar != -1 else -2]
+            if '{' in name or '[' in name or '<' in name:
+                # There may be sub-nodes or comments with bars in the name.
+                name = Template(lststr, type_to_spans, span).name
+            index_setdefault(
+                normal_template_name(name, *key), []).append(span)
+        self._template_index_cache = index, key, lststr.modifications
+        return index
+
+    def templates_by_name(
+        self, rm_namespaces: Iterable[str]=('Template',),
+        capital_links: bool=False, code: Optional[str]=None,
+    ) -> Dict[str, List['Template']]:
+        """Return a dict of the normal names of templates to the templates.
+
+        The names are normalized once for all the templates and the result is
+        reused until self is modified. See Template.normal_name for the
+        parameters.
+        """
+        lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        return {
+            name: [Template(lststr, type_to_spans, span) for span in spans]
+            for name, spans in self._template_index(
+                rm_namespaces, capital_links, code).items()
+        }
+
+    def find_templates(
+        self, names: Union[str, Iterable[str]],
+        rm_namespaces: Iterable[str]=('Template',),
+        capital_links: bool=False, code: Optional[str]=None,
+    ) -> List['Template']:
+        """Return the templates that have any of the given names.
+
+        The names of the templates and the given names are normalized in the
+        same way, see Template.normal_name for the parameters. The templates
+        are in the order of their appearance.
+
+        Example:
+            >>> WikiText('{{a}} {{B_c}} {{Template:b c}}').find_templates(
+            ...     ['b c', 'd'], capital_links=True)
+            [Template('{{B_c}}'), Template('{{Template:b c}}')]
+        """
+        if isinstance(names, str):
+            names = names,
+        index_get = self._template_index(
+            rm_namespaces, capital_links, code).get
+        spans = []  # type: List[List[int]]
+        for name in {
+            normal_template_name(name, rm_namespaces, capital_links, code)
+            for name in names
+        }:
+            name_spans = index_get(name)
+            if name_spans is not None:
+                spans += name_spans
+        spans.sort()
+        lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        return [Template(lststr, type_to_spans, span) for span in spans]
+
     @property
     def wikilinks(self) -> List['WikiLink']:
         """Return a list of wikilink objects."""
@@ -733,6 +1309,12 @@ class WikiText:
             ) for span in self._subspans('WikiLink')
         ]
 
+    def iter_wikilinks(
+        self, reverse: bool=False
+    ) -> Generator['WikiLink', None, None]:
+        """Yield the wikilink objects lazily, see iter_parameters."""
+        return self._iter_nodes('WikiLink', WikiLink, reverse)
+
     @property
     def comments(self) -> List['Comment']:
         """Return a list of comment objects."""
@@ -744,186 +1326,224 @@ class WikiText:
             ) for span in self._subspans('Comment')
         ]
 
-    @property
-    def external_links(self) -> List['ExternalLink']:
-        """Return a list of found external link objects.
+    def iter_comments(
+        self, reverse: bool=False
+    ) -> Generator['Comment', None, None]:
+        """Yield the comment objects lazily, see iter_parameters."""
+        return self._iter_nodes('Comment', Comment, reverse)
 
-        Note:
-            Templates adjacent to external links are considered part of the
-            link. In reality, this depends on the contents of the template:
+    def _external_link_spans(self) -> List[List[int]]:
+        """Return the spans of the external links in self.
 
-            >>> WikiText(
-            ...    'http://example.com{{dead link}}'
-            ...).external_links[0].url
-            'http://example.com{{dead link}}'
-
-            >>> WikiText(
-            ...    '[http://example.com{{space template}} text]'
-            ...).external_links[0].url
-            'http://example.com{{space template}}'
+        The spans that are not in self._type_to_spans are added to it.
         """
-        external_links = []  # type: List['ExternalLink']
-        external_links_append = external_links.append
-        type_to_spans = self._type_to_spans
-        lststr = self._lststr
         ss, se = self._span
-        spans = type_to_spans.setdefault('ExternalLink', [])
+        externallink_finditer = (
+            self._profile or DEFAULT_PROFILE).externallink_finditer
+        spans = self._type_to_spans.setdefault('ExternalLink', [])
         if not spans:
             # All the added spans will be new.
             spans_append = spans.append
-            for m in EXTERNALLINK_FINDITER(self._ext_link_shadow):
+            for m in externallink_finditer(self._ext_link_shadow):
                 s, e = m.span()
-                span = [ss + s, ss + e]
-                spans_append(span)
-                external_links_append(
-                    ExternalLink(lststr, type_to_spans, span)
-                )
-            return external_links
+                spans_append([ss + s, ss + e])
+            return spans[:]
         # There are already some ExternalLink spans. Use the already existing
         # ones when the detected span is one of those.
         span_tuple_to_span_get = {(s[0], s[1]): s for s in spans}.get
-        for m in EXTERNALLINK_FINDITER(self._ext_link_shadow):
+        link_spans = []  # type: List[List[int]]
+        link_spans_append = link_spans.append
+        for m in externallink_finditer(self._ext_link_shadow):
             s, e = m.span()
             span = s, e = [s + ss, e + ss]
             old_span = span_tuple_to_span_get((s, e))
             if old_span is None:
-                insort(spans, span)
+                insort_span(self._type_to_spans, 'ExternalLink', span)
             else:
                 span = old_span
-            external_links_append(ExternalLink(lststr, type_to_spans, span))
-        return external_links
+            link_spans_append(span)
+        return link_spans
 
     @property
-    def sections(self) -> List['Section']:
-        """Return a list of section in current wikitext.
+    def external_links(self) -> List['ExternalLink']:
+        """Return a list of found external link objects.
 
-        The first section will always be the lead section, even if it is an
-        empty string.
+        Note:
+            Templates adjacent to external links are considered part of the
+            link. In reality, this depends on the contents of the template:
+
+            >>> WikiText(
+            ...    'http://example.com{{dead link}}'
+            ...).external_links[0].url
+            'http://example.com{{dead link}}'
+
+            >>> WikiText(
+            ...    '[http://example.com{{space template}} text]'
+            ...).external_links[0].url
+            'http://example.com{{space template}}'
         """
-        sections = []  # type: List['Section']
-        sections_append = sections.append
-        type_to_spans = self._type_to_spans
         lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        return [
+            ExternalLink(lststr, type_to_spans, span)
+            for span in self._external_link_spans()
+        ]
+
+    def iter_external_links(
+        self, reverse: bool=False
+    ) -> Generator['ExternalLink', None, None]:
+        """Yield the external link objects lazily, see iter_parameters.
+
+        The text is still searched for all the external links before the
+        first one is yielded.
+        """
+        return self._iter_nodes(
+            'ExternalLink', ExternalLink, reverse,
+            self._external_link_spans())
+
+    def _section_spans(self) -> List[List[int]]:
+        """Return the spans of the sections in self, the lead section first.
+
+        The spans that are not in self._type_to_spans are added to it.
+        """
         ss, se = self._span
-        spans = type_to_spans.setdefault('Section', [])
-        full_match = SECTIONS_FULLMATCH(self._shadow)
+        spans = self._type_to_spans.setdefault('Section', [])
+        full_match = SECTIONS_FULLMATCH(self._shadow, timeout=time_left())
         section_spans = full_match.spans('section')
         levels = [len(eq) for eq in full_match.captures('eq')]
-        s, e = section_spans.pop(0)
-        s, e = s + ss, e + ss
-        if not spans:
-            # All spans are new
-            type_spans_append = spans.append
-            # Lead section
-            lead_span = [s, e]
-            lead_section = Section(lststr, type_to_spans, lead_span)
-            # Other sections
-            for current_level, (s, e) in zip(
-                reversed(levels), reversed(section_spans)
-            ):
-                s, e = s + ss, e + ss
-                # Add text of the current_section to any parent section.
-                # Note that section 0 is not a parent for any subsection.
-                for section, section_level, section_span in zip(
-                    reversed(sections),
-                    levels[-len(sections):],
-                    reversed(spans),
-                ):
-                    if section_level > current_level:
-                        e = section_span[1]
-                    else:
-                        break
-                span = [s, e]
-                type_spans_append(span)
-                sections_append(Section(lststr, type_to_spans, span))
-            sections_append(lead_section)
-            type_spans_append(lead_span)
-            spans.reverse()
-            sections.reverse()
-            return sections
-        # There are already some spans. Instead of appending new spans
-        # use them when the detected span already exists.
-        span_tuple_to_span = {(s[0], s[1]): s for s in spans}.get
-        # Continue lead section
-        old_span = span_tuple_to_span((s, e))
-        if old_span is None:
-            lead_span = [s, e]
-            insort(spans, lead_span)
-        else:
-            lead_span = old_span
-        lead_section = Section(lststr, type_to_spans, lead_span)
-        # Adjust other sections
-        calced_spans = []
+        lead_span = section_spans.pop(0)
+        # The spans of the sections from the last one to the lead section.
+        calced_spans = []  # type: List[Tuple[int, int]]
         calced_spans_append = calced_spans.append
         for current_level, (s, e) in zip(
             reversed(levels), reversed(section_spans)
         ):
-            s, e = s + ss, e + ss
             # Add text of the current_section to any parent section.
             # Note that section 0 is not a parent for any subsection.
-            for section, section_level, section_span in zip(
-                reversed(sections),
-                levels[-len(sections):],
+            for section_level, section_span in zip(
+                levels[-len(calced_spans):],
                 reversed(calced_spans),
             ):
                 if section_level > current_level:
                     e = section_span[1]
                 else:
                     break
+            calced_spans_append((s, e))
+        calced_spans_append(lead_span)
+        calced_spans.reverse()
+        if not spans:
+            # All spans are new
+            spans[:] = [[ss + s, ss + e] for s, e in calced_spans]
+            return spans[:]
+        # There are already some spans. Instead of appending new spans
+        # use them when the detected span already exists.
+        span_tuple_to_span = {(s[0], s[1]): s for s in spans}.get
+        sections_spans = []  # type: List[List[int]]
+        sections_spans_append = sections_spans.append
+        for s, e in calced_spans:
+            s, e = ss + s, ss + e
             old_span = span_tuple_to_span((s, e))
             if old_span is None:
                 span = [s, e]
-                insort(spans, span)
+                insort_span(self._type_to_spans, 'Section', span)
             else:
                 span = old_span
-            calced_spans_append(span)
-            sections_append(Section(lststr, type_to_spans, span))
-        sections_append(lead_section)
-        sections.reverse()
-        return sections
+            sections_spans_append(span)
+        return sections_spans
 
     @property
-    def tables(self) -> List['Table']:
-        """Return a list of found table objects."""
-        tables = []  # type: List['Table']
-        tables_append = tables.append
-        type_to_spans = self._type_to_spans
+    def sections(self) -> List['Section']:
+        """Return a list of section in current wikitext.
+
+        The first section will always be the lead section, even if it is an
+        empty string.
+        """
         lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        return [
+            Section(lststr, type_to_spans, span)
+            for span in self._section_spans()
+        ]
+
+    def iter_sections(
+        self, reverse: bool=False
+    ) -> Generator['Section', None, None]:
+        """Yield the section objects lazily, see iter_parameters.
+
+        The text is still split into sections before the first one is
+        yielded. The lead section is yielded first, or last if reverse is
+        True.
+        """
+        return self._iter_nodes(
+            'Section', Section, reverse, self._section_spans())
+
+    def _table_spans(self) -> List[List[int]]:
+        """Return the spans of the tables in self in the order of detection.
+
+        Nested tables are detected before their parents. The spans that are
+        not in self._type_to_spans are added to it.
+        """
         shadow = self._shadow[:]
         ss, se = self._span
-        spans = type_to_spans.setdefault('Table', [])
+        spans = self._type_to_spans.setdefault('Table', [])
         if not spans:
             # All the added spans will be new.
+            spans_append = spans.append
             m = True  # type: Any
             while m:
                 m = False
-                for m in TABLE_FINDITER(shadow):
+                for m in TABLE_FINDITER(shadow, timeout=time_left()):
                     ms, me = m.span()
                     # Ignore leading whitespace using len(m[1]).
-                    span = [ss + ms + len(m[1]), ss + me]
-                    spans.append(span)
-                    tables_append(Table(lststr, type_to_spans, span))
+                    spans_append([ss + ms + len(m[1]), ss + me])
                     shadow[ms:me] = b'_' * (me - ms)
-            return tables
+            table_spans = spans[:]
+            spans.sort()
+            return table_spans
         # There are already exists some spans. Try to use the already existing
         # before appending new spans.
         span_tuple_to_span_get = {(s[0], s[1]): s for s in spans}.get
+        table_spans = []  # type: List[List[int]]
+        table_spans_append = table_spans.append
         m = True
         while m:
             m = False
-            for m in TABLE_FINDITER(shadow):
+            for m in TABLE_FINDITER(shadow, timeout=time_left()):
                 ms, me = m.span()
                 # Ignore leading whitespace using len(m[1]).
                 s, e = ss + ms + len(m[1]), ss + me
                 old_span = span_tuple_to_span_get((s, e))
                 if old_span is None:
                     span = [s, e]
-                    insort(spans, span)
+                    insort_span(self._type_to_spans, 'Table', span)
                 else:
                     span = old_span
-                tables_append(Table(lststr, type_to_spans, span))
+                table_spans_append(span)
                 shadow[ms:me] = b'_' * (me - ms)
-        return tables
+        return table_spans
+
+    @property
+    def tables(self) -> List['Table']:
+        """Return a list of found table objects."""
+        lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        return [
+            Table(lststr, type_to_spans, span)
+            for span in self._table_spans()
+        ]
+
+    def iter_tables(
+        self, reverse: bool=False
+    ) -> Generator['Table', None, None]:
+        """Yield the table objects lazily, see iter_parameters.
+
+        Unlike the tables property, which lists nested tables before their
+        parents, the tables are yielded in the order of their appearance.
+        The text is still searched for all the tables before the first one
+        is yielded.
+        """
+        return self._iter_nodes(
+            'Table', Table, reverse, sorted(self._table_spans()))
 
     def lists(self, pattern: str=None) -> List['WikiList']:
         r"""Return a list of WikiList objects.
@@ -971,7 +1591,7 @@ class WikiText:
                 span = [s, e]
                 old_span = span_tuple_to_span_get((s, e))
                 if old_span is None:
-                    insort(spans, span)
+                    insort_span(type_to_spans, 'WikiList', span)
                 else:
                     span = old_span
                 lists.append(
@@ -986,7 +1606,7 @@ class WikiText:
         lststr = self._lststr
         type_to_spans = self._type_to_spans
         if name:
-            if name in _tag_extensions:
+            if name in (self._profile or DEFAULT_PROFILE).tag_extensions:
                 string = lststr[0]
                 return [
                     Tag(lststr, type_to_spans, span, 'ExtensionTag')
@@ -1011,18 +1631,17 @@ class WikiText:
                 START_TAG_PATTERN.replace(
                     rb'{name}', rb'(?P<name>' + name.encode() + rb')'
                 )
-            ).finditer(shadow)])
+            ).finditer(shadow, timeout=time_left())])
             end_search = regex_compile(END_TAG_PATTERN .replace(
                 b'{name}', name.encode()
             )).search
         else:
             reversed_start_matches = reversed(
-                [m for m in START_TAG_FINDITER(shadow)]
+                [m for m in START_TAG_FINDITER(shadow, timeout=time_left())]
             )
         shadow_copy = shadow[:]
         spans = type_to_spans.setdefault('Tag', [])
         span_tuple_to_span_get = {(s[0], s[1]): s for s in spans}.get
-        spans_append = spans.append
         for start_match in reversed_start_matches:
             if start_match['self_closing']:
                 # Don't look for the end tag
@@ -1041,6 +1660,7 @@ class WikiText:
                             b'{name}', start_match['name']
                         ),
                         shadow_copy,
+                        pos=start_match.end(),
                     )
                 if end_match:
                     s, e = end_match.span()
@@ -1052,12 +1672,55 @@ class WikiText:
                     span = [ss + s, ss + e]
             old_span = span_tuple_to_span_get((span[0], span[1]))
             if old_span is None:
-                spans_append(span)
+                insort_span(type_to_spans, 'Tag', span)
             else:
                 span = old_span
             tags_append(Tag(lststr, type_to_spans, span, 'Tag'))
         return sorted(tags, key=attrgetter('_span'))
 
+    def enclosing(
+        self, offset: int, type_: Optional[str]=None,
+    ) -> List['SubWikiText']:
+        """Return the sub-nodes of self that contain the given offset.
+
+        :param offset: The index of a character in self.string.
+        :param type_: the type of the desired nodes as a string.
+            Currently the following types are supported: {Template,
+            ParserFunction, WikiLink, Comment, Parameter, ExtensionTag}.
+            The default is None and means nodes of any type above.
+        :return: The list of nodes from the innermost one to the outermost.
+        """
+        start, end = self._check_index(offset)
+        if type_ is None:
+            types = SPAN_PARSER_TYPES
+        else:
+            types = type_,
+        lststr = self._lststr
+        type_to_spans = self._type_to_spans
+        self_span = self._span
+        ss, se = self_span
+        nodes = []
+        nodes_append = nodes.append
+        for type_ in types:
+            cls = globals()[type_]
+            for span in enclosing_spans(type_to_spans, type_, start, end):
+                s, e = span
+                if s < ss or se < e:
+                    break
+                if span is not self_span:
+                    nodes_append(cls(lststr, type_to_spans, span, type_))
+        return sorted(nodes, key=lambda i: (-i._span[0], i._span[1]))
+
+    def node_at(self, offset: int) -> Optional['SubWikiText']:
+        """Return the innermost sub-node that contains the given offset.
+
+        See the `enclosing` method. Return None if there is no such node.
+        """
+        nodes = self.enclosing(offset)
+        if nodes:
+            return nodes[0]
+        return None
+
     @staticmethod
     def parent(type_: Optional[str]=None) -> None:
         """Return None (The parent of the root node is None)."""
@@ -1130,9 +1793,8 @@ class SubWikiText(WikiText):
         ancestors_append = ancestors.append
         for type_ in types:
             cls = globals()[type_]
-            spans = type_to_spans[type_]
-            for span in spans[:bisect(spans, [ss])]:
-                if se < span[1]:
+            for span in enclosing_spans(type_to_spans, type_, ss, se):
+                if span[0] < ss and se < span[1]:
                     ancestors_append(cls(lststr, type_to_spans, span, type_))
         return sorted(ancestors, key=lambda i: ss - i._span[0])
 
@@ -1158,7 +1820,7 @@ if __name__ == '__main__':
         Tag, START_TAG_PATTERN, END_TAG_PATTERN, START_TAG_FINDITER
     )
     from ._parser_function import ParserFunction
-    from ._template import Template
+    from ._template import Template, normal_template_name
     from ._wikilink import WikiLink
     from ._comment import Comment
     from ._externallink import ExternalLink